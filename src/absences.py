@@ -0,0 +1,97 @@
+"""
+Individuelle Abwesenheiten (Urlaub, Praktikum, Krankheit) pro Azubi als Datumsbereiche.
+
+Die Bereiche werden pro Person in einem IntervalSet (sortierte, zusammengefasste Start-/End-Ordinale)
+abgelegt, sodass eine Abfrage "ist X am Tag Y abwesend" per Binärsuche in O(log n) beantwortet wird.
+Für "wer ist am Tag Y abwesend" gibt es zusätzlich einen gemeinsamen Index über alle Personen: die Grenzen
+aller Bereiche sortiert, zu jedem Abschnitt die Menge der Abwesenden. Eine Abfrage ist dann eine Binärsuche.
+
+Author: pascal.blum@nikoit.de
+"""
+import bisect
+import csv
+import datetime
+import numpy as np
+from intervals import IntervalSet
+
+
+class AbsenceIndex:
+    def __init__(self):
+        self.intervals = {}
+        # (Grenzen als Ordinale, Abwesende ab der jeweiligen Grenze), wird beim ersten Zugriff gebaut
+        self.segments = None
+
+    def add(self, name, start, end):
+        """Fügt einen Bereich (inklusive beider Tage) hinzu."""
+        self.intervals.setdefault(name, IntervalSet()).add(start, end)
+        self.segments = None
+
+    def build_segments(self):
+        events = {}
+        for name, intervals in self.intervals.items():
+            for start, end in zip(intervals.starts, intervals.ends):
+                events.setdefault(start, []).append((name, True))
+                events.setdefault(end + 1, []).append((name, False))
+        boundaries, absent, current = [], [], set()
+        for ordinal in sorted(events):
+            for name, begins in events[ordinal]:
+                if begins:
+                    current.add(name)
+                else:
+                    current.discard(name)
+            boundaries.append(ordinal)
+            absent.append(frozenset(current))
+        return boundaries, absent
+
+    def is_absent(self, name, date):
+        intervals = self.intervals.get(name)
+        return intervals is not None and date in intervals
+
+    def absent_names(self, date, names=None):
+        """Alle (bzw. aus names) am Tag abwesenden Personen."""
+        segments = self.segments
+        if segments is None:
+            segments = self.segments = self.build_segments()
+        boundaries, absent = segments
+        position = bisect.bisect_right(boundaries, date.toordinal()) - 1
+        found = absent[position] if position >= 0 else frozenset()
+        return found if names is None else found.intersection(names)
+
+    def mask(self, ordinals, codes, names):
+        """Vektorisierte Prüfung: für jede Zeile, ob die Person codes[i] (Index in names) am Tag ordinals[i] abwesend ist."""
+        result = np.zeros(len(ordinals), dtype=bool)
+        for code, name in enumerate(names):
+            intervals = self.intervals.get(name)
+            if not intervals:
+                continue
+            rows = np.flatnonzero(codes == code)
+            if rows.size:
+                result[rows] = intervals.mask(ordinals[rows])
+        return result
+
+    @classmethod
+    def from_csv(cls, absences_file):
+        try:
+            with open(absences_file, 'r', encoding='utf-8-sig') as file:
+                return cls.from_rows(csv.DictReader(file, delimiter=';'))
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Fehler beim laden der Abwesenheiten: {e}")
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Zeilen im Format von Abwesenheiten.csv (z.B. aus repository.py)."""
+        index = cls()
+        try:
+            for row in rows:
+                if not (row.get('Von') or '').strip():
+                    continue
+                name = f"{row['Vorname'].strip()} {row['Nachname'].strip()}"
+                start = datetime.datetime.strptime(row['Von'].strip(), '%d.%m.%Y').date()
+                end_text = (row.get('Bis') or '').strip()
+                end = datetime.datetime.strptime(end_text, '%d.%m.%Y').date() if end_text else start
+                index.add(name, start, end)
+        except Exception as e:
+            raise ValueError(f"Fehler beim laden der Abwesenheiten: {e}")
+        return index
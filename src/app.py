@@ -11,31 +11,125 @@ Hauptfunktionen:
 - Verwaltung von CSV-Dateien
 - Backup- und Wiederherstellungsmechanismen für CSV-Daten
 - Bereitstellung eines Admin-Dashboards zur Steuerung
+- Mehrere Standorte in einem Prozess: alle Seiten gibt es zusätzlich unter /<standort>/... (siehe sites.py)
 
 Autor: pascal.blum@nikoit.de
 """
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for
+from flask import Flask, Blueprint, Response, abort, g, render_template, request, jsonify, send_from_directory, redirect
 import os
-import pandas as pd
-import shutil
+import hashlib
 from datetime import datetime
 import json
-import time
-from generate_plan import CleaningDutyScheduler, HTMLExporter
+from generate_plan import HTMLExporter, ICSExporter
+from exporters.html_exporter import template_environment, OFFLINE_MANIFEST, OFFLINE_WORKER
+from events import EventBroker
+from plan_watcher import DataWatcher
+from locks import file_lock
+from changelog import RollbackConflict
+from statistics_cache import summarize, append_history
+from scenarios import check_scenario, evaluate_scenarios
+from slots import slot_by_label
+from plan_diff import PlanSnapshot, diff_snapshots, append_plan_changes
+from overrides import adjust_statistics, validate_changes, swap_rows, override_row, planned_row
+from csv_index import parse_datatables_args, stream_page, stream_all
+from repository import open_repository
+from sites import SiteRegistry, SCHEDULER_FILE_NAMES, OVERRIDES_FILE
 
 app = Flask(__name__)
+# Kompilierte Templates mit dem Plan-Export teilen, damit nicht jeder Worker neu übersetzt
+app.jinja_env.bytecode_cache = template_environment().bytecode_cache
 DATA_DIR = './data/'
-BACKUP_DIR = './data/backups/'
+OUTPUT_DIR = 'static'
+SITES_DIR = os.environ.get('PLAN_SITES_DIR', './sites/')
+# Seiten relativ zum Standort, die der Service Worker offline vorhält (Startseite und Live-Ansicht)
+OFFLINE_PAGES = ['./', 'plan']
 
-if not os.path.exists(BACKUP_DIR):
-    os.makedirs(BACKUP_DIR)
+# Geladene Standorte als LRU-Cache, der Standard-Standort (data/, static/) ist ohne Präfix erreichbar
+sites = SiteRegistry(DATA_DIR, OUTPUT_DIR, SITES_DIR, max_sites=int(os.environ.get('PLAN_SITE_CACHE', 16)))
 
-@app.route('/')
+# Alle Seiten und APIs gibt es einmal ohne Präfix (Standard-Standort) und einmal unter /<site>/
+site_routes = Blueprint('plan', __name__)
+
+@site_routes.url_value_preprocessor
+def select_site(endpoint, values):
+    """
+    Wählt den Standort aus der URL, unbekannte Standorte ergeben 404.
+    """
+    try:
+        g.site = sites.get((values or {}).pop('site', None))
+    except KeyError:
+        abort(404)
+
+@site_routes.context_processor
+def inject_site():
+    return {"site_prefix": g.site.prefix}
+
+def current_site():
+    return g.site
+
+def current_user():
+    """
+    Wer die Änderung gemacht hat, für das Änderungsprotokoll.
+    """
+    return request.headers.get('X-User') or request.remote_addr
+
+@site_routes.route('/')
 def index():
     """
     Stellt die Startseite mit dem Spühlmaschinenplan bereit.
     """
-    return send_from_directory('static', 'Spühlmaschinenplan.html')
+    return send_from_directory(current_site().output_dir, 'Spühlmaschinenplan.html')
+
+@site_routes.route('/plan')
+def live_plan():
+    """
+    Rendert den aktuellen Plan inklusive Diensttausche direkt aus dem gespeicherten Plan, mit denselben
+    Templates wie der statische Export. Gibt es noch keinen gespeicherten Plan, wird die statische Seite gezeigt.
+    """
+    site = current_site()
+    try:
+        schedule = site.load_base_schedule()[0]
+    except FileNotFoundError:
+        return redirect(f"{site.prefix}/")
+    slots = site.scheduler().slots
+    patched = site.load_overrides(slots).apply(schedule)[0]
+    exporter = HTMLExporter(plan_version=plan_version(patched), site_prefix=site.prefix, offline_pages=OFFLINE_PAGES)
+    return Response(exporter.stream(patched, slots), mimetype='text/html')
+
+@site_routes.route('/sw.js')
+def service_worker():
+    """
+    Service Worker des Plans (wird von HTMLExporter beim Veröffentlichen geschrieben). Liegt unter dem Präfix
+    des Standorts, damit er nur dessen Seiten steuert. no-cache, damit ein neuer Plan sofort erkannt wird.
+    """
+    response = send_from_directory(current_site().output_dir, OFFLINE_WORKER, mimetype='text/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@site_routes.route('/manifest.webmanifest')
+def web_manifest():
+    """
+    Web-App-Manifest, damit der Plan auf Tablets und Handys als App abgelegt werden kann.
+    """
+    return send_from_directory(current_site().output_dir, OFFLINE_MANIFEST, mimetype='application/manifest+json')
+
+@site_routes.route('/api/plan/days')
+def plan_days():
+    """
+    Gibt die veröffentlichten Tage von ?from= bis ?to= (ISO-Datum, inklusive) als [{date, Slot: Name}] zurück.
+    Mit SQLite über den Index auf dem Datum, sonst aus dem gespeicherten Plan mit aufgelegten Diensttauschen.
+    """
+    site = current_site()
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.args.get('to', request.args['from']), '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({"error": "from/to müssen als JJJJ-MM-TT angegeben werden"}), 400
+
+    try:
+        return jsonify(site.published_days(start, end))
+    except FileNotFoundError:
+        return jsonify({"error": "Es wurde noch kein Plan generiert"}), 409
 
 # Admin Dashboard
 PAGES = {
@@ -43,14 +137,14 @@ PAGES = {
     "csv_management": "Management"
 }
 
-@app.route("/admin/")
+@site_routes.route("/admin/")
 def dashboard():
     """
     Lädt das Admin-Dashboard mit einer Auswahl an Verwaltungsseiten.
     """
     return render_template("dashboard.html", pages=PAGES, default_page='plan_management')
 
-@app.route("/admin/page/<page>")
+@site_routes.route("/admin/page/<page>")
 def page_content(page):
     """
     Lädt den Inhalt einer spezifischen Admin-Seite.
@@ -59,193 +153,510 @@ def page_content(page):
         return render_template(f"{page}.html")
     return "Seite nicht gefunden", 404
 
-@app.route('/admin/generate-plan', methods=['GET'])
-def generate_plan():
+SCHEDULER_FILES = set(SCHEDULER_FILE_NAMES)
+
+HISTORY_SIZE = 20
+MAX_SCENARIOS = 16
+
+def plan_version(schedule):
     """
-    Erstellt einen neuen Reinigungsplan für das aktuelle Schuljahr und speichert ihn als HTML.
+    Kurzer Hash über den Plan, ändert sich nur wenn sich mindestens ein Tag geändert hat.
     """
-    azubis_file = "data/Azubis.csv"
-    blockweeks_file = "data/Blockwochen_Schule.csv"
-    holidays_file = "data/Feiertage_Schließzeiten_Brückentage.csv"
-    
-    scheduler = CleaningDutyScheduler(azubis_file, blockweeks_file, holidays_file)
-    
+    digest = hashlib.sha256()
+    for entry in schedule:
+        slots = ";".join(f"{value}" for key, value in entry.items() if key != 'date')
+        digest.update(f"{entry['date'].isoformat()};{slots}\n".encode())
+    return digest.hexdigest()[:16]
 
+def current_school_year(scheduler):
+    """
+    Schuljahr, in dem das heutige Datum liegt.
+    """
     current_date = datetime.now().date()
-    
+
     # Hier muss das Schuljahr rein z.B. 01.01.2025 -> 2024 | 10.10.2024 -> 2024 | 01.09.2024 -> 2025
     # get_school_year_start_end() gibt ein valides anfang und enddatum für das schuljahr zurück
     school_start, school_end = scheduler.get_school_year_start_end(current_date.year)
     if school_start <= current_date <= school_end:
-        school_year = current_date.year
-    else:
-        school_year = current_date.year - 1
-
-    current_year = school_year
-    
-
-    exporter = HTMLExporter()
-    output_file = f"static/Spühlmaschinenplan.html"
-    
-    include_all_dates = True
-    schedule = scheduler.generate_schedule(current_year, include_all_dates=include_all_dates)
-    
-    scheduler.save_schedule(schedule, exporter, output_file)
-    
-    stats = scheduler.generate_statistics(schedule)
-    stats_file = f"static/statistics.json"
-    
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    stats_with_timestamp = {
-        "timestamp": timestamp,
-        "data": stats
+        return current_date.year
+    return current_date.year - 1
+
+def publish_file(scheduler, schedule, exporter, target):
+    """
+    Exportiert erst in eine temporäre Datei und ersetzt dann atomar, damit andere Worker nie halbe Dateien ausliefern.
+    """
+    tmp_file = f"{target}.tmp"
+    scheduler.save_schedule(schedule, exporter, tmp_file)
+    os.replace(tmp_file, target)
+
+def iso_violations(violations):
+    return [{**violation, "date": violation["date"].isoformat()} for violation in violations]
+
+def record_plan_changes(site, scheduler, patched, version, school_year):
+    """
+    Vergleicht den neuen Plan mit dem zuletzt veröffentlichten und protokolliert die geänderten Tage pro Azubi.
+    Muss unter site.lock_file aufgerufen werden.
+    """
+    snapshot = PlanSnapshot.from_schedule(patched, scheduler.slots, version)
+    previous = PlanSnapshot.load(site.snapshot_file)
+
+    changes, by_azubi = [], {}
+    if previous is not None and previous.plan_version != version:
+        changes, by_azubi = diff_snapshots(previous, snapshot)
+        if changes:
+            append_plan_changes(site.plan_changelog_file, {
+                "plan_version": version,
+                "previous_version": previous.plan_version,
+                "school_year": school_year,
+                "changes": changes,
+                "by_azubi": by_azubi
+            })
+    snapshot.save(site.snapshot_file)
+
+    return {
+        "previous_version": previous.plan_version if previous else None,
+        "changed_days": len({change["date"] for change in changes}),
+        "changes": changes,
+        "by_azubi": by_azubi
+    }
+
+def publish_plan(site, scheduler, schedule, base_stats, school_year, violations, force):
+    """
+    Legt die Diensttausche auf den generierten Plan und schreibt HTML-Plan, ICS und statistics.json.
+    Muss unter site.lock_file aufgerufen werden.
+    """
+    patched, changes = site.load_overrides(scheduler.slots).apply(schedule)
+    violations = violations + iso_violations(validate_changes(scheduler, patched, changes))
+    version = plan_version(patched)
+
+    previous = site.statistics_cache.load()[1] or {}
+
+    written = []
+    plan_changes = {"previous_version": previous.get("plan_version"), "changed_days": 0, "changes": [], "by_azubi": {}}
+    if force or previous.get("plan_version") != version:
+        exporter = HTMLExporter(plan_version=version, site_prefix=site.prefix, offline_pages=OFFLINE_PAGES)
+        publish_file(scheduler, patched, exporter, site.plan_file)
+        first = scheduler.slots[0].key
+        publish_file(scheduler, [entry for entry in patched if entry[first] != ' - '], ICSExporter(), site.ics_file)
+        written += [site.plan_file, site.ics_file]
+        plan_changes = record_plan_changes(site, scheduler, patched, version, school_year)
+    site.save_published_schedule(scheduler, patched, school_year)
+
+    stats = adjust_statistics(base_stats, changes)
+
+    # Welche Zeilen sich seit der letzten Generierung geändert haben
+    data_changes = site.change_log.diff(previous.get("data_version", 0))
+
+    if force or written or previous.get("data") != stats or previous.get("data_version") != site.change_log.version:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        stats_with_timestamp = {
+            "timestamp": timestamp,
+            "plan_version": version,
+            "data_version": site.change_log.version,
+            "slots": [slot.to_dict() for slot in scheduler.slots],
+            "data": stats,
+            "history": append_history(previous.get("history"), summarize(stats, timestamp, version), HISTORY_SIZE)
+        }
+
+        with open(f"{site.stats_file}.tmp", 'w') as f:
+            json.dump(stats_with_timestamp, f, indent=4)
+        os.replace(f"{site.stats_file}.tmp", site.stats_file)
+        site.statistics_cache.invalidate()
+        written.append(site.stats_file)
+
+    return {
+        "plan_version": version,
+        "statistics": stats,
+        "violations": violations,
+        "overrides": [
+            {key: change[key] for key in ('role', 'old', 'new', 'reason')} | {"date": change['date'].isoformat()}
+            for change in changes
+        ],
+        "data_changes": data_changes,
+        "plan_changes": plan_changes,
+        "written": written
     }
 
-    with open(stats_file, 'w') as f:
-        json.dump(stats_with_timestamp, f, indent=4)
-    
-    return jsonify({
-        "message": f"Plan für {current_year} generiert und als HTML gespeichert.",
-        "statistics": stats
-    })
+def notify_plan(site, result, school_year):
+    if result["written"]:
+        site.admin_events.publish("plan", {
+            "plan_version": result["plan_version"],
+            "school_year": school_year,
+            "written": result["written"],
+            "affected": list(result["plan_changes"]["by_azubi"])
+        })
+        site.plan_events.publish("plan", current_plan_info(site))
 
-@app.route('/admin/get-statistics', methods=['GET'])
+def build_plan(site, optimize=False, force=True):
+    """
+    Erstellt den Reinigungsplan für das aktuelle Schuljahr und schreibt HTML-Plan, ICS und statistics.json.
+    Mit force=False werden Plan und ICS nur neu geschrieben, wenn sich der Plan tatsächlich geändert hat.
+    """
+    with file_lock(site.lock_file):
+        scheduler = site.scheduler()
+        current_year = current_school_year(scheduler)
+
+        include_all_dates = True
+        schedule = scheduler.generate_schedule(current_year, include_all_dates=include_all_dates, optimize=optimize)
+        base_stats = scheduler.generate_statistics(schedule)
+        violations = iso_violations(scheduler.violations)
+        site.save_base_schedule(scheduler, schedule, base_stats, current_year, violations)
+
+        result = publish_plan(site, scheduler, schedule, base_stats, current_year, violations, force)
+
+    notify_plan(site, result, current_year)
+    return {"message": f"Plan für {current_year} generiert und als HTML gespeichert.", **result}
+
+def publish_overrides(site, force=False):
+    """
+    Veröffentlicht den Plan nach einer Änderung an den Diensttauschen neu, ohne ihn neu zu generieren.
+    Gibt es noch keinen gespeicherten Plan, wird einmal generiert.
+    """
+    if not os.path.exists(site.base_schedule_file):
+        return build_plan(site, force=force)
+
+    with file_lock(site.lock_file):
+        scheduler = site.scheduler()
+        schedule, base_stats, school_year, violations = site.load_base_schedule()
+        result = publish_plan(site, scheduler, schedule, base_stats, school_year, violations, force)
+
+    notify_plan(site, result, school_year)
+    return {"message": f"Diensttausche für {school_year} übernommen.", **result}
+
+@site_routes.route('/admin/generate-plan', methods=['GET'])
+def generate_plan():
+    """
+    Erstellt einen neuen Reinigungsplan für das aktuelle Schuljahr und speichert ihn als HTML.
+    Mit ?optimize=1 wird der Plan zusätzlich auf Fairness relativ zur Verfügbarkeit optimiert.
+    """
+    optimize = request.args.get('optimize', '').lower() in ('1', 'true', 'ja')
+    return jsonify(build_plan(current_site(), optimize=optimize))
+
+@site_routes.route('/admin/scenarios', methods=['POST'])
+def evaluate_scenarios_route():
+    """
+    Berechnet Was-wäre-wenn-Szenarien parallel gegen den aktuellen Datenstand, ohne Dateien zu verändern.
+    Erwartet {"scenarios": [{"name": ..., "seed": ..., "overlay": {...}}], "optimize": false, "year": 2025}.
+    """
+    payload = request.get_json(silent=True) or {}
+    scenarios = payload.get('scenarios')
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({"error": "Keine Szenarien übergeben"}), 400
+    if len(scenarios) > MAX_SCENARIOS:
+        return jsonify({"error": f"Höchstens {MAX_SCENARIOS} Szenarien pro Anfrage"}), 400
+    try:
+        for scenario in scenarios:
+            check_scenario(scenario)
+    except ValueError as e:
+        return jsonify({"error": f"Ungültiges Szenario: {e}"}), 400
+
+    site = current_site()
+    year = payload.get('year') or current_school_year(site.scheduler())
+    try:
+        result = evaluate_scenarios(
+            site.data_files, int(year), scenarios, optimize=bool(payload.get('optimize')), repository=site.repository
+        )
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Ungültiges Szenario: {e}"}), 400
+    return jsonify(result)
+
+@site_routes.route('/api/plan/override', methods=['POST'])
+def override_duty():
+    """
+    Trägt eine Person an einem Tag für einen Dienst ein ({"date": "2025-03-03", "role": "primary",
+    "name": ..., "reason": ...}) oder tauscht zwei Tage ({"date": ..., "swap_with": ..., "role": ...}).
+    role ist der Schlüssel oder die Bezeichnung eines Dienstes aus Dienste.csv, ohne Angabe der erste Dienst.
+    Die Änderung wird vorher gegen Schulwochen, Feiertage und Abwesenheiten geprüft und nur übernommen,
+    wenn sie keine Verstöße erzeugt. Der Plan wird danach ohne Neugenerierung veröffentlicht.
+    """
+    data = request.json or {}
+    site = current_site()
+    scheduler = site.scheduler()
+    try:
+        role = slot_by_label(scheduler.slots, data.get('role', scheduler.slots[0].key)).key
+        date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+        schedule = site.load_base_schedule()[0]
+        table = site.load_overrides(scheduler.slots)
+        if data.get('swap_with'):
+            swap_date = datetime.strptime(data['swap_with'], '%Y-%m-%d').date()
+            rows = swap_rows(table.apply(schedule)[0], scheduler.slots, role, date, swap_date)
+        else:
+            planned_row(schedule, date)
+            rows = [override_row(scheduler.slots, date, role, data['name'], data.get('reason', ''))]
+        touched = {table.add_row(row)[0] for row in rows}
+    except FileNotFoundError:
+        return jsonify({"error": "Es wurde noch kein Plan generiert"}), 409
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Ungültige Änderung: {e}"}), 400
+
+    # Probeweise auflegen und nur die betroffenen Tage prüfen
+    patched, changes = table.apply(schedule)
+    violations = validate_changes(scheduler, patched, changes, touched)
+    if violations:
+        return jsonify({"error": "Die Änderung kollidiert mit dem Plan", "violations": iso_violations(violations)}), 400
+
+    versions = [
+        site.change_log.apply(OVERRIDES_FILE, 'insert', {"index": None, "row": row}, user=current_user())["version"]
+        for row in rows
+    ]
+    return jsonify({**publish_overrides(site), "versions": versions})
+
+@site_routes.route('/admin/events')
+def admin_event_stream():
+    """
+    Server-Sent Events für offene Admin-Seiten, z.B. wenn ein neuer Plan live ist.
+    """
+    site = current_site()
+    stream = site.admin_events.stream(poll=plan_poll(site, current_plan_info(site)))
+    return Response(stream, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+def current_plan_info(site):
+    """
+    Version und Zeitstempel des aktuell veröffentlichten Plans aus statistics.json.
+    """
+    stats = site.statistics_cache.load()[1] or {}
+    return {"plan_version": stats.get("plan_version"), "timestamp": stats.get("timestamp")}
+
+def plan_poll(site, info):
+    """
+    Poll-Funktion für EventBroker.stream: liefert ein Event, wenn ein anderer Worker-Prozess einen neuen Plan
+    veröffentlicht hat. Geprüft wird zuerst nur die mtime von statistics.json.
+    """
+    stats_file = site.stats_file
+    seen = {"mtime": os.path.getmtime(stats_file) if os.path.exists(stats_file) else None, "info": info}
+
+    def poll():
+        mtime = os.path.getmtime(stats_file) if os.path.exists(stats_file) else None
+        if mtime == seen["mtime"]:
+            return None
+        seen["mtime"] = mtime
+        current = current_plan_info(site)
+        if current["plan_version"] == seen["info"]["plan_version"]:
+            return None
+        seen["info"] = current
+        return EventBroker.format("plan", current)
+
+    return poll
+
+@site_routes.route('/api/plan/events')
+def plan_event_stream():
+    """
+    Server-Sent Events mit der Plan-Version für eigene Clients. Beim Verbinden wird sofort die aktuelle Version
+    geschickt, danach bei jeder Generierung die neue Version. Der Stream endet nach EventBroker.max_age, der Client
+    verbindet sich neu. Die Plan-Seite selbst fragt per /api/plan/version nach.
+    """
+    site = current_site()
+    info = current_plan_info(site)
+    stream = site.plan_events.stream(EventBroker.format("plan", info), poll=plan_poll(site, info))
+    return Response(stream, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@site_routes.route('/api/plan/version')
+def plan_version_poll():
+    """
+    Aktuelle Plan-Version für die Anzeigen, die alle paar Sekunden nachfragen. Antwortet sofort, mit
+    If-None-Match und unveränderter Version nur mit 304 ohne Body. So hält keine Anzeige einen Worker-Thread fest.
+    """
+    info = current_plan_info(current_site())
+    response = jsonify(info)
+    response.set_etag(info["plan_version"] or "none")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def on_data_changed(site, files):
+    """
+    Callback des DataWatchers: generiert neu, wenn eine vom Plan benutzte CSV-Datei geändert wurde.
+    """
+    if SCHEDULER_FILES.intersection(files):
+        result = build_plan(site, force=False)
+        print(f"Automatische Neugenerierung nach Änderung an {', '.join(files)}: {result['written'] or 'keine Änderung'}")
+    elif OVERRIDES_FILE in files:
+        result = publish_overrides(site)
+        print(f"Diensttausche übernommen: {result['written'] or 'keine Änderung'}")
+
+def start_watcher():
+    """
+    Startet die automatische Neugenerierung bei Änderungen an den CSV-Dateien, ein Watcher pro Standort.
+    Der Standort wird erst bei einer Änderung aus dem Cache geholt, damit die Watcher keine Standorte festhalten.
+    """
+    return [
+        DataWatcher(
+            sites.paths(name)[0], lambda files, name=name: on_data_changed(sites.get(name), files),
+            repository=open_repository(sites.paths(name)[0])
+        ).start()
+        for name in sites.names()
+    ]
+
+@site_routes.route('/admin/get-statistics', methods=['GET'])
 def get_statistics():
     """
-    Gibt die zuletzt berechneten Statistiken zum Reinigungsplan zurück.
+    Gibt die zuletzt berechneten Statistiken zum Reinigungsplan inklusive der History der letzten
+    Generierungen zurück. Unveränderte Abfragen (If-None-Match) werden mit 304 beantwortet.
     """
-    stats_file = f"static/statistics.json"
-    
-    if os.path.exists(stats_file):
-        with open(stats_file, 'r') as f:
-            stats = json.load(f)
-        return jsonify(stats)
-    
-    return jsonify({"error": "Statistiken nicht gefunden"}), 404
+    body, _, etag = current_site().statistics_cache.load()
+    if body is None:
+        return jsonify({"error": "Statistiken nicht gefunden"}), 404
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 # Admin API
-@app.route('/api/csv', methods=['GET'])
+@site_routes.route('/api/csv', methods=['GET'])
 def list_csv_files():
     """
-    Listet alle vorhandenen CSV-Dateien im Datenverzeichnis auf.
+    Listet alle vorhandenen CSV-Dateien im Datenverzeichnis (bzw. Tabellen in plan.sqlite) auf.
     """
-    csv_files = [f for f in os.listdir(DATA_DIR) if f.endswith('.csv')]
-    return jsonify(csv_files)
+    return jsonify(current_site().repository.files())
 
-@app.route('/api/csv/<filename>', methods=['GET'])
+@site_routes.route('/api/csv/<filename>', methods=['GET'])
 def get_csv(filename):
     """
-    Listet alle Zeilen in einer CSV-Datei auf.
+    Listet die Zeilen in einer CSV-Datei auf. Mit den Parametern des serverseitigen DataTables-Protokolls
+    (draw, start, length, search[value], order[0][...], columns[i][search][value]) wird gefiltert, sortiert
+    und paginiert, ohne Parameter kommt die ganze Datei.
     """
-    filepath = os.path.join(DATA_DIR, filename)
-    if os.path.exists(filepath):
-        df = pd.read_csv(filepath, sep=';', dtype=str).fillna('')
-        return jsonify({"columns": df.columns.tolist(), "data": df.to_dict(orient='records')})
-    return jsonify({"error": "Datei nicht gefunden"}), 404
+    table = current_site().repository.table(filename)
+    if table is None:
+        return jsonify({"error": "Datei nicht gefunden"}), 404
 
-@app.route('/api/csv/<filename>/meta', methods=['GET'])
+    if 'draw' in request.args or 'start' in request.args:
+        chunks = stream_page(table, parse_datatables_args(request.args, table.columns))
+    else:
+        chunks = stream_all(table)
+    return Response(chunks, mimetype='application/json')
+
+@site_routes.route('/api/csv/<filename>/meta', methods=['GET'])
 def get_csv_metadata(filename):
     """
     Liest die Metadaten für eine CSV-Datei aus.
     """
-    meta_filepath = os.path.join(DATA_DIR, f"{filename}.json")
+    meta_filepath = os.path.join(current_site().data_dir, f"{filename}.json")
     if os.path.exists(meta_filepath):
         with open(meta_filepath, 'r', encoding='utf-8') as f:
             metadata = json.load(f)
         return jsonify(metadata)
     return jsonify({"error": "Metadaten nicht gefunden"}), 404
 
-@app.route('/api/csv/<filename>/update', methods=['POST'])
+@site_routes.route('/api/csv/<filename>/update', methods=['POST'])
 def update_csv(filename):
     """
     Bearbeitet eine Zeile aus einer CSV-Datei.
     """
     data = request.json
-    df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';', dtype=str)
-    df.iloc[data['index'], df.columns.get_loc(data['column'])] = data['value']
-    df.to_csv(os.path.join(DATA_DIR, filename), sep=';', index=False)
-    return jsonify({"success": True})
+    entry = current_site().change_log.apply(filename, 'update', data, user=current_user())
+    return jsonify({"success": True, "version": entry["version"]})
 
-@app.route('/api/csv/<filename>/delete', methods=['POST'])
+@site_routes.route('/api/csv/<filename>/delete', methods=['POST'])
 def delete_row(filename):
     """
     Löscht eine Zeile aus einer CSV-Datei.
     """
     data = request.json
-    df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';', dtype=str)
-    df = df.drop(index=data['index']).reset_index(drop=True)
-    df.to_csv(os.path.join(DATA_DIR, filename), sep=';', index=False)
-    return jsonify({"success": True})
+    entry = current_site().change_log.apply(filename, 'delete', data, user=current_user())
+    return jsonify({"success": True, "version": entry["version"]})
 
-@app.route('/api/csv/<filename>/reorder', methods=['POST'])
+@site_routes.route('/api/csv/<filename>/reorder', methods=['POST'])
 def reorder_csv(filename):
     """
     Ändert die Reihenfolge einer Zeile einer CSV-Datei.
     """
-    order = request.json['order']
-    df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';', dtype=str)
-    df = df.reindex(order).reset_index(drop=True)
-    df.to_csv(os.path.join(DATA_DIR, filename), sep=';', index=False)
-    return jsonify({"success": True})
+    entry = current_site().change_log.apply(filename, 'reorder', {"order": request.json['order']}, user=current_user())
+    return jsonify({"success": True, "version": entry["version"]})
 
-@app.route('/api/csv/<filename>/add', methods=['POST'])
+@site_routes.route('/api/csv/<filename>/add', methods=['POST'])
 def add_row(filename):
     """
     Fügt eine Zeile in einer CSV-Datei hinzu.
     """
-    df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';', dtype=str)
-    new_row = {col: "" for col in df.columns}
-    new_df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    new_df.to_csv(os.path.join(DATA_DIR, filename), sep=';', index=False)
-    return jsonify({"success": True})
+    entry = current_site().change_log.apply(filename, 'add', {}, user=current_user())
+    return jsonify({"success": True, "version": entry["version"]})
 
 
-@app.route('/api/backups', methods=['GET'])
+@site_routes.route('/api/changes', methods=['GET'])
+def list_changes():
+    """
+    Listet die protokollierten Änderungen ab einer Version (?since=) auf.
+    """
+    change_log = current_site().change_log
+    since = request.args.get('since', 0, type=int)
+    return jsonify({"version": change_log.version, "changes": change_log.between(since)})
+
+@site_routes.route('/api/changes/diff', methods=['GET'])
+def diff_changes():
+    """
+    Gibt die geänderten Zeilen zwischen zwei Versionen (?from=&to=) zurück.
+    """
+    change_log = current_site().change_log
+    from_version = request.args.get('from', 0, type=int)
+    to_version = request.args.get('to', change_log.version, type=int)
+    return jsonify(change_log.diff(from_version, to_version))
+
+@site_routes.route('/api/changes/rollback', methods=['POST'])
+def rollback_changes():
+    """
+    Setzt die CSV-Dateien auf den Stand einer früheren Version zurück. Wurde eine betroffene Datei seit der
+    letzten protokollierten Änderung anders geändert, antwortet die Route mit 409.
+    """
+    change_log = current_site().change_log
+    try:
+        applied = change_log.rollback(int(request.json['version']), user=current_user())
+    except RollbackConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, "version": change_log.version, "applied": applied})
+
+
+@site_routes.route('/api/backups', methods=['GET'])
 def list_backups():
     """
-    Listet alle Backups auf.
+    Listet alle Backups (Snapshots) auf, neueste zuerst.
     """
-    backups = [f for f in os.listdir(BACKUP_DIR) if f.endswith('.csv')]
-    backups.sort(reverse = True)
-    return jsonify(backups)
+    return jsonify([
+        {"id": snapshot["id"], "timestamp": snapshot["timestamp"], "files": sorted(snapshot["files"])}
+        for snapshot in current_site().backup_store.list_snapshots()
+    ])
 
-@app.route('/api/backups/create', methods=['POST'])
+@site_routes.route('/api/backups/create', methods=['POST'])
 def create_backup():
     """
-    Erstellt vom jetzigen Stand ein Backup.
+    Erstellt vom jetzigen Stand ein Backup. Unveränderte Dateien werden nicht erneut gespeichert.
     """
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.csv'):
-            timestamp = datetime.now().strftime('%Y.%m.%d_%H-%M-%S')
-            backup_name = f"{timestamp}___{filename}"
-            shutil.copy(os.path.join(DATA_DIR, filename), os.path.join(BACKUP_DIR, backup_name))
-    prune_backups()
-    return jsonify({"success": True})
+    site = current_site()
+    snapshot = site.backup_store.create()
+    prune_backups(site)
+    return jsonify({"success": True, "id": snapshot["id"]})
 
-@app.route('/api/backups/restore', methods=['POST'])
+@site_routes.route('/api/backups/restore', methods=['POST'])
 def restore_backup():
     """
-    Stellt ein Backup wieder her.
+    Stellt alle Dateien eines Backups gemeinsam wieder her.
     """
     data = request.get_json()
-    backup_name = data.get('backup')
-    original_name = '___'.join(backup_name.split('___')[1:])
-    shutil.copy(os.path.join(BACKUP_DIR, backup_name), os.path.join(DATA_DIR, original_name))
+    try:
+        current_site().backup_store.restore(data.get('backup'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
     return jsonify({"success": True})
 
-def prune_backups(days=30):
+def prune_backups(site, days=30):
     """
     Löscht Backups, die älter als die angegebene Anzahl von Tagen sind.
     """
-    print(f"Folgende alte backups wurden nach {days} Tagen gelöscht." )
-    cutoff_time = time.time() - (days * 86400)
-    for filename in os.listdir(BACKUP_DIR):
-        if filename.endswith('.csv'):
-            file_path = os.path.join(BACKUP_DIR, filename)
-            if os.path.isfile(file_path) and os.stat(file_path).st_mtime < cutoff_time:
-                os.remove(file_path)
-                print(f"  {file_path} gelöscht")
+    removed = site.backup_store.prune(days)
+    if removed:
+        print(f"Folgende alte backups wurden nach {days} Tagen gelöscht." )
+        for snapshot_id in removed:
+            print(f"  {snapshot_id} gelöscht")
+
+app.register_blueprint(site_routes)
+app.register_blueprint(site_routes, url_prefix='/<site>', name='site')
 
 if __name__ == '__main__':
+    # Mit PLAN_AUTO_REGENERATE=1 wird der Plan bei Änderungen an den CSV-Dateien automatisch neu generiert.
+    # Der Debug-Reloader startet zwei Prozesse, der Watcher läuft nur im eigentlichen Server-Prozess.
+    if os.environ.get('PLAN_AUTO_REGENERATE') == '1' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_watcher()
     app.run(debug=True)
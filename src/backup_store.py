@@ -0,0 +1,198 @@
+"""
+Inhaltsadressierter Snapshot-Speicher für die CSV-Daten.
+
+Gesichert wird immer der Stand aus dem Repository des Standorts (repository.py), also auch bei SQLite die
+Tabellen aus der Datenbank und nicht die CSV-Dateien, die daneben in data/ liegen.
+
+Jede Datei wird einmalig unter ihrem SHA-256 als (optional komprimierter) Blob in backups/blobs/ abgelegt.
+Ein Snapshot ist nur ein Manifest {Dateiname: Hash} in backups/index.json, unveränderte Dateien kosten also
+keinen zusätzlichen Speicher. Auflisten und Aufräumen arbeiten nur auf dem Index, ohne das Verzeichnis zu
+durchsuchen. Beim Wiederherstellen werden alle Dateien eines Snapshots gemeinsam ersetzt (CSV: temporäre
+Dateien und os.replace, SQLite: eine Transaktion), sodass immer ein zusammenhängender Stand vorliegt.
+Schreibende Operationen laufen unter einer Dateisperre und lesen den Index vorher neu ein, damit mehrere
+Worker-Prozesse sich den Speicher teilen können.
+
+Author: pascal.blum@nikoit.de
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from locks import file_lock
+from repository import CSVRepository
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TIMESTAMP_FORMAT = '%Y.%m.%d_%H-%M-%S'
+LEGACY_BACKUP_RE = re.compile(r"^(\d{4}\.\d{2}\.\d{2}_\d{2}-\d{2}-\d{2})___(.+\.csv)$")
+
+
+class SnapshotStore:
+    def __init__(self, data_dir, backup_dir, compression='gzip', repository=None):
+        self.data_dir = data_dir
+        self.repository = repository or CSVRepository(data_dir)
+        self.backup_dir = backup_dir
+        self.blob_dir = os.path.join(backup_dir, 'blobs')
+        self.index_file = os.path.join(backup_dir, 'index.json')
+        self.lock_file = os.path.join(backup_dir, '.index.lock')
+        if compression == 'zstd' and zstandard is None:
+            compression = 'gzip'
+        self.compression = compression
+        self.index_mtime = None
+
+        if not os.path.exists(self.blob_dir):
+            os.makedirs(self.blob_dir)
+        with file_lock(self.lock_file):
+            self.index = self.load_index()
+
+    def load_index(self):
+        if os.path.exists(self.index_file):
+            self.index_mtime = os.path.getmtime(self.index_file)
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        index = {"snapshots": [], "blobs": {}}
+        self.index = index
+        self.import_legacy_backups()
+        self.save_index()
+        return index
+
+    def save_index(self):
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+        self.index_mtime = os.path.getmtime(self.index_file)
+
+    def blob_path(self, digest, codec):
+        extension = {'gzip': '.gz', 'zstd': '.zst'}.get(codec, '')
+        return os.path.join(self.blob_dir, f"{digest}{extension}")
+
+    def put_blob(self, content):
+        """Speichert den Inhalt, falls noch nicht vorhanden, und gibt den Hash zurück."""
+        digest = hashlib.sha256(content).hexdigest()
+        if digest in self.index["blobs"]:
+            return digest
+
+        codec = self.compression
+        if codec == 'gzip':
+            stored = gzip.compress(content)
+        elif codec == 'zstd':
+            stored = zstandard.ZstdCompressor().compress(content)
+        else:
+            stored = content
+
+        path = self.blob_path(digest, codec)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(stored)
+        os.replace(f"{path}.tmp", path)
+        self.index["blobs"][digest] = {"codec": codec, "size": len(content)}
+        return digest
+
+    def get_blob(self, digest):
+        codec = self.index["blobs"][digest]["codec"]
+        with open(self.blob_path(digest, codec), 'rb') as f:
+            stored = f.read()
+        if codec == 'gzip':
+            return gzip.decompress(stored)
+        if codec == 'zstd':
+            if zstandard is None:
+                raise ValueError("Das Backup ist mit zstd komprimiert, aber zstandard ist nicht installiert")
+            return zstandard.ZstdDecompressor().decompress(stored)
+        return stored
+
+    def snapshot_id(self, timestamp):
+        existing = {snapshot["id"] for snapshot in self.index["snapshots"]}
+        snapshot_id = timestamp
+        suffix = 1
+        while snapshot_id in existing:
+            suffix += 1
+            snapshot_id = f"{timestamp}_{suffix}"
+        return snapshot_id
+
+    def create(self):
+        """Erstellt einen Snapshot aller Tabellen des Repositorys."""
+        with file_lock(self.lock_file):
+            self.index = self.load_index()
+            return self.create_locked()
+
+    def create_locked(self):
+        files = {filename: self.put_blob(content) for filename, content in sorted(self.repository.dump().items())}
+
+        snapshot = {
+            "id": self.snapshot_id(datetime.now().strftime(TIMESTAMP_FORMAT)),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "files": files
+        }
+        self.index["snapshots"].append(snapshot)
+        self.save_index()
+        return snapshot
+
+    def list_snapshots(self):
+        """Snapshots, neueste zuerst."""
+        if os.path.exists(self.index_file) and os.path.getmtime(self.index_file) != self.index_mtime:
+            with file_lock(self.lock_file):
+                self.index = self.load_index()
+        return sorted(self.index["snapshots"], key=lambda snapshot: snapshot["timestamp"], reverse=True)
+
+    def get(self, snapshot_id):
+        for snapshot in self.index["snapshots"]:
+            if snapshot["id"] == snapshot_id:
+                return snapshot
+        raise ValueError(f"Backup '{snapshot_id}' nicht gefunden")
+
+    def restore(self, snapshot_id):
+        """Stellt alle Dateien eines Snapshots gemeinsam wieder her."""
+        with file_lock(self.lock_file):
+            self.index = self.load_index()
+            return self.restore_locked(snapshot_id)
+
+    def restore_locked(self, snapshot_id):
+        snapshot = self.get(snapshot_id)
+        self.repository.load({filename: self.get_blob(digest) for filename, digest in snapshot["files"].items()})
+        return snapshot
+
+    def prune(self, days=30, keep=1):
+        """Löscht Snapshots, die älter als die angegebene Anzahl von Tagen sind, und nicht mehr benutzte Blobs."""
+        with file_lock(self.lock_file):
+            self.index = self.load_index()
+            return self.prune_locked(days, keep)
+
+    def prune_locked(self, days, keep):
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat(timespec='seconds')
+        snapshots = sorted(self.index["snapshots"], key=lambda snapshot: snapshot["timestamp"], reverse=True)
+        kept = snapshots[:keep] + [snapshot for snapshot in snapshots[keep:] if snapshot["timestamp"] >= cutoff]
+        removed = [snapshot["id"] for snapshot in snapshots if snapshot not in kept]
+        self.index["snapshots"] = kept
+
+        used = {digest for snapshot in kept for digest in snapshot["files"].values()}
+        for digest in [digest for digest in self.index["blobs"] if digest not in used]:
+            path = self.blob_path(digest, self.index["blobs"].pop(digest)["codec"])
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.save_index()
+        return removed
+
+    def import_legacy_backups(self):
+        """Übernimmt einmalig die alten Backups im Format '<Zeitstempel>___<Datei>.csv' als Snapshots."""
+        grouped = {}
+        for filename in os.listdir(self.backup_dir):
+            match = LEGACY_BACKUP_RE.match(filename)
+            if match:
+                grouped.setdefault(match.group(1), {})[match.group(2)] = filename
+
+        for timestamp, files in sorted(grouped.items()):
+            manifest = {}
+            for original_name, backup_name in files.items():
+                with open(os.path.join(self.backup_dir, backup_name), 'rb') as f:
+                    manifest[original_name] = self.put_blob(f.read())
+            self.index["snapshots"].append({
+                "id": self.snapshot_id(timestamp),
+                "timestamp": datetime.strptime(timestamp, TIMESTAMP_FORMAT).isoformat(timespec='seconds'),
+                "files": manifest
+            })
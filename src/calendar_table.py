@@ -0,0 +1,95 @@
+"""
+Vorberechnete Kalendertabelle (ein Eintrag pro Tag) für Generierung, Prüfung, Statistik und Exporte.
+
+Statt in jedem Exporter pro Zeile isocalendar(), weekday() und strftime aufzurufen, wird die Tabelle einmal
+für einen Zeitraum (normalerweise ein Schuljahr) gebaut und als parallele Arrays abgelegt. Der Index eines
+Tages ist date.toordinal() - table.first, alle Arrays haben dieselbe Länge:
+
+    ordinal, iso_year, week, weekday, month     NumPy-Arrays
+    dates                                       datetime.date
+    weekday_names, month_names                  "Mo" ... "So", "Januar" ... "Dezember"
+    date_de, date_short, date_ics               "01.09.2025", "01.09.25", "20250901"
+
+Pro Schuljahr gibt es eine Tabelle vom 1. August bis 31. Juli, sie wird nur einmal gebaut und von Generierung
+und Exporten gemeinsam benutzt. Exporte, die Tag für Tag geschrieben werden, holen sich die Tabelle mit
+calendar_containing(date, table) und verwenden sie weiter, solange der Tag darin liegt.
+
+Author: pascal.blum@nikoit.de
+"""
+import datetime
+from functools import lru_cache
+import numpy as np
+
+WEEKDAYS = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+MONTHS = ["Januar", "Februar", "März", "April", "Mai", "Juni", "Juli", "August", "September", "Oktober", "November", "Dezember"]
+
+# Ordinal vom 01.01.1970, für die Umrechnung nach datetime64
+EPOCH = 719163
+
+
+def school_year_bounds(year):
+    """Erster und letzter Tag des Schuljahres, das im September von year beginnt.
+
+    Beginn ist der 1. September, fällt er auf Freitag bis Sonntag, der Montag danach. Ende ist der letzte
+    Sonntag im Juli des Folgejahres.
+    """
+    start_date = datetime.date(year, 9, 1)
+    if start_date.weekday() > 3:
+        start_date += datetime.timedelta(days=7 - start_date.weekday())
+    end_date = datetime.date(year + 1, 7, 31)
+    end_date -= datetime.timedelta(days=(end_date.weekday() + 1) % 7)
+    return start_date, end_date
+
+
+class CalendarTable:
+    def __init__(self, first, last):
+        # first, last: Ordinals des ersten und letzten Tages (einschließlich)
+        self.first = first
+        self.ordinal = np.arange(first, last + 1, dtype=np.int64)
+
+        # Wochentag und ISO-Kalenderwoche direkt aus dem Ordinal (01.01.0001 ist ein Montag)
+        self.weekday = (self.ordinal - 1) % 7
+        thursdays = self.ordinal - self.weekday + 3
+        self.iso_year = (thursdays - EPOCH).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+        jan_first = np.fromiter(
+            (datetime.date(y, 1, 1).toordinal() for y in range(int(self.iso_year.min()), int(self.iso_year.max()) + 1)),
+            dtype=np.int64
+        )
+        self.week = (thursdays - jan_first[self.iso_year - self.iso_year.min()]) // 7 + 1
+
+        self.dates = [datetime.date.fromordinal(ordinal) for ordinal in range(first, last + 1)]
+        self.month = np.fromiter((day.month for day in self.dates), dtype=np.int64, count=len(self.dates))
+        self.weekday_names = [WEEKDAYS[weekday] for weekday in self.weekday]
+        self.month_names = [f"{MONTHS[day.month - 1]} {day.year}" for day in self.dates]
+        self.date_de = [f"{day.day:02d}.{day.month:02d}.{day.year:04d}" for day in self.dates]
+        self.date_short = [f"{day.day:02d}.{day.month:02d}.{day.year % 100:02d}" for day in self.dates]
+        self.date_ics = [f"{day.year:04d}{day.month:02d}{day.day:02d}" for day in self.dates]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def index(self, date):
+        return date.toordinal() - self.first
+
+    def indices(self, schedule):
+        """Index in die Tabelle für jeden Eintrag des Plans."""
+        return np.fromiter((entry['date'].toordinal() for entry in schedule), dtype=np.int64, count=len(schedule)) - self.first
+
+
+@lru_cache(maxsize=16)
+def calendar_between(first, last):
+    """Tabelle für die Ordinals first bis last, wird pro Zeitraum nur einmal gebaut."""
+    return CalendarTable(int(first), int(last))
+
+
+def calendar_for_school_year(year):
+    """Tabelle vom 1. August year bis 31. Juli year + 1, enthält also das ganze Schuljahr."""
+    return calendar_between(datetime.date(year, 8, 1).toordinal(), datetime.date(year + 1, 7, 31).toordinal())
+
+
+def calendar_containing(date, table=None):
+    """Tabelle, in der date liegt. Enthält table (z.B. die Tabelle vom vorherigen Tag) den Tag schon, wird sie
+    ohne Nachschlagen im Cache weiterverwendet."""
+    if table is not None and 0 <= date.toordinal() - table.first < len(table):
+        return table
+    return calendar_for_school_year(date.year if date.month >= 8 else date.year - 1)
@@ -0,0 +1,148 @@
+"""
+Versioniertes Änderungsprotokoll für Bearbeitungen der CSV-Daten über die Admin-Oberfläche.
+
+Jede Änderung (update/delete/reorder/add) wird als eine JSON-Zeile mit fortlaufender Versionsnummer an
+data/changes.jsonl angehängt. Neben den neuen Werten wird gespeichert, was zum Rückgängig machen nötig ist
+(alter Wert, gelöschte Zeile, ...). Ein Rollback auf Version X wendet die Umkehrungen aller späteren
+Einträge rückwärts an und protokolliert sie selbst wieder als neue Einträge, das Protokoll bleibt also
+reines Anhängen und es werden nie ganze Dateien kopiert.
+
+Jeder Eintrag enthält außerdem den Stand der Datei nach der Änderung ("fingerprint", siehe repository.py).
+Wurde eine Datei seitdem an der Admin-Oberfläche vorbei geändert (Excel, Backup wiederhergestellt, ...),
+passen die Zeilennummern der Einträge nicht mehr und der Rollback wird mit einem RollbackConflict abgelehnt.
+
+Alle Änderungen laufen unter einer Dateisperre. Vorher werden neue Zeilen, die ein anderer Worker-Prozess
+angehängt hat, nachgeladen, damit die Versionsnummern über alle Prozesse eindeutig bleiben.
+
+Author: pascal.blum@nikoit.de
+"""
+import json
+import os
+from datetime import datetime
+from locks import file_lock
+from repository import CSVRepository
+
+
+class RollbackConflict(ValueError):
+    """Eine Datei entspricht nicht mehr dem zuletzt protokollierten Stand."""
+
+
+class ChangeLog:
+    def __init__(self, data_dir, log_file=None, repository=None):
+        self.data_dir = data_dir
+        # Die Änderungen selbst führt das Repository aus (CSV-Dateien oder SQLite, siehe repository.py)
+        self.repository = repository or CSVRepository(data_dir)
+        self.log_file = log_file or os.path.join(data_dir, 'changes.jsonl')
+        self.lock_file = f"{self.log_file}.lock"
+        self.entries = []
+        self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        """Lädt Einträge nach, die seit dem letzten Lesen (auch von anderen Prozessen) angehängt wurden."""
+        if not os.path.exists(self.log_file) or os.path.getsize(self.log_file) == self.offset:
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    self.entries.append(json.loads(line))
+                self.offset += len(line)
+
+    @property
+    def version(self):
+        return self.entries[-1]['version'] if self.entries else 0
+
+    def append(self, entry):
+        entry = {"version": self.version + 1, "timestamp": datetime.now().isoformat(timespec='seconds'), **entry}
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.log_file, 'ab') as f:
+            f.write(line)
+        self.entries.append(entry)
+        self.offset += len(line)
+        return entry
+
+    def apply(self, filename, op, params, user=None, rollback_of=None):
+        """Führt eine Änderung an der Datei aus und protokolliert sie mit den Daten für die Umkehrung."""
+        with file_lock(self.lock_file):
+            self.refresh()
+            return self.apply_locked(filename, op, params, user, rollback_of)
+
+    def apply_locked(self, filename, op, params, user=None, rollback_of=None):
+        change = {"file": filename, "op": op, "user": user}
+        if rollback_of is not None:
+            change["rollback_of"] = rollback_of
+        change.update(self.repository.edit(filename, op, params))
+        change["fingerprint"] = self.repository.fingerprint(filename)
+        return self.append(change)
+
+    def inverse(self, entry):
+        """Gibt (op, params) zurück, die den Eintrag rückgängig machen."""
+        op = entry['op']
+        if op == 'update':
+            return 'update', {"index": entry['index'], "column": entry['column'], "value": entry['old']}
+        if op == 'delete':
+            return 'insert', {"index": entry['index'], "row": entry['row']}
+        if op in ('insert', 'add'):
+            return 'delete', {"index": entry['index']}
+        if op == 'reorder':
+            order = entry['order']
+            return 'reorder', {"order": sorted(range(len(order)), key=lambda position: order[position])}
+        raise ValueError(f"Unbekannte Operation '{op}'")
+
+    def between(self, from_version, to_version=None):
+        """Alle Einträge mit from_version < version <= to_version."""
+        self.refresh()
+        to_version = self.version if to_version is None else to_version
+        # Versionen sind lückenlos ab 1, der Eintrag zu Version v liegt an Position v - 1
+        return self.entries[max(from_version, 0):max(to_version, 0)]
+
+    def diff(self, from_version, to_version=None):
+        """Geänderte Zeilen pro Datei zwischen zwei Versionen."""
+        to_version = self.version if to_version is None else to_version
+        changes = {}
+        if from_version <= to_version:
+            entries, direction = self.between(from_version, to_version), 'forward'
+        else:
+            entries, direction = list(reversed(self.between(to_version, from_version))), 'backward'
+
+        for entry in entries:
+            if direction == 'backward':
+                op, params = self.inverse(entry)
+                inverted = {**entry, "op": op, **params}
+                if op == 'update':
+                    inverted['old'] = entry['value']
+                entry = inverted
+            changes.setdefault(entry['file'], []).append({
+                key: value for key, value in entry.items() if key not in ('file', 'rollback_of', 'fingerprint')
+            })
+        return {"from": from_version, "to": to_version, "direction": direction, "files": changes}
+
+    def check_unchanged(self, entries):
+        """Prüft, dass jede betroffene Datei noch dem Stand ihres letzten Eintrags im Protokoll entspricht.
+        Einträge aus älteren Protokollen ohne fingerprint werden nicht geprüft."""
+        latest = {}
+        for entry in self.entries:
+            latest[entry['file']] = entry.get('fingerprint')
+        for filename in sorted({entry['file'] for entry in entries}):
+            expected = latest[filename]
+            if expected is not None and self.repository.fingerprint(filename) != expected:
+                raise RollbackConflict(
+                    f"'{filename}' wurde seit der letzten protokollierten Änderung außerhalb der Admin-Oberfläche "
+                    f"geändert, ein Rollback ist nicht mehr möglich"
+                )
+
+    def rollback(self, version, user=None):
+        """Setzt alle Dateien auf den Stand von version zurück."""
+        with file_lock(self.lock_file):
+            self.refresh()
+            if not 0 <= version <= self.version:
+                raise ValueError(f"Version {version} existiert nicht")
+            self.check_unchanged(self.between(version, self.version))
+            applied = []
+            for entry in reversed(self.between(version, self.version)):
+                op, params = self.inverse(entry)
+                applied.append(self.apply_locked(entry['file'], op, params, user=user, rollback_of=entry['version']))
+            return applied
@@ -0,0 +1,136 @@
+"""
+Feiertage, Schließzeiten und Brückentage als kompakte Bereichs-Struktur.
+
+Die Spalte 'Datum' in Feiertage_Schließzeiten_Brückentage.csv versteht folgende Schreibweisen:
+- 24.12.2024                  einzelner Tag
+- 24.12.2024-06.01.2025       Bereich von-bis (auch mit '–')
+- 01.05.                      jedes Jahr wiederkehrender Tag
+- 24.12.-06.01.               jedes Jahr wiederkehrender Bereich (darf über den Jahreswechsel gehen)
+- Ostern+1 / Ostern-2         jedes Jahr relativ zum Ostersonntag (Ostermontag / Karfreitag)
+
+Feste Tage und Bereiche liegen in einem IntervalSet, wiederkehrende Regeln werden beim ersten Zugriff
+auf ein Jahr einmalig für dieses Jahr in das IntervalSet eingetragen. Der Kalender wird mit dem Scheduler
+von mehreren Request-Threads geteilt: expand() trägt die Regeln unter einer Sperre in eine Kopie ein und
+tauscht das IntervalSet danach als Ganzes aus, Leser sehen also nie halb geänderte Arrays.
+
+Author: pascal.blum@nikoit.de
+"""
+import datetime
+import re
+import threading
+import numpy as np
+from intervals import IntervalSet
+
+DATE_PATTERN = r"(\d{1,2})\.(\d{1,2})\.(\d{4})?"
+DATE_RE = re.compile(rf"^{DATE_PATTERN}$")
+RANGE_RE = re.compile(rf"^{DATE_PATTERN}\s*[-–]\s*{DATE_PATTERN}$")
+EASTER_RE = re.compile(r"^Ostern\s*(?:([+-])\s*(\d+))?$", re.IGNORECASE)
+
+
+def easter_sunday(year):
+    """Ostersonntag nach der Gaußschen Osterformel (gregorianischer Kalender)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+class ClosureCalendar:
+    def __init__(self):
+        self.intervals = IntervalSet()
+        self.rules = []
+        self.expanded_years = frozenset()
+        self.lock = threading.Lock()
+
+    # add, add_rule und parse nur beim Laden, bevor der Kalender zwischen Threads geteilt wird
+    def add(self, date, end=None):
+        self.intervals.add(date, end)
+
+    def add_rule(self, rule):
+        """Wiederkehrende Regel: Funktion year -> (start, end) oder None."""
+        self.rules.append(rule)
+        for year in self.expanded_years:
+            self.apply_rule(rule, year, self.intervals)
+
+    def apply_rule(self, rule, year, intervals):
+        try:
+            days = rule(year)
+        except ValueError:
+            # z.B. 29.02. in einem Nicht-Schaltjahr
+            return
+        if days:
+            intervals.add(*days)
+
+    def expand(self, year):
+        # Vorjahr mit aufnehmen, damit Bereiche über den Jahreswechsel (24.12.-06.01.) greifen
+        if {year - 1, year} <= self.expanded_years:
+            return
+        with self.lock:
+            missing = sorted({year - 1, year} - self.expanded_years)
+            if not missing:
+                return
+            intervals = self.intervals.copy()
+            for target in missing:
+                for rule in self.rules:
+                    self.apply_rule(rule, target, intervals)
+            self.intervals = intervals
+            self.expanded_years = self.expanded_years | set(missing)
+
+    def __contains__(self, date):
+        if self.rules:
+            self.expand(date.year)
+        return date in self.intervals
+
+    def mask(self, ordinals):
+        """Vektorisierte Prüfung für ein Array von Ordinalen."""
+        ordinals = np.asarray(ordinals)
+        if self.rules and ordinals.size:
+            first = datetime.date.fromordinal(int(ordinals.min())).year
+            last = datetime.date.fromordinal(int(ordinals.max())).year
+            for year in range(first, last + 1):
+                self.expand(year)
+        return self.intervals.mask(ordinals)
+
+    def parse(self, text):
+        """Wertet eine Zeile der Spalte 'Datum' aus und trägt sie ein."""
+        text = text.strip()
+
+        match = EASTER_RE.match(text)
+        if match:
+            sign, days = match.groups()
+            offset = int(days or 0) * (-1 if sign == '-' else 1)
+            self.add_rule(lambda year: (easter_sunday(year) + datetime.timedelta(days=offset),) * 2)
+            return
+
+        match = DATE_RE.match(text)
+        if match:
+            day, month, year = match.groups()
+            if year:
+                self.add(datetime.date(int(year), int(month), int(day)))
+            else:
+                self.add_rule(lambda y: (datetime.date(y, int(month), int(day)),) * 2)
+            return
+
+        match = RANGE_RE.match(text)
+        if match:
+            day1, month1, year1, day2, month2, year2 = match.groups()
+            if year1 and year2:
+                self.add(datetime.date(int(year1), int(month1), int(day1)), datetime.date(int(year2), int(month2), int(day2)))
+            elif not year1 and not year2:
+                wraps = (int(month2), int(day2)) < (int(month1), int(day1))
+                self.add_rule(lambda y: (
+                    datetime.date(y, int(month1), int(day1)),
+                    datetime.date(y + 1 if wraps else y, int(month2), int(day2))
+                ))
+            else:
+                raise ValueError(f"Bereich '{text}' braucht entweder zwei oder keine Jahreszahl")
+            return
+
+        raise ValueError(f"Unbekanntes Datumsformat '{text}'")
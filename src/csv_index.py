@@ -0,0 +1,135 @@
+"""
+In-Memory-Index über die CSV-Dateien für die serverseitige Paginierung der Admin-Tabellen.
+
+Eine Datei wird nur neu eingelesen, wenn sich mtime/Größe geändert haben. Pro Zeile wird ein kleingeschriebener
+Suchtext vorgehalten, Sortierreihenfolgen pro Spalte werden beim ersten Bedarf berechnet und bis zur nächsten
+Änderung wiederverwendet. Die Abfrage folgt dem serverseitigen Protokoll von DataTables
+(draw, start, length, search[value], order[0][column], order[0][dir], columns[i][search][value]).
+
+Author: pascal.blum@nikoit.de
+"""
+import csv
+import json
+import os
+import threading
+
+
+class CSVTable:
+    def __init__(self, columns, rows):
+        self.columns = list(columns)
+        width = len(self.columns)
+        self.rows = [(list(row) + [''] * width)[:width] for row in rows if row]
+        self.search_text = ['\x1f'.join(row).lower() for row in self.rows]
+        self.lower_cells = None
+        self.orders = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, filepath):
+        with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f, delimiter=';')
+            return cls(next(reader, []), reader)
+
+    def order(self, column, descending=False):
+        """Zeilenreihenfolge sortiert nach einer Spalte (Zahlen numerisch, sonst alphabetisch)."""
+        with self.lock:
+            if column not in self.orders:
+                def key(position):
+                    value = self.rows[position][column]
+                    try:
+                        return (0, float(value.replace(',', '.')), '')
+                    except ValueError:
+                        return (1, 0, value.lower())
+                self.orders[column] = sorted(range(len(self.rows)), key=key)
+            order = self.orders[column]
+        return order[::-1] if descending else order
+
+    def lowered(self):
+        with self.lock:
+            if self.lower_cells is None:
+                self.lower_cells = [[cell.lower() for cell in row] for row in self.rows]
+        return self.lower_cells
+
+    def query(self, search='', column_search=None, order_column=None, descending=False):
+        """Gibt die Positionen der passenden Zeilen in der gewünschten Reihenfolge zurück."""
+        positions = range(len(self.rows)) if order_column is None else self.order(order_column, descending)
+
+        search = (search or '').strip().lower()
+        column_search = {column: value.strip().lower() for column, value in (column_search or {}).items() if value and value.strip()}
+        if not search and not column_search:
+            return list(positions)
+
+        cells = self.lowered() if column_search else None
+        return [
+            position for position in positions
+            if (not search or search in self.search_text[position])
+            and all(value in cells[position][column] for column, value in column_search.items())
+        ]
+
+    def record(self, position):
+        record = dict(zip(self.columns, self.rows[position]))
+        # Position in der Datei, für update/delete
+        record['_index'] = position
+        return record
+
+
+class CSVIndex:
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def get(self, filepath):
+        stat = os.stat(filepath)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.tables.get(filepath)
+            if cached and cached[0] == signature:
+                return cached[1]
+        table = CSVTable.from_file(filepath)
+        with self.lock:
+            self.tables[filepath] = (signature, table)
+        return table
+
+
+def parse_datatables_args(args, columns):
+    """Liest die DataTables-Parameter aus request.args."""
+    order_column = args.get('order[0][column]', type=int)
+    if order_column is not None and not 0 <= order_column < len(columns):
+        order_column = None
+    column_search = {}
+    for column in range(len(columns)):
+        value = args.get(f'columns[{column}][search][value]')
+        if value:
+            column_search[column] = value
+    return {
+        "draw": args.get('draw', 0, type=int),
+        "start": max(args.get('start', 0, type=int), 0),
+        "length": args.get('length', -1, type=int),
+        "search": args.get('search[value]', ''),
+        "column_search": column_search,
+        "order_column": order_column,
+        "descending": args.get('order[0][dir]', 'asc') == 'desc'
+    }
+
+
+def stream_page(table, params):
+    """Erzeugt die JSON-Antwort stückweise, ohne alle Datensätze vorher als Liste aufzubauen."""
+    positions = table.query(params['search'], params['column_search'], params['order_column'], params['descending'])
+    start = params['start']
+    end = len(positions) if params['length'] is None or params['length'] < 0 else start + params['length']
+
+    yield (
+        '{"draw": %d, "recordsTotal": %d, "recordsFiltered": %d, "columns": %s, "data": ['
+        % (params['draw'], len(table.rows), len(positions), json.dumps(table.columns, ensure_ascii=False))
+    )
+    for count, position in enumerate(positions[start:end]):
+        yield (',' if count else '') + json.dumps(table.record(position), ensure_ascii=False)
+    yield ']}'
+
+
+def stream_all(table):
+    """Alte Antwortform {"columns": [...], "data": [...]} für Aufrufe ohne Paginierung, ebenfalls gestreamt."""
+    yield '{"columns": %s, "data": [' % json.dumps(table.columns, ensure_ascii=False)
+    for position in range(len(table.rows)):
+        yield (',' if position else '') + json.dumps(dict(zip(table.columns, table.rows[position])), ensure_ascii=False)
+    yield ']}'
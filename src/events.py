@@ -0,0 +1,82 @@
+"""
+Einfacher In-Process-Verteiler für Server-Sent Events.
+
+Jeder offene Browser-Tab bekommt eine eigene Queue. publish() legt das Event in alle Queues, stream()
+liefert die Events im SSE-Format und schickt regelmäßig einen Kommentar als Keep-Alive, damit Proxies
+die Verbindung nicht schließen.
+
+Läuft die App mit mehreren Worker-Prozessen, erreicht publish() nur die Tabs im eigenen Prozess. Dafür
+kann stream() eine poll-Funktion bekommen, die regelmäßig den gemeinsamen Zustand im Dateisystem prüft
+und bei Änderungen selbst ein Event liefert.
+
+Jeder offene Stream belegt einen Worker-Thread. Deshalb endet ein Stream nach max_age Sekunden, der Browser
+verbindet sich (EventSource) nach retry Millisekunden von selbst neu. Tote Verbindungen halten so keinen Thread
+dauerhaft fest. Die Anzeigen mit dem Plan benutzen keine Streams, sondern fragen per ETag/304 nach (siehe
+/api/plan/version).
+
+Author: pascal.blum@nikoit.de
+"""
+import json
+import queue
+import threading
+import time
+
+
+class EventBroker:
+    def __init__(self, keepalive=25, poll_interval=2, max_age=300, retry=3000):
+        self.keepalive = keepalive
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self.retry = retry
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=100)
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    @staticmethod
+    def format(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def publish(self, event, data):
+        message = self.format(event, data)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Tab hängt, Verbindung wird beim nächsten Keep-Alive aufgeräumt
+                self.unsubscribe(subscriber)
+
+    def stream(self, initial=None, poll=None):
+        """Generator für eine Flask-Response mit mimetype 'text/event-stream'."""
+        subscriber = self.subscribe()
+        timeout = self.poll_interval if poll else self.keepalive
+        last_sent = time.monotonic()
+        deadline = last_sent + self.max_age
+        try:
+            yield f"retry: {self.retry}\n\n"
+            if initial:
+                yield initial
+            while time.monotonic() < deadline:
+                try:
+                    message = subscriber.get(timeout=timeout)
+                except queue.Empty:
+                    message = poll() if poll else None
+                if message:
+                    yield message
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= self.keepalive:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscriber)
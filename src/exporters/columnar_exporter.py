@@ -0,0 +1,81 @@
+"""
+Exportiert den Geschirrspühlplan spaltenorientiert für Auswertungen über mehrere Jahre und Standorte.
+
+Je nach Dateiendung wird Parquet (*.parquet) oder Feather (*.feather) geschrieben, beides braucht pyarrow,
+oder ohne zusätzliche Abhängigkeit ein NumPy-Archiv (*.npz). Die Namen werden als Codes gespeichert, die auf die Spalte
+'names' verweisen (-1 = kein Dienst).
+"""
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+except ImportError:
+    pa = None
+
+import numpy as np
+from slots import DEFAULT_SLOTS
+
+
+class ColumnarExporter:
+    def encode(self, schedule, slots=DEFAULT_SLOTS):
+        """Wandelt den Plan in Spalten (Ordinal, ein Code-Array pro Slot) und eine Namensliste um."""
+        names = []
+        codes = {}
+
+        def code(name):
+            if not name or name == ' - ':
+                return -1
+            if name not in codes:
+                codes[name] = len(names)
+                names.append(name)
+            return codes[name]
+
+        count = len(schedule)
+        ordinals = np.empty(count, dtype=np.int32)
+        columns = {slot.key: np.empty(count, dtype=np.int16) for slot in slots}
+        for i, entry in enumerate(schedule):
+            ordinals[i] = entry['date'].toordinal()
+            for key, column in columns.items():
+                column[i] = code(entry[key])
+
+        return ordinals, columns, names
+
+    def export(self, schedule, output_file, slots=DEFAULT_SLOTS):
+        try:
+            ordinals, columns, names = self.encode(schedule, slots)
+            extension = os.path.splitext(output_file)[1].lower()
+
+            if extension not in ('.parquet', '.feather', '.npz'):
+                raise ValueError(f"Unbekanntes Format '{extension}', möglich sind *.parquet, *.feather und *.npz")
+            if extension in ('.parquet', '.feather') and pa is None:
+                raise ValueError(f"Für *{extension} wird pyarrow benötigt (pip install pyarrow), ohne pyarrow *.npz verwenden")
+
+            if extension in ('.parquet', '.feather'):
+                # Datum als date32 (Tage seit 1970-01-01), Namen als Dictionary-Spalte
+                epoch = 719163
+                name_array = pa.array(names, type=pa.string())
+                table = pa.table({
+                    'datum': pa.array(ordinals - epoch, type=pa.int32()).cast(pa.date32()),
+                    **{
+                        slot.label.lower(): pa.DictionaryArray.from_arrays(
+                            pa.array(columns[slot.key], mask=columns[slot.key] < 0).cast(pa.int16()), name_array
+                        )
+                        for slot in slots
+                    }
+                })
+                if extension == '.parquet':
+                    parquet.write_table(table, output_file)
+                else:
+                    feather.write_feather(table, output_file)
+                return
+
+            np.savez_compressed(
+                output_file,
+                ordinal=ordinals,
+                names=np.array(names, dtype=str),
+                **columns
+            )
+        except Exception as e:
+            raise ValueError(f"Fehler beim speichern zu Parquet/Feather/NPZ: {e}")
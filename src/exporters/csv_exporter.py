@@ -1,16 +1,48 @@
 import csv
+import gzip
+from calendar_table import calendar_containing
+from exporters.sink import drive, primed
+from slots import DEFAULT_SLOTS
 
 class CSVExporter:
-    def export(self, schedule, output_file):
+    def __init__(self, compress=False):
+        # compress=True oder eine Ausgabedatei mit *.gz-Endung schreibt gzip-komprimiert
+        self.compress = compress
+
+    def rows(self, entries, slots=DEFAULT_SLOTS, table=None):
+        """CSV-Zeilen für Einträge aus einem Schuljahr. Die Kalendertabelle wird einmal nachgeschlagen und die
+        Indizes aller Tage auf einmal berechnet, ohne pro Eintrag ein dict oder strftime zu erzeugen."""
+        keys = [slot.key for slot in slots]
+        table = table or calendar_containing(entries[0]['date'])
+        date_de = table.date_de
+        for index, entry in zip(table.indices(entries), entries):
+            yield (date_de[index], *(entry[key] or '' for key in keys))
+
+    def open_output(self, output_file):
+        if self.compress or output_file.endswith('.gz'):
+            return gzip.open(output_file, 'wt', newline='', encoding='utf-8-sig')
+        return open(output_file, 'w', newline='', encoding='utf-8-sig')
+
+    @primed
+    def sink(self, output_file, slots=DEFAULT_SLOTS):
+        """Schreibt die per send(entry) übergebenen Einträge direkt in die Datei, send(None) schließt sie ab."""
         try:
-            with open(output_file, 'w', newline='', encoding='utf-8-sig') as file:
-                writer = csv.DictWriter(file, fieldnames=['datum', 'dienst', 'vertretung'], delimiter=';')
-                writer.writeheader()
-                for entry in schedule:
-                    writer.writerow({
-                        'datum': entry['date'].strftime('%d.%m.%Y'),
-                        'dienst': entry['primary'] or '',
-                        'vertretung': entry['secondary'] or ''
-                    })
+            with self.open_output(output_file) as file:
+                writer = csv.writer(file, delimiter=';')
+                writer.writerow(['datum'] + [slot.label.lower() for slot in slots])
+                # Einträge werden pro Schuljahr gesammelt und zusammen mit writerows geschrieben
+                table, batch = None, []
+                while (entry := (yield)) is not None:
+                    if batch and not table.dates[0] <= entry['date'] <= table.dates[-1]:
+                        writer.writerows(self.rows(batch, slots, table))
+                        batch = []
+                    if not batch:
+                        table = calendar_containing(entry['date'])
+                    batch.append(entry)
+                if batch:
+                    writer.writerows(self.rows(batch, slots, table))
         except Exception as e:
             raise ValueError(f"Fehler beim speichern zu CSV: {e}")
+
+    def export(self, schedule, output_file, slots=DEFAULT_SLOTS):
+        drive(self.sink(output_file, slots), schedule)
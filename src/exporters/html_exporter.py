@@ -1,498 +1,146 @@
 """
 Expotiert den Geschirrspühlplan-Objekt in eine HTML-Seite.
 
+Die Seite wird aus den Jinja2-Templates templates/plan.html und templates/plan/* gerendert (mit Autoescaping
+für die Namen). Kompilierte Templates landen in einem Bytecode-Cache auf der Festplatte, damit nicht jeder
+Prozess sie neu übersetzen muss. Das Verzeichnis kommt aus PLAN_TEMPLATE_CACHE, sonst nimmt Jinja2 sein eigenes
+Verzeichnis pro Benutzer im Temp-Verzeichnis und prüft, dass es nur diesem Benutzer gehört.
+stream() liefert die Seite stückweise für die Live-Ansicht in Flask, sink() schreibt sie Eintrag für Eintrag in
+eine Datei (statischer Export und Pipeline). Beide nutzen dieselben Templates für Kopf, Zeile und Fuß.
+
+Mit offline_pages schreibt export() zusätzlich ein Web-App-Manifest und einen Service Worker (sw.js) neben die
+Seite. Der Worker legt die Seiten pro Plan-Version im Cache ab, wiederholte Aufrufe (Kiosk-Tablets, Handys)
+kommen ohne Anfrage an den Server aus und funktionieren auch, wenn der Server kurz nicht erreichbar ist.
+
 Author: pascal.blum@nikoit.de
 """
-import locale
+import os
 from datetime import datetime
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from calendar_table import calendar_containing
+from exporters.sink import drive, primed
+from slots import DEFAULT_SLOTS
 
-locale.setlocale(locale.LC_TIME, 'de_DE.UTF-8')
-
-class HTMLExporter:
-    
-    def get_theme_styles(self):
-        return {
-            "light": """
-                body {
-                    font-family: Arial, sans-serif;
-                    margin: 20px;
-                    line-height: 1.6em;
-                    background-color: #f9f9f9;
-                    color: #333;
-                }
-                caption {
-                    font-size: 2rem;
-                    font-weight: bold;
-                    text-align: center;
-                    margin: 20px 0px;
-                }
-                .badge {
-                    font-size: x-small;
-                    background-color: blue;
-                    color: white;
-                    padding: 4px 8px;
-                    text-align: center;
-                    border-radius: 5px;
-                    vertical-align: super;
-                }
-                table {
-                    border-collapse: collapse;
-                    width: 100%;
-                    max-width: 1000px;
-                    margin: 0px auto;
-                }
-                th, td {
-                    border: 1px solid #ccc;
-                    padding: 7px;
-                    text-align: center;
-                }
-                th {
-                    background-color: #2c3e50;
-                    color: #ffffff;
-                    position: sticky;
-                    position: -webkit-sticky;
-                    top: 0px;
-                    z-index: 2;
-                }
-                .month-header {
-                    background-color: #34495e;
-                    color: #ffffff;
-                    font-size: 1.2em;
-                    font-weight: bold;
-                }
-                .weekday {
-                    background-color: #f4f4f4;
-                }
-                .weekday-weekend {
-                    background-color: #ffe0b2;
-                }
-                .weekday-weekday {
-                    background-color: #ffffff;
-                }
-                .holiday {
-                    background-color: #e8e8e8;
-                    color: #7a7a7a;
-                }
-                .highlight {
-                    border: 14px solid orange;
-                    position: relative;
-                    box-sizing: border-box;
-                    border-collapse: separate;
-                }
-                .highlight td {
-                    border: none;
-                }
-                @media (max-width: 768px) {
-                    table {
-                        font-size: 0.9em;
-                    }
-                    th, td {
-                        padding: 8px;
-                    }
-                }
-                .bold {
-                    font-weight: bold;
-                }
-                .table-container {
-                    overflow-x: auto;
-                    -webkit-overflow-scrolling: touch;
-                }
-                @media print {
-                    .print-hidden {
-                        display: none !important;
-                    }
-                }
-            """,
-            "dark": """
-                body {
-                    font-family: Arial, sans-serif;
-                    margin: 20px;
-                    line-height: 1.6em;
-                    background-color: #121212;
-                    color: #e0e0e0;
-                }
-                caption {
-                    font-size: 2rem;
-                    font-weight: bold;
-                    text-align: center;
-                    margin: 20px 0px;
-                }
-                .badge {
-                    font-size: x-small;
-                    background-color: blue;
-                    color: white;
-                    padding: 4px 8px;
-                    text-align: center;
-                    border-radius: 5px;
-                    vertical-align: super;
-                }
-                table {
-                    border-collapse: collapse;
-                    width: 100%;
-                    max-width: 1000px;
-                    margin: 0px auto;
-                }
-                th, td {
-                    border: 1px solid #444;
-                    padding: 10px;
-                    text-align: center;
-                }
-                th {
-                    background-color: #333333;
-                    color: orange;
-                    position: sticky;
-                    position: -webkit-sticky;
-                    top: 0px;
-                    z-index: 2;
-                }
-                .month-header {
-                    background-color: #444444;
-                    color: #e0e0e0;
-                    font-size: 1.2em;
-                    font-weight: bold;
-                }
-                .weekday {
-                    background-color: #1e1e1e;
-                }
-                .weekday-weekend {
-                    background-color: #2a2a2a;
-                }
-                .weekday-weekday {
-                    background-color: #242424;
-                }
-                .holiday {
-                    background-color: #3a3a3a;
-                    color: #b0b0b0;
-                }
-                .highlight {
-                    border: 14px solid orange;
-                    position: relative;
-                    box-sizing: border-box;
-                    border-collapse: separate;
-                }
-                .highlight td {
-                    border: none;
-                }
-                @media (max-width: 768px) {
-                    table {
-                        font-size: 0.9em;
-                    }
-                    th, td {
-                        padding: 8px;
-                    }
-                }
-                .bold {
-                    font-weight: bold;
-                }
-                @media print {
-                    .print-hidden {
-                        display: none !important;
-                    }
-                }
-            """,
-            "print": """
-                body {
-                    font-family: Arial, sans-serif;
-                    margin: 20px;
-                }
-                table {
-                    border-collapse: collapse;
-                    width: 100%;
-                }
-                caption {
-                    font-size: 2rem;
-                    font-weight: bold;
-                    text-align: center;
-                    margin: 20px 0px;
-                }
-                .badge {
-                    font-size: x-small;
-                    padding: 4px 8px;
-                    text-align: center;
-                    vertical-align: super;
-                }
-                th, td {
-                    border: 1px solid #ccc;
-                    text-align: center;
-                }
-                tr:nth-child(odd):not(:nth-child(-n+2)) {
-                    background-color: #f1f1f1;
-                }
-                .month-header {
-                    font-size: 1.2em;
-                    font-weight: bold;
-                }
-                .wrapper {
-                    overflow-x: auto;
-                }
-                .bold {
-                    font-weight: bold;
-                }
-                @media print {
-                    .print-hidden {
-                        display: none !important;
-                    }
-                }
-            """
-        }
-    
-    def format_name(self, name):
-        parts = name.split()
-        return f"{parts[0]} {parts[-1][0]}." if len(parts) > 1 else name if parts else ""
-
-    def export(self, schedule, output_file):
-        try:
-            today = datetime.now().strftime('%d.%m.%y')
-            styles = self.get_theme_styles()
-            
-            with open(output_file, 'w', encoding='utf-8-sig') as file:
-                file.write(f"""
-                <!DOCTYPE html>
-                <html lang="de">
-                <head>
-                    <meta charset="UTF-8">
-                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                    <title>Spühlmaschinen-Plan - aktualisiert am {today}</title>
-                    <style id="theme-style">{styles['light']}</style>
-                    <script>
-                        function scrollToTodayRow() {{
-                            const highlightedRow = document.querySelector('.highlight');
-                            if (highlightedRow) {{
-                                requestAnimationFrame(() => {{
-                                    highlightedRow.scrollIntoView({{ behavior: 'smooth', block: 'center' }});
-                                }});
-                            }}
-                        }}
-
-                        function setTheme(theme) {{
-                            document.getElementById('theme-style').innerHTML = {{
-                                'light': `{styles['light']}`,
-                                'dark': `{styles['dark']}`,
-                                'print': `{styles['print']}`
-                            }}[theme] || `{styles['light']}`;
-                            localStorage.setItem('theme', theme);
-                        }}
-
-                        function highlightTodayRows() {{
-                            const currentDate = new Intl.DateTimeFormat('de-DE', {{
-                                    day: '2-digit',
-                                    month: '2-digit',
-                                    year: '2-digit'
-                                    }}).format(new Date());
-                                    
-                            const tbodyRows = document.querySelector('table tbody').querySelectorAll('tr');
-                            
-                            tbodyRows.forEach(row => {{
-                                const dateCell = row.querySelector('td:nth-child(2)');
-                                if (dateCell) {{
-                                    const rowDate = dateCell.textContent.trim();
-                                    if (rowDate === currentDate) {{
-                                        row.classList.add('highlight');
-                                    }}
-                                }}
-                            }});
-                        }}
-
-                        function populateFilterDropdown() {{
-                            const dropdown = document.getElementById('row-filter');
-                            const monthHeaders = document.querySelectorAll('.month-header');
-                            const tbodyRows = document.querySelectorAll('table tbody tr');
-                            let months = [];
-
-                            // Add a custom row count option
-                            const rowCountOption = document.createElement('option');
-                            rowCountOption.value = '10';
-                            rowCountOption.textContent = '10 Zeilen';
-                            dropdown.appendChild(rowCountOption);
-
-                            // Add an option to show all rows
-                            const allRowsOption = document.createElement('option');
-                            allRowsOption.value = 'all';
-                            allRowsOption.textContent = 'Alle';
-                            dropdown.appendChild(allRowsOption);
-
-
-
-                            // Collect unique months from the table
-                            monthHeaders.forEach(header => {{
-                                const monthText = header.querySelector('td').textContent.trim();
-                                if (months.indexOf(monthText) === -1) {{
-                                    months.push(monthText);
-                                }}
-                            }});
-
-                            // Populate the dropdown with months and row options
-                            months.forEach(month => {{
-                                const option = document.createElement('option');
-                                option.value = month;
-                                option.textContent = month;
-                                dropdown.appendChild(option);
-                            }});
-                        }}
-
-                        function filterRows() {{
-                            const dropdown = document.getElementById('row-filter');
-                            const selectedValue = dropdown.value;
-                            const tbodyRows = document.querySelectorAll('table tbody tr');
-                            let todayIndex = -1; // Use this to find the target row index if needed
-                            let monthRows = [];
-                            let currentMonth = null; // Variable to track the current month
-
-                            if (selectedValue === '10') {{
-                                    const highlightedRow = document.querySelector('.highlight');
-                                    if (!highlightedRow) return;
-
-                                    const tbodyRows = document.querySelectorAll('table tbody tr');
-                                    const todayIndex = [...tbodyRows].indexOf(highlightedRow);
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+OFFLINE_MANIFEST = 'manifest.webmanifest'
+OFFLINE_WORKER = 'sw.js'
 
-                                    tbodyRows.forEach((row, index) => {{
-                                        if (index >= todayIndex - 5 && index <= todayIndex + 5) {{
-                                            row.style.display = ''; // Show row within the buffer
-                                        }} else {{
-                                            row.style.display = 'none'; // Hide row outside the buffer
-                                        }}
-                                    }});
+_environment = None
 
-                                    scrollToTodayRow();
-                                    return; // Exit early from the rest of the filtering logic
-                                }}
 
-                            tbodyRows.forEach((row, index) => {{
-                                const isMonthHeader = row.classList.contains('month-header');
-                                const isDateRow = row.classList.contains('weekday-weekday') || row.classList.contains('weekday-weekend');
-                                const rowDateText = row.querySelector('td') ? row.querySelector('td').textContent.trim() : '';
+def format_name(name):
+    parts = name.split()
+    return f"{parts[0]} {parts[-1][0]}." if len(parts) > 1 else name if parts else ""
 
-                                // Handling the month selection
-                                if (selectedValue !== 'all' && selectedValue !== '10') {{
-                                    if (isMonthHeader) {{
-                                        // If the row is a month header, check if it matches the selected month
-                                        currentMonth = rowDateText; // Set the current month
-                                        if (currentMonth === selectedValue) {{
-                                            monthRows.push(index); // Include this month header
-                                        }}
-                                    }}
-                                    // If it's a date row, include it if the currentMonth matches the selected month
-                                    if (isDateRow && currentMonth === selectedValue) {{
-                                        monthRows.push(index); // Include this date row
-                                    }}
-                                }}
-                            }});
 
-                            // Show or hide rows based on the selected month
-                            tbodyRows.forEach((row, index) => {{
-                                if (selectedValue === 'all' || monthRows.includes(index)) {{
-                                    row.style.display = ''; // Show row if it matches the filter
-                                }} else {{
-                                    row.style.display = 'none'; // Hide row otherwise
-                                }}
-                            }});
+def template_environment():
+    """Gemeinsame Jinja2-Umgebung für alle Exporte im Prozess."""
+    global _environment
+    if _environment is None:
+        cache_dir = os.environ.get('PLAN_TEMPLATE_CACHE')
+        if cache_dir:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=select_autoescape(['html']),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir)
+        )
+        _environment.filters['short_name'] = format_name
+    return _environment
 
-                            // Optional: Scroll to the highlighted row if needed
-                            scrollToTodayRow();
-                        }}
 
-                        window.onload = function() {{
-                                highlightTodayRows();
-
-                                const savedTheme = localStorage.getItem('theme') || 'light';
-                                setTheme(savedTheme);
-
-                                scrollToTodayRow();
-
-                                const themeSelect = document.getElementById('theme-select');
-                                if (themeSelect) {{
-                                    themeSelect.value = savedTheme;
-                                }}
-
-                                filterRows();
-                            }}
-
-                        document.addEventListener("DOMContentLoaded", function () {{
-                            populateFilterDropdown();
-                            //checkbox = document.getElementById('showallCheckbox');
-                            //checkbox.addEventListener('change', filterRows);
-                            
-                        }});
-                    </script>
-                </head>
-                <body>
-                    <div class="wrapper">
-                        <div class="print-hidden" style="position: fixed; bottom: 5px; right: 10px; display: grid; grid-template-columns: repeat(3, auto); gap: 10px; z-index: 1;">
-                            <!-- Admin Redirect Button -->
-                            <button onclick="window.location.href='/admin/'" style="font-size: 20px; border: none; background: transparent; cursor: pointer;">
-                                ⚙️
-                            </button>
-
-                            <!-- Filter Dropdown -->
-                            <select id="row-filter" onchange="filterRows()">
-                            </select>
-
-                            
-                            <!-- Theme Selector -->
-                            <select id="theme-select" onchange="setTheme(this.value); scrollToTodayRow();" style="height: 30px; border: 4px solid red;">
-                                <option value="light">Light</option>
-                                <option value="dark">Dark</option>
-                                <option value="print">Print</option>
-                            </select>
-
-                        </div>
-                        <table>
-                            <caption>Spühlmaschinen-Plan <span class="badge">stand {today}</span></caption>
-                            <thead>
-                                <tr>
-                                    <th>KW</th>
-                                    <th>Datum</th>
-                                    <th>Wochentag</th>
-                                    <th>Dienst</th>
-                                    <th>Vertretung</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                """)
-                
-                current_month = None
-                weekdays = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
-                months = ["Januar", "Februar", "März", "April", "Mai", "Juni", "Juli", "August", "September", "Oktober", "November", "Dezember"]
-
-
-                for entry in schedule:
-                    entry_date = entry['date'].strftime('%d.%m.%y')
-                    date_obj = datetime.strptime(entry_date, '%d.%m.%y')
-                    calendar_week = entry['date'].isocalendar()[1]
-                    weekday_index = entry['date'].weekday()
-                    weekday = weekdays[weekday_index]
-                    entry_month = entry['date'].strftime('%B %Y')
+class HTMLExporter:
 
-                    is_holiday = " - " in entry['primary'] or " - " in entry['secondary']
-                    is_weekend = weekday_index >= 5
-                    holiday_class = "holiday" if is_holiday and not is_weekend else ""
+    def __init__(self, plan_version=None, site_prefix='', offline_pages=None):
+        # Mit plan_version lädt sich die Seite über /api/plan/events selbst neu, sobald ein neuer Plan live ist
+        self.plan_version = plan_version
+        # Präfix des Standorts für Links und API-Aufrufe, z.B. '/muenchen' (siehe sites.py)
+        self.site_prefix = site_prefix
+        # URLs der Seite relativ zum Ausgabeverzeichnis, die der Service Worker cacht, z.B. ['./', 'plan'].
+        # Nur zusammen mit plan_version, ohne Version gäbe es keinen Schlüssel für den Cache
+        self.offline_pages = list(offline_pages or []) if plan_version else []
+
+    def row(self, entry, slots, table, previous=None):
+        """Eine Tabellenzeile für das Template. previous ist das Datum der vorherigen Zeile, beginnt mit diesem
+        Eintrag ein neuer Monat, bekommt die Zeile eine Monatsüberschrift."""
+        date = entry['date']
+        index = table.index(date)
+        is_weekend = table.weekday[index] >= 5
+
+        is_holiday = any(" - " in entry[slot.key] for slot in slots)
+        holiday_class = "holiday" if is_holiday and not is_weekend else ""
+        # highlighting vom heutigen Tag wird vom javascript gemacht
+        weekday_class = "weekday-weekend" if is_weekend else "weekday-weekday"
+
+        new_month = previous is None or (previous.year, previous.month) != (date.year, date.month)
 
-                    if current_month != entry_month:
-                        current_month = entry_month
-                        file.write(f"""
-                        <tr class='month-header'>
-                            <td colspan='5'>{months[date_obj.month - 1]} {date_obj.year}</td>
-                        </tr>
-                        """)
+        return {
+            "month": table.month_names[index] if new_month else None,
+            "classes": " ".join(filter(None, [weekday_class, holiday_class])),
+            "week": int(table.week[index]),
+            "date": table.date_short[index],
+            "weekday": table.weekday_names[index],
+            "names": [entry[slot.key] for slot in slots]
+        }
 
-                    # legacy code. highlighting wird vom javascript nun gemacht
-                    highlight_class = ""
-                    weekday_class = "weekday-weekday" if weekday_index < 5 else "weekday-weekend"
-                    row_classes = " ".join(filter(None, [weekday_class, holiday_class, highlight_class]))
+    def rows(self, schedule, slots=DEFAULT_SLOTS):
+        """Tabellenzeilen für das Template als Generator, mit Monatsüberschrift beim ersten Tag eines Monats."""
+        table = previous = None
+        for entry in schedule:
+            table = calendar_containing(entry['date'], table)
+            yield self.row(entry, slots, table, previous)
+            previous = entry['date']
 
-                    formatted_primary = self.format_name(entry['primary'])
-                    formatted_secondary = self.format_name(entry['secondary'])
+    def context(self, slots):
+        return {
+            "today": datetime.now().strftime('%d.%m.%y'),
+            "plan_version": self.plan_version,
+            "site_prefix": self.site_prefix,
+            "offline": bool(self.offline_pages),
+            "offline_pages": self.offline_pages,
+            "slots": slots
+        }
 
-                    file.write(f"""
-                    <tr class='{row_classes}'>
-                        <td>{calendar_week}</td>
-                        <td class='bold'>{entry_date}</td>
-                        <td>{weekday}</td>
-                        <td class='bold'>{formatted_primary}</td>
-                        <td>{formatted_secondary}</td>
-                    </tr>
-                    """)
-                
-                file.write("""</tbody></table></div></body></html>""")
+    def stream(self, schedule, slots=DEFAULT_SLOTS):
+        """Rendert die Seite stückweise (jinja2.TemplateStream)."""
+        template = template_environment().get_template('plan.html')
+        stream = template.stream(rows=self.rows(schedule, slots), **self.context(slots))
+        stream.enable_buffering(64)
+        return stream
+
+    @primed
+    def sink(self, output_file, slots=DEFAULT_SLOTS):
+        """Schreibt die per send(entry) übergebenen Einträge direkt in die Datei, send(None) schließt die Seite ab.
+        Kopf, Zeilen und Fuß kommen aus denselben Templates wie bei stream()."""
+        environment = template_environment()
+        context = self.context(slots)
+        try:
+            with open(output_file, 'w', encoding='utf-8-sig') as file:
+                file.write(environment.get_template('plan/head.html').render(context))
+                row_template = environment.get_template('plan/row.html')
+                table = previous = None
+                while (entry := (yield)) is not None:
+                    table = calendar_containing(entry['date'], table)
+                    file.write("\n" + row_template.render(context, row=self.row(entry, slots, table, previous)))
+                    previous = entry['date']
+                file.write("\n" + environment.get_template('plan/foot.html').render(context))
         except Exception as e:
             raise ValueError(f"Fehler beim speichern zu HTML: {e}")
+
+    def write_offline_files(self, output_dir):
+        """Schreibt manifest.webmanifest und sw.js für die aktuelle Plan-Version nach output_dir."""
+        environment = template_environment()
+        context = self.context(DEFAULT_SLOTS)
+        try:
+            for filename in (OFFLINE_MANIFEST, OFFLINE_WORKER):
+                target = os.path.join(output_dir, filename)
+                with open(f"{target}.tmp", 'w', encoding='utf-8') as file:
+                    file.write(environment.get_template(f'plan/{filename}').render(context))
+                os.replace(f"{target}.tmp", target)
+        except Exception as e:
+            raise ValueError(f"Fehler beim speichern des Service Workers: {e}")
+
+    def export(self, schedule, output_file, slots=DEFAULT_SLOTS):
+        drive(self.sink(output_file, slots), schedule)
+        if self.offline_pages:
+            self.write_offline_files(os.path.dirname(output_file) or '.')
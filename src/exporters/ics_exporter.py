@@ -1,41 +1,55 @@
 from datetime import datetime
+from calendar_table import calendar_containing
+from exporters.sink import drive, primed
+from slots import DEFAULT_SLOTS
 
 class ICSExporter:
-    def export(self, schedule, output_file):
-        try:
-            ics_data = "BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//NikoIT//NONSGML v1.0//EN\n"
-            
-            dtstamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-
-            for entry in schedule:
-                date_str = entry['date'].strftime('%Y%m%d')
-                primary = entry['primary']
-                secondary = entry['secondary']
+    def events(self, entries, slots, dtstamp, table):
+        """Termine für Einträge aus einem Schuljahr, die Indizes in die Kalendertabelle werden auf einmal berechnet."""
+        date_ics = table.date_ics
+        for index, entry in zip(table.indices(entries), entries):
+            date_str = date_ics[index]
+
+            for position, slot in enumerate(slots):
+                name = entry[slot.key]
+                # Der erste Slot ohne Präfix, die weiteren z.B. "VERTR.: "
+                prefix = f"{slot.short}: " if position else ""
+                if position and name == ' - ':
+                    continue
 
                 event = f"BEGIN:VEVENT\n"
-                event += f"SUMMARY:{primary}\n"
+                event += f"SUMMARY:{prefix}{name}\n"
                 event += f"DTSTART;VALUE=DATE:{date_str}\n"
                 event += f"DTSTAMP:{dtstamp}\n"
                 event += f"END:VEVENT\n"
-                
-                ics_data += event
-
-                if secondary != ' - ':
-                    event_secondary = f"BEGIN:VEVENT\n"
-                    event_secondary += f"SUMMARY:VERTR.: {secondary}\n"
-                    event_secondary += f"DTSTART;VALUE=DATE:{date_str}\n"
-                    event_secondary += f"DTSTAMP:{dtstamp}\n"
-                    event_secondary += f"END:VEVENT\n"
-
-                    ics_data += event_secondary
 
-                event += f"\n"
-
-            ics_data += "END:VCALENDAR"
+                yield event
 
+    @primed
+    def sink(self, output_file, slots=DEFAULT_SLOTS):
+        """Schreibt die per send(entry) übergebenen Einträge als Termine, send(None) schließt den Kalender ab."""
+        try:
             with open(output_file, 'w', encoding='utf-8-sig') as f:
-                f.write(ics_data)
+                f.write("BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//NikoIT//NONSGML v1.0//EN\n")
+
+                dtstamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+                # Einträge werden wie beim CSV-Export pro Schuljahr gesammelt und zusammen geschrieben
+                table, batch = None, []
+                while (entry := (yield)) is not None:
+                    if batch and not table.dates[0] <= entry['date'] <= table.dates[-1]:
+                        f.writelines(self.events(batch, slots, dtstamp, table))
+                        batch = []
+                    if not batch:
+                        table = calendar_containing(entry['date'])
+                    batch.append(entry)
+                if batch:
+                    f.writelines(self.events(batch, slots, dtstamp, table))
+
+                f.write("END:VCALENDAR")
             print(f"ICS gespeichert in {output_file}")
 
         except Exception as e:
             raise ValueError(f"Fehler beim speicher zu ICS: {e}")
+
+    def export(self, schedule, output_file, slots=DEFAULT_SLOTS):
+        drive(self.sink(output_file, slots), schedule)
@@ -0,0 +1,33 @@
+"""
+Hilfsfunktionen für Exporte, die den Plan Eintrag für Eintrag schreiben (Sinks).
+
+Ein Sink ist ein Generator, der die Einträge per send(entry) bekommt und mit send(None) abgeschlossen wird.
+Der Rückgabewert des Generators (z.B. die Statistik) ist das Ergebnis von finish().
+"""
+import functools
+
+
+def primed(func):
+    """Startet den Generator bis zum ersten yield, danach kann direkt send(entry) aufgerufen werden."""
+    @functools.wraps(func)
+    def start(*args, **kwargs):
+        generator = func(*args, **kwargs)
+        next(generator)
+        return generator
+    return start
+
+
+def finish(target):
+    """Schließt den Sink ab und gibt sein Ergebnis zurück."""
+    try:
+        target.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("Sink wurde nach dem Abschluss nicht beendet")
+
+
+def drive(target, entries):
+    """Schreibt alle Einträge in den Sink und schließt ihn ab."""
+    for entry in entries:
+        target.send(entry)
+    return finish(target)
@@ -4,69 +4,130 @@ und Schließzeiten und teilt die Azubis gleichmäßig für ihre Dienste inklusiv
 
 Author: pascal.blum@nikoit.de
 """
-import datetime
 import csv
-import hashlib
 import os
-from collections import defaultdict, deque
+import random
+from collections import defaultdict
+import numpy as np
+from absences import AbsenceIndex
+from calendar_table import calendar_between, calendar_for_school_year, school_year_bounds
+from closures import ClosureCalendar
+from optimizer import FairnessOptimizer
+from overrides import OverrideTable, adjust_statistics, validate_changes
+from pipeline import StatisticsAccumulator, export_sink, school_year_of, split_sink, statistics_sink, tee
+from rotation import RotationState, azubi_name
+from slots import load_slots, slots_from_rows
+from exporters.columnar_exporter import ColumnarExporter
 from exporters.csv_exporter import CSVExporter
 from exporters.html_exporter import HTMLExporter
 from exporters.ics_exporter import ICSExporter
 
+# Werte der Spalte Rolle in Azubis.csv -> (darf Dienst, darf Vertretung), leer = beides
+ROLES = {
+    '': (True, True),
+    'dienst': (True, False),
+    'vertretung': (False, True)
+}
+
+
+def azubi_from_row(row):
+    """Baut den Azubi-Eintrag aus einer Zeile von Azubis.csv, die Rolle wird dabei einmalig aufgelöst."""
+    role = (row.get('Rolle') or '').strip().lower()
+    if role not in ROLES:
+        raise ValueError(f"Unbekannte Rolle '{row['Rolle']}' bei {row['Vorname']} {row['Nachname']}")
+    can_primary, can_secondary = ROLES[role]
+    return {
+        'firstname': row['Vorname'],
+        'lastname': row['Nachname'],
+        'year': int(row['Lehrjahr']),
+        'can_primary': can_primary,
+        'can_secondary': can_secondary
+    }
+
 class CleaningDutyScheduler:
-    def __init__(self, azubis_file, blockweeks_file, holidays_file):
+    def __init__(self, azubis_file, blockweeks_file, holidays_file, absences_file=None, slots_file=None, repository=None):
+        # Mit repository (siehe repository.py) werden die Daten nicht aus den Dateien, sondern über das Repository
+        # geladen, die Dateinamen dienen dann nur noch als Tabellennamen (z.B. aus der SQLite-Datenbank)
+        self.repository = repository
         self.azubis_file = azubis_file
         self.blockweeks_file = blockweeks_file
         self.holidays_file = holidays_file
+        self.absences_file = absences_file
+        self.slots_file = slots_file
 
         self.azubis = []
         self.blockweeks = defaultdict(list)
-        self.holidays = set()
+        self.holidays = ClosureCalendar()
+        self.absences = AbsenceIndex()
+        self.azubi_index = {}
+        self.violations = []
+        self.rotation_state = None
         self.theme = None
 
         self.load_azubis()
         self.load_blockweeks()
         self.load_holidays()
+        self.load_absences()
+        if repository is not None:
+            self.slots = slots_from_rows(repository.rows(os.path.basename(slots_file)) if slots_file else None)
+        else:
+            self.slots = load_slots(slots_file)
+
+    def read_rows(self, data_file):
+        """Zeilen einer Datendatei als dicts, aus der CSV-Datei oder über das Repository."""
+        if self.repository is not None:
+            rows = self.repository.rows(os.path.basename(data_file))
+            if rows is None:
+                raise FileNotFoundError(f"Keine Daten für {os.path.basename(data_file)}")
+            return rows
+        with open(data_file, 'r', encoding='utf-8-sig') as file:
+            return list(csv.DictReader(file, delimiter=';'))
 
     def load_azubis(self):
         try:
-            with open(self.azubis_file, 'r', encoding='utf-8-sig') as file:
-                reader = csv.DictReader(file, delimiter=';')
-                for row in reader:
-                    ignore = row['Ignorieren'].strip()
-                    if not ignore:
-                        self.azubis.append({
-                            'firstname': row['Vorname'],
-                            'lastname': row['Nachname'],
-                            'year': int(row['Lehrjahr'])
-                        })
+            for row in self.read_rows(self.azubis_file):
+                ignore = row['Ignorieren'].strip()
+                if not ignore:
+                    self.azubis.append(azubi_from_row(row))
+            self.index_azubis()
         except Exception as e:
             raise ValueError(f"Fehler beim laden der Azubis: {e}")
 
+    def index_azubis(self):
+        """Name -> Position in self.azubis, muss nach jeder Änderung an self.azubis neu aufgebaut werden"""
+        self.azubi_index = {
+            f"{azubi['firstname']} {azubi['lastname']}": index for index, azubi in enumerate(self.azubis)
+        }
+
     def load_blockweeks(self):
         """Ladet die Blockwochen für die 1/2/3 Lehrjahr Azubis"""
         try:
-            with open(self.blockweeks_file, 'r', encoding='utf-8-sig') as file:
-                reader = csv.DictReader(file, delimiter=';')
-                for row in reader:
-                    year = int(row['Jahr'])
-                    lehrjahr = int(row['Lehrjahr'])
-                    week = int(row['Kalenderwoche'])
-                    self.blockweeks[(year, lehrjahr)].append(week)
+            for row in self.read_rows(self.blockweeks_file):
+                year = int(row['Jahr'])
+                lehrjahr = int(row['Lehrjahr'])
+                week = int(row['Kalenderwoche'])
+                self.blockweeks[(year, lehrjahr)].append(week)
         except Exception as e:
             raise ValueError(f"Fehler beim laden der Schulwochen: {e}")
 
     def load_holidays(self):
-        """Ladet die Datei mit den Feiertagen und Schließzeiten"""
+        """Ladet die Datei mit den Feiertagen und Schließzeiten (einzelne Tage, Bereiche und wiederkehrende Regeln)"""
         try:
-            with open(self.holidays_file, 'r', encoding='utf-8-sig') as file:
-                reader = csv.DictReader(file, delimiter=';')
-                for row in reader:
-                    date = datetime.datetime.strptime(row['Datum'], '%d.%m.%Y').date()
-                    self.holidays.add(date)
+            for row in self.read_rows(self.holidays_file):
+                if row['Datum'] and row['Datum'].strip():
+                    self.holidays.parse(row['Datum'])
         except Exception as e:
             raise ValueError(f"Fehler beim laden der Urlaubstage/Schließzeiten: {e}")
 
+    def load_absences(self):
+        """Ladet die individuellen Abwesenheiten (Urlaub, Praktikum, Krankheit) der Azubis"""
+        if self.absences_file and self.repository is not None:
+            rows = self.repository.rows(os.path.basename(self.absences_file))
+            if rows is not None:
+                self.absences = AbsenceIndex.from_rows(rows)
+        elif self.absences_file and os.path.exists(self.absences_file):
+            self.absences = AbsenceIndex.from_csv(self.absences_file)
+
     def is_weekend(self, date):
         """Prüft ob an dem Tag ein Wochenende ist"""
         return date.weekday() in [5, 6]  # Samstag / Sonntag
@@ -80,104 +141,132 @@ class CleaningDutyScheduler:
         return week in self.blockweeks.get((year, lehrjahr), [])
 
     def get_school_year_start_end(self, year):
-        # Wann das Schuljahr anfängt z.B. 1. September
-        start_date = datetime.date(year, 9, 1)
-        if start_date.weekday() > 3:  # Wenn 1. September auf ein Donnerstag fällt
-            start_date += datetime.timedelta(days=(7 - start_date.weekday()))  # Auf den nächsten Montag verschieben
-        end_date = datetime.date(year + 1, 7, 31)
-        while end_date.weekday() != 6:  # Letzter Tag soll der Sonntag in der letzten Juni Woche sein
-            end_date -= datetime.timedelta(days=1)
-        return start_date, end_date
+        # Wann das Schuljahr anfängt z.B. 1. September, siehe calendar_table.school_year_bounds
+        return school_year_bounds(year)
     
 
-    def generate_schedule(self, year, include_all_dates=False):
-        schedule = []
-        azubi_list = deque(self.azubis)
-        secondary_list = deque(reversed(self.azubis))
-        last_primary = None
+    def availability_matrix(self, dates):
+        """Boolesche Matrix [Tag x Azubi]: True, wenn der Azubi an dem Tag weder in der Schule noch abwesend ist."""
+        matrix = np.ones((len(dates), len(self.azubis)), dtype=bool)
+        lehrjahre = np.array([azubi['year'] for azubi in self.azubis], dtype=np.int64)
+        if not dates:
+            return matrix
+        table = calendar_between(min(dates).toordinal(), max(dates).toordinal())
+        for row, date in enumerate(dates):
+            index = table.index(date)
+            iso_year, week = int(table.iso_year[index]), int(table.week[index])
+            for lehrjahr in np.unique(lehrjahre):
+                if self.is_blockweek(iso_year, week, lehrjahr):
+                    matrix[row, lehrjahre == lehrjahr] = False
+            for name in self.absences.absent_names(date):
+                if name in self.azubi_index:
+                    matrix[row, self.azubi_index[name]] = False
+        return matrix
+
+    def slot_allowed(self, slot):
+        """Boolesches Array [Azubi]: ob der Azubi laut Spalte Rolle überhaupt für den Slot in Frage kommt."""
+        return np.array([slot.allows(azubi) for azubi in self.azubis], dtype=bool)
+
+    def generate_schedule(self, year, include_all_dates=False, optimize=False, time_budget=0.5, state=None, seed=None):
+        """Erstellt den Plan für das Schuljahr. Mit optimize=True wird das Ergebnis des Greedy-Durchlaufs
+        anschließend vom FairnessOptimizer innerhalb von time_budget Sekunden nachgebessert.
+        Mit state (RotationState) wird die Rotation samt Zählern vom vorherigen Schuljahr fortgesetzt
+        und am Ende des Schuljahres im state aktualisiert. Mit seed wird die Start-Reihenfolge der Rotation
+        reproduzierbar gemischt, der gleiche seed liefert immer den gleichen Plan."""
+        schedule = list(self.iter_schedule(year, include_all_dates=include_all_dates, state=state, seed=seed))
+
+        self.violations = self.validate_schedule(schedule, year)
+
+        if optimize:
+            schedule = FairnessOptimizer(self, time_budget=time_budget).optimize(schedule, year)
+
+        return schedule
+
+    def iter_schedule(self, year, include_all_dates=False, state=None, seed=None):
+        """Greedy-Durchlauf von generate_schedule als Generator, liefert die Einträge Tag für Tag.
+        Prüfung und Optimierung brauchen den ganzen Plan und fehlen hier. Der state wird erst aktualisiert,
+        wenn der Generator vollständig durchlaufen ist."""
+        if state is None:
+            state = RotationState()
 
         # tracking
-        primary_counts = {f"{azubi['firstname']} {azubi['lastname']}": 0 for azubi in self.azubis}
-        secondary_counts = {f"{azubi['firstname']} {azubi['lastname']}": 0 for azubi in self.azubis}
+        azubis = self.azubis
+        if seed is not None:
+            azubis = list(self.azubis)
+            random.Random(seed).shuffle(azubis)
+        keys = [slot.key for slot in self.slots]
+        orders, counts = state.restore(azubis, keys)
+        last = {key: state.last.get(key) for key in keys}
+
+        # Rollen-Einschränkungen einmal pro Schuljahr anwenden, nicht in der Schleife pro Tag.
+        # rank: Position in der Rotation des Slots, bei gleichem Zähler kommt die vordere Person dran
+        ranks = {}
+        for slot in self.slots:
+            orders[slot.key] = [azubi for azubi in orders[slot.key] if slot.allows(azubi)]
+            ranks[slot.key] = {azubi_name(azubi): rank for rank, azubi in enumerate(orders[slot.key])}
+
+        names = [azubi_name(azubi) for azubi in azubis]
+        lehrjahre = [azubi['year'] for azubi in azubis]
+        all_lehrjahre = set(lehrjahre)
 
         start_date, end_date = self.get_school_year_start_end(year)
-        current_date = start_date
+        table = calendar_for_school_year(year)
+        closed = self.holidays.mask(table.ordinal) | (table.weekday >= 5)
 
-        while current_date <= end_date:
+        for index in range(table.index(start_date), table.index(end_date) + 1):
+            current_date = table.dates[index]
             entry = {'date': current_date}
 
-            if not (self.is_weekend(current_date) or self.is_holiday(current_date)):
-                iso_year, week, _ = current_date.isocalendar()
-
-                # Business Logic für die primären Dienst
-                eligible_primary = None
-                rotated_primary = []
-                for _ in range(len(azubi_list)):
-                    candidate = azubi_list.popleft()
-                    primary_name = f"{candidate['firstname']} {candidate['lastname']}"
-                    primary_hashed = hashlib.sha256(primary_name.encode()).hexdigest()
-
-                    # :)
-                    if primary_hashed == "2cbc48af22f903a080441fa01823167ae4712eef705679c40d58f8bdce079aca":
-                        continue
-
-                    if not self.is_blockweek(iso_year, week, candidate['year']) and candidate != last_primary:
-                        if (
-                            eligible_primary is None
-                            or primary_counts[primary_name] < primary_counts[eligible_primary]
-                        ):
-                            eligible_primary = primary_name
-                    rotated_primary.append(candidate)
-
-                azubi_list.extend(rotated_primary)
-
-                if eligible_primary:
-                    primary = eligible_primary
-                    last_primary = primary
-                    primary_counts[primary] += 1
-                    entry['primary'] = primary
-                else:
-                    entry['primary'] = ' - '
-
-                # Business Logic für den sekundaren (Vertretung) Dienst
-                eligible_secondary = None
-                rotated_secondary = []
-                for _ in range(len(secondary_list)):
-                    candidate = secondary_list.popleft()
-                    secondary_name = f"{candidate['firstname']} {candidate['lastname']}"
-
-                    if secondary_name != primary and not self.is_blockweek(iso_year, week, candidate['year']):
-                        if (
-                            eligible_secondary is None
-                            or secondary_counts[secondary_name] < secondary_counts[eligible_secondary]
-                        ):
-                            eligible_secondary = secondary_name
-                    rotated_secondary.append(candidate)
-
-                # Liste wiederherstellen
-                secondary_list.extend(rotated_secondary)
-
-                if eligible_secondary:
-                    secondary = eligible_secondary
-                    secondary_counts[secondary] += 1
-                    entry['secondary'] = secondary
-                else:
-                    entry['secondary'] = ' - '
+            if not closed[index]:
+                iso_year, week = int(table.iso_year[index]), int(table.week[index])
+                absent = self.absences.absent_names(current_date)
+
+                # Eine gemeinsame Verfügbarkeitsprüfung pro Tag für alle Slots
+                blocked = {lehrjahr for lehrjahr in all_lehrjahre if self.is_blockweek(iso_year, week, lehrjahr)}
+                available = [
+                    name for name, lehrjahr in zip(names, lehrjahre)
+                    if lehrjahr not in blocked and name not in absent
+                ]
+
+                # Slots der Reihe nach besetzen, wer schon eingeteilt ist, fällt für die weiteren Slots weg
+                taken = set()
+                for slot in self.slots:
+                    rank = ranks[slot.key]
+                    slot_counts = counts[slot.key]
+                    blocked_name = None if slot.consecutive else last[slot.key]
+
+                    chosen = None
+                    for name in available:
+                        if name in taken or name == blocked_name or name not in rank:
+                            continue
+                        if chosen is None or (slot_counts[name], rank[name]) < (slot_counts[chosen], rank[chosen]):
+                            chosen = name
+
+                    if chosen:
+                        taken.add(chosen)
+                        last[slot.key] = chosen
+                        slot_counts[chosen] += 1
+                        entry[slot.key] = chosen
+                    else:
+                        entry[slot.key] = ' - '
             else:
-                entry['primary'] = ' - ' if include_all_dates else None
-                entry['secondary'] = ' - ' if include_all_dates else None
-
-            if include_all_dates or (entry['primary'] and entry['secondary']):
-                schedule.append(entry)
+                for key in keys:
+                    entry[key] = ' - ' if include_all_dates else None
 
-            current_date += datetime.timedelta(days=1)
+            if include_all_dates or all(entry[key] for key in keys):
+                yield entry
 
-        try:
-            self.validate_schedule(schedule)
-        except:
-            pass
+        state.capture(year, orders, counts, last)
+        self.rotation_state = state
 
-        return schedule
+    def iter_years(self, start_year, count, include_all_dates=False, state=None):
+        """Generiert mehrere Schuljahre hintereinander mit durchgehender Rotation, als ein Strom von Einträgen über
+        alle Schuljahre (siehe pipeline.py). Es liegt nie ein ganzes Schuljahr im Speicher. Der übergebene state
+        wird fortgeschrieben und kann danach mit state.save() gespeichert werden."""
+        if state is None:
+            state = RotationState()
+        for year in range(start_year, start_year + count):
+            yield from self.iter_schedule(year, include_all_dates=include_all_dates, state=state)
 
     def filter_schedule_by_month(self, schedule, year, month):
         filtered_schedule = [
@@ -192,108 +281,185 @@ class CleaningDutyScheduler:
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        exporter.export(schedule, output_file)
+        exporter.export(schedule, output_file, self.slots)
 
 
 
-    def validate_schedule(self, schedule, school_year_start):
-        """Testet den generierten Plan gegenüber Azubis, Urlaub, Schließzeiten und Schulwochen"""
-        school_year_start_date, school_year_end_date = self.get_school_year_start_end(school_year_start)
+    def validate_schedule(self, schedule, school_year_start=None):
+        """Testet den generierten Plan gegenüber Azubis, Urlaub, Schließzeiten und Schulwochen.
 
-        for entry in schedule:
-            date = entry['date']
-            
-            # Schuljahr validieren
-            if not (school_year_start_date <= date <= school_year_end_date):
-                print(f"Validierungs Fehler: {date} is außerhalb des Schulzeitraum.")
-                continue
-            
-            week = date.isocalendar()[1]
-            
-            # Primärdienst validieren
-            primary_name = entry.get('primary')
-            if primary_name != ' - ':
-                primary_azubi = next((azubi for azubi in self.azubis if f"{azubi['firstname']} {azubi['lastname']}" == primary_name), None)
-                if primary_azubi and self.is_blockweek(date.year, week, primary_azubi['year']):
-                    print(f"Validierungs Fehler: {primary_name} zugewiesen während Schulwoche {week} an {date}")
-            
-            # Sekundardienst validieren
-            secondary_name = entry.get('secondary')
-            if secondary_name != ' - ':
-                secondary_azubi = next((azubi for azubi in self.azubis if f"{azubi['firstname']} {azubi['lastname']}" == secondary_name), None)
-                if secondary_azubi and self.is_blockweek(date.year, week, secondary_azubi['year']):
-                    print(f"Validierungs Fehler: {secondary_name} zugewiesen während Schulwoche {week} an {date}")
+        Alle Regeln werden über NumPy-Arrays für den ganzen Plan auf einmal geprüft. Zurückgegeben wird
+        eine Liste von Verstößen als dicts mit 'date', 'rule', 'role', 'name' und 'message'.
+        """
+        count = len(schedule)
+        if count == 0:
+            return []
 
+        def name_code(name):
+            if not name or name == ' - ':
+                return -1
+            return self.azubi_index.get(name, -2)
 
-    def generate_statistics(self, schedule):
-        """Statistiken für die Azubis generieren."""
-        stats = {
-            f"{azubi['firstname']} {azubi['lastname']}": {
-                'primary': 0,
-                'secondary': 0,
-                'year': azubi['year']
-            }
-            for azubi in self.azubis
+        ordinals = np.fromiter((entry['date'].toordinal() for entry in schedule), dtype=np.int64, count=count)
+        codes = {
+            slot.key: np.fromiter((name_code(entry.get(slot.key)) for entry in schedule), dtype=np.int32, count=count)
+            for slot in self.slots
         }
 
-        for entry in schedule:
-            primary = entry.get('primary')
-            secondary = entry.get('secondary')
-
-            try:
-                if primary:
-                    stats[primary]['primary'] += 1
-
-                if secondary:
-                    stats[secondary]['secondary'] += 1
-            except:
-                pass
+        # Wochentag und ISO-Kalenderwoche aus der gemeinsamen Kalendertabelle
+        table = calendar_between(ordinals.min(), ordinals.max())
+        days = ordinals - table.first
+        weekdays = table.weekday[days]
+        iso_years = table.iso_year[days]
+        weeks = table.week[days]
+
+        names = list(self.azubi_index)
+        lehrjahre = np.array([azubi['year'] for azubi in self.azubis] or [0], dtype=np.int64)
+        block_keys = np.array(sorted(
+            (year * 100 + week) * 100 + lehrjahr
+            for (year, lehrjahr), block in self.blockweeks.items()
+            for week in block
+        ), dtype=np.int64)
+        closed = self.holidays.mask(ordinals)
+        weekend = weekdays >= 5
+        week_keys = (iso_years * 100 + weeks) * 100
+
+        masks = []
+        if school_year_start is not None:
+            school_year_start_date, school_year_end_date = self.get_school_year_start_end(school_year_start)
+            outside = (ordinals < school_year_start_date.toordinal()) | (ordinals > school_year_end_date.toordinal())
+            masks.append(('school_year', None, outside, "liegt außerhalb des Schulzeitraums"))
+
+        for slot in self.slots:
+            role, role_codes = slot.key, codes[slot.key]
+            assigned = role_codes >= 0
+            blocked = assigned & np.isin(week_keys + lehrjahre[np.where(assigned, role_codes, 0)], block_keys)
+            # Das angehängte True ist nur Platzhalter für Tage ohne Zuweisung
+            allowed = np.append(self.slot_allowed(slot), True)[np.where(assigned, role_codes, len(self.azubis))]
+            masks.append(('unknown', role, role_codes == -2, "ist keinem aktiven Azubi zugeordnet"))
+            masks.append(('blockweek', role, blocked, "zugewiesen während einer Schulwoche"))
+            masks.append(('absence', role, self.absences.mask(ordinals, role_codes, names), "zugewiesen während einer Abwesenheit"))
+            masks.append(('holiday', role, assigned & closed, "zugewiesen an einem Feiertag/Schließtag"))
+            masks.append(('weekend', role, assigned & weekend, "zugewiesen an einem Wochenende"))
+            masks.append(('role', role, assigned & ~allowed, f"darf laut Rolle nicht für {slot.label} eingeteilt werden"))
+
+        # Dieselbe Person in zwei Slots am selben Tag, gemeldet beim späteren Slot
+        for position, slot in enumerate(self.slots):
+            for earlier in self.slots[:position]:
+                same = (codes[slot.key] >= 0) & (codes[slot.key] == codes[earlier.key])
+                masks.append(('same_person', slot.key, same, f"ist gleichzeitig {earlier.label} und {slot.label}"))
+
+        # Gleicher Slot an zwei aufeinanderfolgenden Arbeitstagen (Tage ohne Zuweisung werden übersprungen)
+        for slot in self.slots:
+            if slot.consecutive:
+                continue
+            slot_codes = codes[slot.key]
+            assigned_rows = np.flatnonzero(slot_codes >= 0)
+            repeated = np.zeros(count, dtype=bool)
+            repeated[assigned_rows[1:][slot_codes[assigned_rows[1:]] == slot_codes[assigned_rows[:-1]]]] = True
+            masks.append(('consecutive', slot.key, repeated, f"hat an zwei aufeinanderfolgenden Arbeitstagen {slot.label}"))
+
+        violations = []
+        for rule, role, mask, text in masks:
+            for row in np.flatnonzero(mask):
+                entry = schedule[row]
+                name = entry.get(role) if role else None
+                violations.append({
+                    'date': entry['date'],
+                    'rule': rule,
+                    'role': role,
+                    'name': name,
+                    'message': f"{table.date_de[days[row]]}: {name + ' ' if name else ''}{text} (KW {weeks[row]})"
+                })
+
+        violations.sort(key=lambda violation: violation['date'])
+        return violations
 
-        sorted_stats = dict(sorted(
-            stats.items(),
-            key=lambda item: (item[1]['primary'] + item[1]['secondary']),
-            reverse=True
-        ))
 
-        return sorted_stats
+    def generate_statistics(self, schedule):
+        """Statistiken für die Azubis generieren."""
+        statistics = StatisticsAccumulator(self)
+        for entry in schedule:
+            statistics.add(entry)
+        return statistics.result()
 
     def print_statistics(self, stats):
         """Statistiken zu den Azubis in der Konsole ausgeben"""
         print()
         print("Wie oft welche Azubis im Dienst eingetragen sind:")
-        print(f"{'Jahr':<6}{'Name':<45}{'Dienst':<15}{'Vertretung':<15}")
-        print("-" * 80)
+        print(f"{'Jahr':<6}{'Name':<45}" + "".join(f"{slot.label:<15}" for slot in self.slots) + f"{'Abwesend':<10}")
+        print("-" * (61 + 15 * len(self.slots)))
         for name, counts in stats.items():
-            print(f"{counts['year']:<6}{name:<45}{counts['primary']:<15}{counts['secondary']:<15}")
+            print(f"{counts['year']:<6}{name:<45}" + "".join(f"{counts[slot.key]:<15}" for slot in self.slots) + f"{counts['absent']:<10}")
         print()
 
 if __name__ == "__main__":
     azubis_file = "data/Azubis.csv"
     blockweeks_file = "data/Blockwochen_Schule.csv"
     holidays_file = "data/Feiertage_Schließzeiten_Brückentage.csv"
+    absences_file = "data/Abwesenheiten.csv"
+    slots_file = "data/Dienste.csv"
+    overrides_file = "data/Diensttausch.csv"
+    rotation_file = "data/rotation_state.json"
     target_folder = "output"
 
     print("Dieses Tool erstellt basierend auf den *.csv-Daten im Unterordner ./data/ eine tägliche Liste, die festlegt, wer für den Dienst und die Vertretung beim Ein- und Ausräumen der Geschirrspülmaschine zuständig ist. Bitte die *.csv-Daten anpassen, bevor ein Plan generiert wird.\n")
-    scheduler = CleaningDutyScheduler(azubis_file, blockweeks_file, holidays_file)
+    scheduler = CleaningDutyScheduler(azubis_file, blockweeks_file, holidays_file, absences_file, slots_file)
 
     year = int(input("Das Schuljahr für das der Spühlmaschinenplan gemacht werden soll (z.B, 2024 für 2024/2025): "))
 
-    export_format = input("Das Dateiformat zum exportieren (csv/html/ics): ").strip().lower()
+    export_format = input("Das Dateiformat zum exportieren (csv/csv.gz/html/ics/parquet/feather/npz): ").strip().lower()
     export_formats = {
         "csv": CSVExporter(),
+        "csv.gz": CSVExporter(compress=True),
         "html": HTMLExporter(),
-        "ics": ICSExporter()
+        "ics": ICSExporter(),
+        "parquet": ColumnarExporter(),
+        "feather": ColumnarExporter(),
+        "npz": ColumnarExporter()
     }
 
     exporter = export_formats.get(export_format, CSVExporter())
     output_file = f"{target_folder}/Spühlmaschinenplan.{export_format if exporter else 'csv'}"
     include_all_dates = export_format == "html"
 
+    year_count = input("Wie viele Schuljahre am Stück mit fortlaufender Rotation (Enter = 1): ").strip()
+    year_count = int(year_count) if year_count else 1
+    if year_count > 1:
+        state = RotationState.load(rotation_file)
+        if state.years and year <= max(state.years):
+            print(f"Gespeicherter Rotationszustand reicht bis {max(state.years)}, es wird ohne Zustand neu begonnen.")
+            state = RotationState()
+        # Ein Durchlauf über alle Schuljahre: Export und Statistik werden pro Schuljahr aufgeteilt
+        extension = export_format if export_format in export_formats else 'csv'
+        _, yearly_stats = tee(
+            scheduler.iter_years(year, year_count, include_all_dates=include_all_dates, state=state),
+            split_sink(school_year_of, lambda plan_year: export_sink(exporter, f"{target_folder}/Spühlmaschinenplan_{plan_year}.{extension}", scheduler.slots)),
+            split_sink(school_year_of, lambda plan_year: statistics_sink(scheduler))
+        )
+        for plan_year, stats in yearly_stats.items():
+            print(f"Schuljahr {plan_year}/{plan_year + 1}:")
+            scheduler.print_statistics(stats)
+        state.save(rotation_file)
+        print(f"Rotationszustand bis {year + year_count - 1}/{year + year_count} gespeichert an {rotation_file}.")
+        raise SystemExit
+
     schedule = scheduler.generate_schedule(year, include_all_dates=include_all_dates)
-    scheduler.save_schedule(schedule, exporter, output_file)
     stats = scheduler.generate_statistics(schedule)
+
+    # Diensttausche erst nach der Generierung auflegen, damit sie keine anderen Tage verschieben
+    if os.path.exists(overrides_file):
+        schedule, changes = OverrideTable.from_csv(overrides_file, scheduler.slots).apply(schedule)
+        stats = adjust_statistics(stats, changes)
+        scheduler.violations += validate_changes(scheduler, schedule, changes)
+        print(f"{len(changes)} Diensttausch(e) übernommen.")
+
+    scheduler.save_schedule(schedule, exporter, output_file)
     scheduler.print_statistics(stats)
 
+    for violation in scheduler.violations:
+        print(f"Validierungs Fehler: {violation['message']}")
+
     # Generiert Plan auf monatlicher basis
     for yy in range(2):
         for month in range(1, 13):
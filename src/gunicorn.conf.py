@@ -0,0 +1,35 @@
+# Konfiguration für den Betrieb mit mehreren Worker-Prozessen unter Linux:
+#     gunicorn -c gunicorn.conf.py app:app
+# Worker und Threads lassen sich über PLAN_WORKERS / PLAN_THREADS anpassen.
+import os
+
+bind = f"{os.environ.get('PLAN_HOST', '0.0.0.0')}:{os.environ.get('PLAN_PORT', '8080')}"
+workers = int(os.environ.get('PLAN_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+threads = int(os.environ.get('PLAN_THREADS', 16))
+# gthread: ein offener SSE-Stream einer Admin-Seite belegt einen Thread (höchstens EventBroker.max_age Sekunden),
+# nicht den ganzen Worker. Die Plan-Anzeigen fragen per ETag/304 nach und halten keine Threads fest
+worker_class = 'gthread'
+timeout = 120
+accesslog = '-'
+loglevel = 'info'
+raw_env = ['FLASK_DEBUG=0']
+
+
+# Nur ein Worker führt den Watcher aus
+WATCHER_LOCK = os.path.join('static', '.watcher.lock')
+
+
+def post_worker_init(worker):
+    # Alle Worker warten auf dieselbe Dateisperre, nur der Inhaber startet den Watcher. Wird dieser Worker beendet
+    # oder recycelt, gibt das Betriebssystem die Sperre frei und ein anderer Worker übernimmt
+    if os.environ.get('PLAN_AUTO_REGENERATE') == '1':
+        import threading
+        from app import start_watcher
+        from locks import file_lock
+
+        def lead():
+            with file_lock(WATCHER_LOCK):
+                start_watcher()
+                threading.Event().wait()
+
+        threading.Thread(target=lead, name="WatcherLeader", daemon=True).start()
@@ -0,0 +1,71 @@
+"""
+Sortierte, zusammengefasste Tagesbereiche (Ordinal-Start/-Ende inklusive) mit Binärsuche.
+
+Wird für Schließzeiten und individuelle Abwesenheiten genutzt. Eine Abfrage für einen Tag kostet O(log n),
+für ein ganzes NumPy-Array von Tagen wird np.searchsorted verwendet.
+
+Author: pascal.blum@nikoit.de
+"""
+import bisect
+import numpy as np
+
+
+class IntervalSet:
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def copy(self):
+        intervals = IntervalSet()
+        intervals.starts = list(self.starts)
+        intervals.ends = list(self.ends)
+        return intervals
+
+    def add(self, start, end=None):
+        """Fügt einen Bereich (datetime.date, inklusive beider Tage) hinzu und fasst angrenzende Bereiche zusammen."""
+        start = start.toordinal()
+        end = start if end is None else end.toordinal()
+        self.add_ordinals(start, end)
+
+    def add_ordinals(self, start, end):
+        if end < start:
+            start, end = end, start
+        starts, ends = self.starts, self.ends
+
+        position = bisect.bisect_left(starts, start)
+        # Mit dem vorherigen Bereich verschmelzen, falls er direkt angrenzt oder überlappt
+        if position > 0 and ends[position - 1] >= start - 1:
+            position -= 1
+            start = starts[position]
+            end = max(end, ends[position])
+            del starts[position], ends[position]
+        # Alle folgenden Bereiche schlucken, die im neuen Bereich beginnen
+        while position < len(starts) and starts[position] <= end + 1:
+            end = max(end, ends[position])
+            del starts[position], ends[position]
+        starts.insert(position, start)
+        ends.insert(position, end)
+
+    def contains_ordinal(self, ordinal):
+        position = bisect.bisect_right(self.starts, ordinal) - 1
+        return position >= 0 and ordinal <= self.ends[position]
+
+    def __contains__(self, date):
+        return self.contains_ordinal(date.toordinal())
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __len__(self):
+        """Anzahl der enthaltenen Tage."""
+        return sum(end - start + 1 for start, end in zip(self.starts, self.ends))
+
+    def mask(self, ordinals):
+        """Vektorisierte Prüfung für ein Array von Ordinalen."""
+        ordinals = np.asarray(ordinals)
+        if not self.starts:
+            return np.zeros(ordinals.shape, dtype=bool)
+        starts = np.array(self.starts, dtype=np.int64)
+        ends = np.array(self.ends, dtype=np.int64)
+        positions = np.searchsorted(starts, ordinals, side='right') - 1
+        return (positions >= 0) & (ordinals <= ends[np.maximum(positions, 0)])
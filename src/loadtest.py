@@ -0,0 +1,80 @@
+"""
+Einfacher Lasttest für die wichtigsten Lese-Endpunkte.
+
+Ohne --url wird der Flask-Testclient als lokaler Stellvertreter verwendet (kein Server nötig), mit --url
+werden echte HTTP-Anfragen an einen laufenden Server geschickt, z.B. python serve.py.
+
+    python loadtest.py --requests 500 --concurrency 8
+    python loadtest.py --url http://localhost:8080 --requests 2000 --concurrency 32
+
+Author: pascal.blum@nikoit.de
+"""
+import argparse
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PATHS = [
+    "/",
+    "/admin/get-statistics",
+    "/api/csv/Azubis.csv",
+]
+
+
+def local_client():
+    from app import app
+    app.debug = False
+    client = app.test_client()
+
+    def fetch(path):
+        response = client.get(path)
+        response.get_data()
+        return response.status_code
+
+    return fetch
+
+
+def http_client(base_url):
+    def fetch(path):
+        try:
+            with urllib.request.urlopen(base_url.rstrip('/') + urllib.parse.quote(path)) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            # 4xx/5xx wie beim Testclient als Status zählen, nicht abbrechen
+            e.read()
+            e.close()
+            return e.code
+
+    return fetch
+
+
+def run(fetch, path, requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(lambda _: fetch(path), range(requests)))
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for status in statuses if status >= 400)
+    return requests / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest für den Spülmaschinenplan-Server")
+    parser.add_argument('--url', help="Basis-URL eines laufenden Servers, ohne wird der Flask-Testclient verwendet")
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--path', action='append', help="Zusätzliche oder abweichende Pfade")
+    args = parser.parse_args()
+
+    fetch = http_client(args.url) if args.url else local_client()
+    print(f"{'Pfad':<40}{'Anfragen/s':>12}{'Fehler':>8}")
+    print("-" * 60)
+    for path in args.path or PATHS:
+        rate, errors = run(fetch, path, args.requests, args.concurrency)
+        print(f"{path:<40}{rate:>12.1f}{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
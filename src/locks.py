@@ -0,0 +1,51 @@
+"""
+Dateisperren, damit mehrere Worker-Prozesse (gunicorn/waitress) sich beim Schreiben der CSV-Dateien,
+des Änderungsprotokolls, der Backups und der generierten Dateien nicht in die Quere kommen.
+
+Unter Linux wird fcntl.flock, unter Windows msvcrt.locking verwendet. Zusätzlich wird pro Pfad ein
+threading.Lock gehalten, weil flock innerhalb eines Prozesses zwischen Threads nicht sperrt.
+Die Sperren sind nicht verschachtelbar, derselbe Pfad darf also nicht doppelt gesperrt werden.
+
+Author: pascal.blum@nikoit.de
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+@contextmanager
+def file_lock(path):
+    """Exklusive Sperre über eine Lock-Datei, prozess- und threadübergreifend."""
+    lock_dir = os.path.dirname(path)
+    if lock_dir and not os.path.exists(lock_dir):
+        os.makedirs(lock_dir, exist_ok=True)
+
+    with _thread_lock(path):
+        with open(path, 'a+') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,109 @@
+"""
+Optimiert einen bereits generierten Spülmaschinenplan auf Fairness.
+
+Der Greedy-Durchlauf in generate_schedule verteilt die Dienste nur nach absoluten Zählern und ignoriert,
+wie viele Tage ein Azubi überhaupt verfügbar war. Hier wird für jeden Slot (Dienst, Vertretung, ...) die Summe
+der quadrierten Abweichungen von einem Soll minimiert, das proportional zu den verfügbaren Tagen ist.
+Gelöst wird das mit einer lokalen Suche (einzelne Tage vom am stärksten überplanten auf einen
+unterplanten Azubi umhängen), die Blockwochen, Feiertage, eine Person pro Tag und Slot und keinen Dienst an zwei
+aufeinanderfolgenden Arbeitstagen einhält. Läuft das Zeitbudget ab, wird der bis dahin beste (immer
+gültige) Stand genommen; schlägt etwas fehl, bleibt der Greedy-Plan bestehen.
+
+Author: pascal.blum@nikoit.de
+"""
+import time
+import numpy as np
+
+
+class FairnessOptimizer:
+    def __init__(self, scheduler, time_budget=0.5):
+        self.scheduler = scheduler
+        self.time_budget = time_budget
+
+    def targets(self, available, total):
+        """Soll-Anzahl pro Azubi, proportional zu den verfügbaren Tagen."""
+        days = available.sum(axis=0).astype(float)
+        if days.sum() == 0:
+            return np.zeros_like(days)
+        return total * days / days.sum()
+
+    def improve(self, codes, others, available, deadline, consecutive):
+        """Hängt so lange einzelne Tage um, bis keine Verbesserung mehr möglich ist oder die Zeit abläuft."""
+        people = available.shape[1]
+        assigned = codes >= 0
+        target = self.targets(available, assigned.sum())
+        counts = np.bincount(codes[assigned], minlength=people).astype(float)
+        previous = np.concatenate(([-1], codes[:-1]))
+        following = np.concatenate((codes[1:], [-1]))
+
+        while time.perf_counter() < deadline:
+            excess = counts - target
+            moved = False
+            for over in np.argsort(-excess):
+                # Ein Umhängen verbessert das Ziel nur, wenn die Abweichungen sich um mehr als 1 unterscheiden
+                candidates = [under for under in np.argsort(excess) if excess[over] - excess[under] > 1]
+                if not candidates:
+                    break
+                days = codes == over
+                for under in candidates:
+                    movable = days & available[:, under] & np.all(others != under, axis=0)
+                    if consecutive:
+                        movable &= (previous != under) & (following != under)
+                    rows = np.flatnonzero(movable)
+                    if rows.size:
+                        row = rows[0]
+                        codes[row] = under
+                        if row > 0:
+                            following[row - 1] = under
+                        if row + 1 < len(codes):
+                            previous[row + 1] = under
+                        counts[over] -= 1
+                        counts[under] += 1
+                        moved = True
+                        break
+                if moved or time.perf_counter() >= deadline:
+                    break
+            if not moved:
+                break
+
+        return codes
+
+    def optimize(self, schedule, year):
+        """Gibt einen fairer verteilten Plan zurück oder bei Fehlern den unveränderten Greedy-Plan."""
+        deadline = time.perf_counter() + self.time_budget
+        try:
+            index = self.scheduler.azubi_index
+            names = list(index)
+            rows = [i for i, entry in enumerate(schedule) if entry.get(self.scheduler.slots[0].key) in index]
+            if not rows or not names:
+                return schedule
+
+            dates = [schedule[i]['date'] for i in rows]
+            available = self.scheduler.availability_matrix(dates)
+            slots = self.scheduler.slots
+            codes = np.array([
+                [index.get(schedule[i][slot.key], -1) for i in rows] for slot in slots
+            ], dtype=np.int64).reshape(len(slots), len(rows))
+
+            # Slots nacheinander, jeweils mit den aktuellen Zuweisungen der anderen Slots als Sperre
+            for position, slot in enumerate(slots):
+                others = np.delete(codes, position, axis=0)
+                codes[position] = self.improve(
+                    codes[position], others, available & self.scheduler.slot_allowed(slot), deadline,
+                    consecutive=not slot.consecutive
+                )
+
+            optimized = [dict(entry) for entry in schedule]
+            for position, slot in enumerate(slots):
+                for row, i in enumerate(rows):
+                    if codes[position, row] >= 0:
+                        optimized[i][slot.key] = names[codes[position, row]]
+
+            violations = self.scheduler.validate_schedule(optimized, year)
+            if len(violations) > len(self.scheduler.violations):
+                return schedule
+            self.scheduler.violations = violations
+            return optimized
+        except Exception as e:
+            print(f"Optimierung fehlgeschlagen, Greedy-Plan wird verwendet: {e}")
+            return schedule
@@ -0,0 +1,168 @@
+"""
+Diensttausche und manuelle Änderungen als eigene Schicht über dem generierten Plan.
+
+Die Änderungen stehen in data/Diensttausch.csv (Datum;Dienst;Azubi;Grund) und werden nicht in die Generierung
+eingerechnet, sondern erst beim Ausliefern/Exportieren auf den fertigen Plan gelegt. Dadurch verschiebt ein
+Tausch nie die folgenden Tage, und der Aufwand hängt nur von der Anzahl der Änderungen ab: die Tage werden
+per Binärsuche im (nach Datum sortierten) Plan gefunden, die Statistik wird nur für die betroffenen Personen
+angepasst. Gibt es für einen Tag und einen Dienst mehrere Zeilen, gilt die letzte.
+
+Author: pascal.blum@nikoit.de
+"""
+import bisect
+import csv
+import datetime
+from slots import DEFAULT_SLOTS, duty_total, slot_by_label
+
+# Regeln aus validate_schedule, die sich auf einzelne Tage beziehen und deshalb auch auf einen Ausschnitt passen.
+# 'consecutive' hängt von den Nachbartagen ab und wird in validate_changes über consecutive_windows geprüft
+PATCH_RULES = {'unknown', 'blockweek', 'absence', 'holiday', 'weekend', 'role', 'same_person'}
+
+
+class OverrideTable:
+    def __init__(self, slots=DEFAULT_SLOTS):
+        self.slots = slots
+        self.entries = {}
+
+    def set(self, date, role, name, reason=''):
+        """Legt fest, wer an einem Tag den Slot role (z.B. 'primary' oder 'secondary') hat."""
+        if role not in (slot.key for slot in self.slots):
+            raise ValueError(f"Unbekannter Dienst '{role}'")
+        self.entries[(date, role)] = (name, reason)
+
+    def add_row(self, row):
+        """Übernimmt eine Zeile im Format von Diensttausch.csv, gibt (Datum, Slot-Schlüssel) zurück."""
+        role = slot_by_label(self.slots, row.get('Dienst')).key
+        date = datetime.datetime.strptime(row['Datum'].strip(), '%d.%m.%Y').date()
+        self.set(date, role, row['Azubi'].strip(), (row.get('Grund') or '').strip())
+        return date, role
+
+    def __len__(self):
+        return len(self.entries)
+
+    def apply(self, schedule):
+        """Gibt (gepatchter Plan, Änderungen) zurück. Der übergebene Plan bleibt unverändert, nur die
+        betroffenen Einträge werden kopiert. Tage außerhalb des Plans werden übersprungen."""
+        patched = list(schedule)
+        changes = []
+        for (date, role), (name, reason) in sorted(self.entries.items()):
+            row = bisect.bisect_left(patched, date, key=lambda entry: entry['date'])
+            if row == len(patched) or patched[row]['date'] != date:
+                continue
+            old = patched[row].get(role)
+            if old == name:
+                continue
+            patched[row] = {**patched[row], role: name}
+            changes.append({'row': row, 'date': date, 'role': role, 'old': old, 'new': name, 'reason': reason})
+        return patched, changes
+
+    @classmethod
+    def from_csv(cls, overrides_file, slots=DEFAULT_SLOTS):
+        try:
+            with open(overrides_file, 'r', encoding='utf-8-sig') as file:
+                return cls.from_rows(csv.DictReader(file, delimiter=';'), slots)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Fehler beim laden der Diensttausche: {e}")
+
+    @classmethod
+    def from_rows(cls, rows, slots=DEFAULT_SLOTS):
+        """Zeilen im Format von Diensttausch.csv (z.B. aus repository.py)."""
+        table = cls(slots)
+        try:
+            for row in rows:
+                if not (row.get('Datum') or '').strip():
+                    continue
+                table.add_row(row)
+        except Exception as e:
+            raise ValueError(f"Fehler beim laden der Diensttausche: {e}")
+        return table
+
+
+def adjust_statistics(stats, changes):
+    """Passt die Zähler aus generate_statistics für die Änderungen an, ohne den ganzen Plan neu zu zählen."""
+    adjusted = dict(stats)
+    for change in changes:
+        for name, delta in ((change['old'], -1), (change['new'], 1)):
+            if name in adjusted:
+                adjusted[name] = {**adjusted[name], change['role']: adjusted[name][change['role']] + delta}
+
+    return dict(sorted(
+        adjusted.items(),
+        key=lambda item: duty_total(item[1]),
+        reverse=True
+    ))
+
+
+def is_assigned(entry, key):
+    name = entry.get(key)
+    return bool(name) and name != ' - '
+
+
+def consecutive_windows(patched, rows, slots):
+    """Zusammenhängende Ausschnitte (von, bis) um die Zeilen rows, die bis zum vorherigen und nächsten Tag reichen,
+    an dem der jeweilige Slot ohne 'Tage am Stück' besetzt ist. Überlappende Ausschnitte werden zusammengelegt."""
+    keys = [slot.key for slot in slots if not slot.consecutive]
+    last = len(patched) - 1
+    windows = []
+    for row in rows:
+        start = end = row
+        for key in keys:
+            before = row - 1
+            while before > 0 and not is_assigned(patched[before], key):
+                before -= 1
+            after = row + 1
+            while after < last and not is_assigned(patched[after], key):
+                after += 1
+            start, end = min(start, max(before, 0)), max(end, min(after, last))
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return windows
+
+
+def validate_changes(scheduler, patched, changes, dates=None):
+    """Prüft nur die geänderten Tage (bzw. nur die aus dates) gegen Schulwochen, Feiertage, Abwesenheiten und Rollen,
+    zusammen mit den benachbarten Arbeitstagen außerdem, dass niemand einen Slot an zwei Tagen hintereinander hat."""
+    rows = sorted({change['row'] for change in changes if dates is None or change['date'] in dates})
+    violations = [
+        violation for violation in scheduler.validate_schedule([patched[row] for row in rows])
+        if violation['rule'] in PATCH_RULES
+    ]
+    for start, end in consecutive_windows(patched, rows, scheduler.slots):
+        violations += [
+            violation for violation in scheduler.validate_schedule(patched[start:end + 1])
+            if violation['rule'] == 'consecutive'
+        ]
+    violations.sort(key=lambda violation: violation['date'])
+    return violations
+
+
+def swap_rows(schedule, slots, role, first, second):
+    """Zeilen für Diensttausch.csv, mit denen die beiden Personen an den Tagen first und second tauschen."""
+    rows = {}
+    for entry in schedule:
+        if entry['date'] in (first, second):
+            rows[entry['date']] = entry.get(role)
+    if len(rows) != 2 or any(not name or name == ' - ' for name in rows.values()):
+        raise ValueError("An beiden Tagen muss jemand eingeteilt sein")
+
+    return [
+        override_row(slots, date, role, rows[other], f"Tausch mit {rows[date]} ({other.strftime('%d.%m.%Y')})")
+        for date, other in ((first, second), (second, first))
+    ]
+
+
+def planned_row(schedule, date):
+    """Position des Tages im Plan. Tage, die nicht im Plan stehen, würde apply() überspringen, deshalb ValueError."""
+    row = bisect.bisect_left(schedule, date, key=lambda entry: entry['date'])
+    if row == len(schedule) or schedule[row]['date'] != date:
+        raise ValueError(f"Der {date.strftime('%d.%m.%Y')} liegt nicht im veröffentlichten Plan")
+    return row
+
+
+def override_row(slots, date, role, name, reason=''):
+    """Zeile für Diensttausch.csv, mit der name am Tag date den Slot role übernimmt."""
+    return {"Datum": date.strftime('%d.%m.%Y'), "Dienst": slot_by_label(slots, role).label, "Azubi": name, "Grund": reason}
@@ -0,0 +1,121 @@
+"""
+Streaming-Pipeline: Pläne über viele Schuljahre (und Standorte) in einem Durchlauf an mehrere Ausgaben verteilen.
+
+Der Scheduler liefert mit iter_years() die Einträge Tag für Tag, tee() reicht jeden Eintrag an alle Sinks weiter
+(siehe exporters/sink.py). Kein Sink hält den ganzen Plan im Speicher, der Speicherbedarf bleibt also gleich,
+egal wie viele Schuljahre generiert werden:
+
+    entries = scheduler.iter_years(2024, 10, include_all_dates=True, state=state)
+    _, _, stats = tee(
+        entries,
+        export_sink(CSVExporter(), "output/Spühlmaschinenplan.csv", scheduler.slots),
+        split_sink(month_of, lambda month: export_sink(HTMLExporter(), f"output/monatlich/{month[0]}_{month[1]}.html", scheduler.slots)),
+        split_sink(school_year_of, lambda year: statistics_sink(scheduler))
+    )
+
+Prüfung (validate_schedule) und FairnessOptimizer brauchen ein ganzes Schuljahr und laufen deshalb nicht in
+der Pipeline. Exporter ohne sink() (z.B. ColumnarExporter) werden über buffered_sink pro Datei gesammelt.
+
+Author: pascal.blum@nikoit.de
+"""
+import os
+from exporters.sink import finish, primed
+from rotation import azubi_name
+from slots import duty_total
+
+
+class StatisticsAccumulator:
+    """Zählt wie generate_statistics, aber Eintrag für Eintrag."""
+
+    def __init__(self, scheduler):
+        self.absences = scheduler.absences
+        self.keys = [slot.key for slot in scheduler.slots]
+        self.stats = {
+            azubi_name(azubi): {**{key: 0 for key in self.keys}, 'absent': 0, 'year': azubi['year']}
+            for azubi in scheduler.azubis
+        }
+
+    def add(self, entry):
+        stats = self.stats
+        for key in self.keys:
+            name = entry.get(key)
+            if name in stats:
+                stats[name][key] += 1
+
+        # Abwesende Arbeitstage pro Azubi, damit die Dienstanzahl fair eingeordnet werden kann
+        first = entry.get(self.keys[0])
+        if first and first != ' - ':
+            for name in self.absences.absent_names(entry['date']):
+                if name in stats:
+                    stats[name]['absent'] += 1
+
+    def result(self):
+        return dict(sorted(
+            self.stats.items(),
+            key=lambda item: duty_total(item[1]),
+            reverse=True
+        ))
+
+
+def school_year_of(date):
+    """Schuljahr (Startjahr) eines Tages, August zählt schon zum neuen Schuljahr."""
+    return date.year if date.month >= 8 else date.year - 1
+
+
+def month_of(date):
+    return date.year, date.month
+
+
+@primed
+def statistics_sink(scheduler):
+    """Sink, der als Ergebnis die Statistik im Format von generate_statistics liefert."""
+    statistics = StatisticsAccumulator(scheduler)
+    while (entry := (yield)) is not None:
+        statistics.add(entry)
+    return statistics.result()
+
+
+@primed
+def buffered_sink(exporter, output_file, slots):
+    """Für Exporter ohne sink(): sammelt die Einträge und exportiert sie beim Abschluss auf einmal.
+    Zusammen mit split_sink bleibt der Speicherbedarf auf eine Datei (z.B. ein Schuljahr) begrenzt."""
+    entries = []
+    while (entry := (yield)) is not None:
+        entries.append(entry)
+    exporter.export(entries, output_file, slots)
+
+
+def export_sink(exporter, output_file, slots):
+    """Sink für einen Exporter, legt wie save_schedule fehlende Ordner an."""
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if hasattr(exporter, 'sink'):
+        return exporter.sink(output_file, slots)
+    return buffered_sink(exporter, output_file, slots)
+
+
+@primed
+def split_sink(key, open_sink):
+    """Verteilt die Einträge nach key(date) auf eigene Sinks, z.B. eine Datei pro Monat oder Schuljahr.
+    Die Einträge müssen nach Datum sortiert sein, es ist immer nur ein Sink offen. Ergebnis: {Schlüssel: Ergebnis}."""
+    results = {}
+    current_key = current = None
+    while (entry := (yield)) is not None:
+        entry_key = key(entry['date'])
+        if current is None or entry_key != current_key:
+            if current is not None:
+                results[current_key] = finish(current)
+            current_key, current = entry_key, open_sink(entry_key)
+        current.send(entry)
+    if current is not None:
+        results[current_key] = finish(current)
+    return results
+
+
+def tee(entries, *sinks):
+    """Reicht jeden Eintrag an alle Sinks weiter und gibt deren Ergebnisse in gleicher Reihenfolge zurück."""
+    for entry in entries:
+        for target in sinks:
+            target.send(entry)
+    return [finish(target) for target in sinks]
@@ -0,0 +1,105 @@
+"""
+Vergleich des veröffentlichten Plans mit dem vorherigen, damit nur die betroffenen Azubis benachrichtigt werden müssen.
+
+Der zuletzt veröffentlichte Plan (inklusive Diensttausche) wird kompakt wie beim ColumnarExporter abgelegt:
+ein Ordinal-Array, ein Code-Array pro Slot und die Namensliste (static/plan_snapshot.npz). Beim nächsten
+Veröffentlichen werden beide Pläne über die Ordinals ausgerichtet (np.intersect1d) und die Slots als Arrays
+verglichen. Tage, die nur in einem der beiden Pläne vorkommen (z.B. beim Wechsel des Schuljahres), zählen
+nicht als Änderung.
+
+Jede Änderung wird als JSON-Zeile an static/plan_changes.jsonl angehängt.
+
+Author: pascal.blum@nikoit.de
+"""
+import datetime
+import json
+import os
+import numpy as np
+from exporters.columnar_exporter import ColumnarExporter
+
+
+class PlanSnapshot:
+    def __init__(self, ordinals, columns, names, plan_version=None):
+        self.ordinals = np.asarray(ordinals, dtype=np.int64)
+        self.columns = columns
+        self.names = list(names)
+        self.plan_version = plan_version
+
+    @classmethod
+    def from_schedule(cls, schedule, slots, plan_version=None):
+        ordinals, columns, names = ColumnarExporter().encode(schedule, slots)
+        return cls(ordinals, columns, names, plan_version)
+
+    def save(self, snapshot_file):
+        with open(f"{snapshot_file}.tmp", 'wb') as f:
+            np.savez_compressed(
+                f,
+                ordinal=self.ordinals,
+                names=np.array(self.names, dtype=str),
+                plan_version=np.array(self.plan_version or ''),
+                **{f"slot_{key}": column for key, column in self.columns.items()}
+            )
+        os.replace(f"{snapshot_file}.tmp", snapshot_file)
+
+    @classmethod
+    def load(cls, snapshot_file):
+        """Gespeicherter Plan oder None, wenn es noch keinen gibt."""
+        if not os.path.exists(snapshot_file):
+            return None
+        try:
+            with np.load(snapshot_file) as data:
+                columns = {key[len('slot_'):]: data[key] for key in data.files if key.startswith('slot_')}
+                return cls(data['ordinal'], columns, data['names'].tolist(), str(data['plan_version']) or None)
+        except Exception as e:
+            raise ValueError(f"Fehler beim laden des vorherigen Plans: {e}")
+
+    def codes(self, index):
+        """Spalten mit Codes aus index (Name -> Code) statt der eigenen Namensliste, -1 bleibt -1."""
+        # -1 greift auf das letzte Element zu, deshalb wird -1 ans Ende der Umrechnungstabelle gehängt
+        lookup = np.array([index[name] for name in self.names] + [-1], dtype=np.int32)
+        return {key: lookup[column] for key, column in self.columns.items()}
+
+
+def diff_snapshots(previous, current):
+    """Geänderte Slots an Tagen, die in beiden Plänen vorkommen.
+
+    Gibt (changes, by_azubi) zurück: changes ist eine Liste von {date, role, before, after}, by_azubi ordnet
+    jedem betroffenen Azubi (alter oder neuer Name) die geänderten Tage (ISO-Datum, sortiert) zu.
+    """
+    names = list(dict.fromkeys(previous.names + current.names))
+    index = {name: code for code, name in enumerate(names)}
+    before_codes = previous.codes(index)
+    after_codes = current.codes(index)
+
+    _, before_rows, after_rows = np.intersect1d(previous.ordinals, current.ordinals, assume_unique=True, return_indices=True)
+    empty = np.full(len(before_rows), -1, dtype=np.int32)
+
+    changes = []
+    for role in dict.fromkeys(list(before_codes) + list(after_codes)):
+        before = before_codes[role][before_rows] if role in before_codes else empty
+        after = after_codes[role][after_rows] if role in after_codes else empty
+        for row in np.flatnonzero(before != after):
+            changes.append({
+                "date": datetime.date.fromordinal(int(current.ordinals[after_rows[row]])).isoformat(),
+                "role": role,
+                "before": names[before[row]] if before[row] >= 0 else None,
+                "after": names[after[row]] if after[row] >= 0 else None
+            })
+    changes.sort(key=lambda change: change["date"])
+
+    by_azubi = {}
+    for change in changes:
+        for name in (change["before"], change["after"]):
+            if name:
+                days = by_azubi.setdefault(name, [])
+                if not days or days[-1] != change["date"]:
+                    days.append(change["date"])
+
+    return changes, dict(sorted(by_azubi.items()))
+
+
+def append_plan_changes(changelog_file, entry):
+    """Hängt eine Zeile an das Änderungsprotokoll der veröffentlichten Pläne an."""
+    line = json.dumps({"timestamp": datetime.datetime.now().isoformat(timespec='seconds'), **entry}, ensure_ascii=False)
+    with open(changelog_file, 'a', encoding='utf-8') as f:
+        f.write(line + "\n")
@@ -0,0 +1,73 @@
+"""
+Beobachtet die CSV-Dateien im Datenverzeichnis und stößt bei Änderungen eine Neugenerierung an.
+
+Es wird effizient per os.scandir gepollt (nur mtime/Größe der *.csv, kein Lesen der Inhalte). Mehrere
+Änderungen kurz hintereinander, z.B. beim Speichern aus Excel, werden zusammengefasst: der Callback wird
+erst aufgerufen, wenn für debounce Sekunden keine weitere Änderung mehr kam.
+
+Mit einem Repository (siehe repository.py) wird stattdessen dessen signatures() gepollt, bei SQLite also die
+Revision jeder Tabelle.
+
+Author: pascal.blum@nikoit.de
+"""
+import os
+import threading
+import time
+
+
+class DataWatcher:
+    def __init__(self, data_dir, callback, interval=1.0, debounce=2.0, repository=None):
+        self.data_dir = data_dir
+        self.repository = repository
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def snapshot(self):
+        if self.repository is not None:
+            return self.repository.signatures()
+        state = {}
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.csv') and entry.is_file():
+                    stat = entry.stat()
+                    state[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def changed_files(self, before, after):
+        return sorted(name for name in set(before) | set(after) if before.get(name) != after.get(name))
+
+    def run(self):
+        known = self.snapshot()
+        pending = set()
+        last_change = None
+
+        while not self.stop_event.wait(self.interval):
+            current = self.snapshot()
+            changed = self.changed_files(known, current)
+            known = current
+            if changed:
+                pending.update(changed)
+                last_change = time.monotonic()
+                continue
+
+            if pending and time.monotonic() - last_change >= self.debounce:
+                files, pending = sorted(pending), set()
+                try:
+                    self.callback(files)
+                except Exception as e:
+                    print(f"Automatische Neugenerierung fehlgeschlagen: {e}")
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="DataWatcher", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,537 @@
+"""
+Tägliche Erinnerung an den Dienst per E-Mail (SMTP) oder Webhook.
+
+Das Skript liest für jeden Standort die Einteilung des Tages aus dem veröffentlichten Plan (inklusive
+Diensttausche, siehe Site.published_days) und schickt jedem eingeteilten Azubi eine Erinnerung. Die Adressen
+stehen in data/Kontakte.csv. Gedacht ist es für einen Cronjob am Morgen, z.B.:
+
+    0 7 * * 1-5 cd /opt/spuelplan/src && python reminders.py
+
+    python reminders.py                        alle Standorte per SMTP (PLAN_SMTP_HOST, PLAN_SMTP_PORT, ...)
+    python reminders.py --transport webhook    als JSON an PLAN_REMINDER_WEBHOOK
+    python reminders.py --site muenchen        nur einzelne Standorte
+    python reminders.py --dry-run              nur anzeigen, was verschickt würde
+    python reminders.py --local                an einen lokalen SMTP- bzw. HTTP-Stellvertreter (zum Testen)
+
+Verschickt wird mit asyncio: die Erinnerungen werden in Batches aufgeteilt, die sich eine feste Anzahl offener
+Verbindungen teilen (PLAN_REMINDER_CONNECTIONS). SMTP und HTTP laufen über smtplib bzw. http.client in Threads,
+eine Verbindung wird für alle Batches wiederverwendet. Vorübergehende Fehler (Verbindungsabbruch, 4xx bei SMTP,
+429/5xx bei HTTP) werden mit exponentiellem Backoff wiederholt, dauerhafte Fehler nicht.
+
+Die verschickten Erinnerungen werden nach jedem Batch in data/reminders.jsonl protokolliert. Ein erneuter Lauf am
+selben Tag, z.B. nach einem Absturz, verschickt nur, was noch fehlt (höchstens der beim Absturz laufende Batch
+kommt ein zweites Mal an).
+
+Author: pascal.blum@nikoit.de
+"""
+import argparse
+import asyncio
+import datetime
+import email.header
+import email.utils
+import functools
+import http.client
+import json
+import os
+import quopri
+import random
+import smtplib
+import ssl
+import time
+import urllib.parse
+import uuid
+from contextlib import ExitStack, nullcontext
+
+from locks import file_lock
+from sites import CONTACTS_FILE, SiteRegistry
+
+
+@functools.lru_cache(maxsize=32)
+def encoded_subject(label):
+    return email.header.Header(f"Spühlmaschinen-Plan: heute {label}", 'utf-8').encode()
+
+
+class TransientError(Exception):
+    """Vorübergehender Fehler, die noch nicht verschickten Erinnerungen werden später erneut versucht."""
+
+
+def load_contacts(site):
+    """Name ("Vorname Nachname" wie im Plan) -> Zeile aus Kontakte.csv."""
+    contacts = {}
+    for row in site.repository.rows(CONTACTS_FILE) or []:
+        name = f"{(row.get('Vorname') or '').strip()} {(row.get('Nachname') or '').strip()}".strip()
+        if name:
+            contacts[name] = row
+    return contacts
+
+
+def collect_reminders(site, date, public_url=None):
+    """Erinnerungen für alle an date eingeteilten Azubis eines Standorts. Ohne generierten Plan keine."""
+    try:
+        days = site.published_days(date, date)
+    except FileNotFoundError:
+        return []
+    slots = site.scheduler().slots
+    contacts = load_contacts(site)
+
+    reminders = []
+    for day in days:
+        for slot in slots:
+            name = (day.get(slot.key) or '').strip()
+            if not name or name == '-':
+                continue
+            contact = contacts.get(name, {})
+            reminders.append({
+                "key": f"{day['date']}:{slot.key}:{name}",
+                "site": site.name,
+                "date": day['date'],
+                "slot": slot.key,
+                "label": slot.label,
+                "name": name,
+                "firstname": (contact.get('Vorname') or name.split()[0]).strip(),
+                "email": (contact.get('E-Mail') or '').strip() or None,
+                "url": f"{public_url.rstrip('/')}{site.prefix}/" if public_url else None
+            })
+    return reminders
+
+
+class ReminderLog:
+    """Protokoll der verschickten Erinnerungen (eine JSON-Zeile mit dem Schlüssel pro Erinnerung), nur anhängen.
+    record() schreibt einen ganzen Batch auf einmal und wartet per fsync, bis er auf der Platte ist."""
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.lock_file = f"{log_file}.lock"
+
+    def sent(self, date):
+        """Schlüssel der Erinnerungen, die für date schon verschickt wurden."""
+        prefix = f"{date.isoformat()}:"
+        if not os.path.exists(self.log_file):
+            return set()
+        keys = set()
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Eine beim Absturz halb geschriebene letzte Zeile wird übersprungen
+                if line.endswith("\n"):
+                    key = json.loads(line)["key"]
+                    if key.startswith(prefix):
+                        keys.add(key)
+        return keys
+
+    def unsent(self, reminders, date):
+        """Die Erinnerungen, die noch nicht im Protokoll stehen."""
+        sent = self.sent(date)
+        return [reminder for reminder in reminders if reminder["key"] not in sent]
+
+    def record(self, reminders):
+        if not reminders:
+            return
+        timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            for reminder in reminders:
+                f.write(json.dumps({"key": reminder["key"], "timestamp": timestamp}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class PooledTransport:
+    """Feste Anzahl wiederverwendeter Verbindungen, die blockierend in Threads benutzt werden.
+
+    Unterklassen implementieren connect(), disconnect(connection) und deliver(connection, batch, outcome).
+    deliver trägt für jede Erinnerung in outcome[key] None (verschickt) oder eine Fehlermeldung (dauerhaft
+    fehlgeschlagen) ein und wirft bei vorübergehenden Fehlern TransientError.
+    """
+    requires_email = False
+
+    def __init__(self, connections=4):
+        self.connections = max(1, connections)
+        self.pool = None
+
+    async def __aenter__(self):
+        self.pool = asyncio.Queue()
+        for _ in range(self.connections):
+            self.pool.put_nowait(None)
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        while not self.pool.empty():
+            connection = self.pool.get_nowait()
+            if connection is not None:
+                await asyncio.to_thread(self.disconnect, connection)
+        return False
+
+    def accepts(self, reminder):
+        return not self.requires_email or bool(reminder["email"])
+
+    async def send(self, batch, outcome):
+        connection = await self.pool.get()
+        try:
+            connection = await asyncio.to_thread(self.deliver_with, connection, batch, outcome)
+        except BaseException as e:
+            connection = None
+            # Verbindungsfehler gelten als vorübergehend, falsche Zugangsdaten und Programmfehler nicht
+            if isinstance(e, (OSError, http.client.HTTPException)) and not isinstance(e, smtplib.SMTPAuthenticationError):
+                raise TransientError(str(e)) from e
+            raise
+        finally:
+            self.pool.put_nowait(connection)
+
+    def deliver_with(self, connection, batch, outcome):
+        """Verschickt über die (bei Bedarf neu geöffnete) Verbindung und gibt sie zurück. Nach einem Fehler
+        wird sie geschlossen, der nächste Versuch verbindet neu."""
+        try:
+            if connection is None:
+                connection = self.connect()
+            self.deliver(connection, batch, outcome)
+            return connection
+        except BaseException:
+            if connection is not None:
+                self.disconnect(connection)
+            raise
+
+
+class SMTPTransport(PooledTransport):
+    requires_email = True
+
+    def __init__(self, host, port=25, sender=None, username=None, password=None, starttls=False, connections=4, timeout=30):
+        super().__init__(connections)
+        self.host = host
+        self.port = port
+        self.sender = sender or f"spuelplan@{host}"
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    @classmethod
+    def from_environment(cls, connections=4):
+        host = os.environ.get('PLAN_SMTP_HOST')
+        if not host:
+            raise ValueError("PLAN_SMTP_HOST ist nicht gesetzt")
+        return cls(
+            host,
+            int(os.environ.get('PLAN_SMTP_PORT', 25)),
+            sender=os.environ.get('PLAN_SMTP_FROM'),
+            username=os.environ.get('PLAN_SMTP_USER'),
+            password=os.environ.get('PLAN_SMTP_PASSWORD'),
+            starttls=os.environ.get('PLAN_SMTP_STARTTLS') == '1',
+            connections=connections
+        )
+
+    def connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls(context=ssl.create_default_context())
+        if self.username:
+            connection.login(self.username, self.password or '')
+        return connection
+
+    def disconnect(self, connection):
+        try:
+            connection.quit()
+        except (OSError, smtplib.SMTPException):
+            connection.close()
+
+    def message(self, reminder):
+        """Die fertige Nachricht als Bytes. Alle Erinnerungen sind gleich aufgebaut, deshalb ohne EmailMessage,
+        das bei tausenden Nachrichten den Großteil der Zeit kostet."""
+        date = datetime.date.fromisoformat(reminder["date"]).strftime('%d.%m.%Y')
+        text = f"Hallo {reminder['firstname']},\n\ndu bist heute ({date}) für \"{reminder['label']}\" eingeteilt.\n"
+        if reminder["url"]:
+            text += f"\nZum Plan: {reminder['url']}\n"
+        headers = (
+            f"From: {self.sender}\r\n"
+            f"To: {reminder['email']}\r\n"
+            f"Subject: {encoded_subject(reminder['label'])}\r\n"
+            f"Date: {email.utils.formatdate(localtime=True)}\r\n"
+            f"Message-ID: <{uuid.uuid4().hex}@{self.host}>\r\n"
+            "MIME-Version: 1.0\r\n"
+            "Content-Type: text/plain; charset=\"utf-8\"\r\n"
+            "Content-Transfer-Encoding: quoted-printable\r\n\r\n"
+        )
+        body = quopri.encodestring(text.replace("\n", "\r\n").encode('utf-8'))
+        return headers.encode('ascii') + body
+
+    def deliver(self, connection, batch, outcome):
+        for reminder in batch:
+            try:
+                connection.sendmail(self.sender, [reminder["email"]], self.message(reminder))
+                outcome[reminder["key"]] = None
+            except smtplib.SMTPRecipientsRefused as e:
+                outcome[reminder["key"]] = f"Empfänger abgelehnt: {e.recipients}"
+            except smtplib.SMTPResponseException as e:
+                if 400 <= e.smtp_code < 500:
+                    raise TransientError(f"{e.smtp_code} {e.smtp_error!r}") from e
+                outcome[reminder["key"]] = f"{e.smtp_code} {e.smtp_error!r}"
+                connection.rset()
+
+
+class WebhookTransport(PooledTransport):
+    """Schickt jeden Batch als {"reminders": [...]} per POST, z.B. an einen Chat-Bot, der die Nachrichten verteilt."""
+
+    def __init__(self, url, connections=4, timeout=30, headers=None):
+        super().__init__(connections)
+        self.url = urllib.parse.urlsplit(url)
+        if self.url.scheme not in ('http', 'https'):
+            raise ValueError(f"Ungültige Webhook-URL '{url}'")
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    @classmethod
+    def from_environment(cls, connections=4):
+        url = os.environ.get('PLAN_REMINDER_WEBHOOK')
+        if not url:
+            raise ValueError("PLAN_REMINDER_WEBHOOK ist nicht gesetzt")
+        token = os.environ.get('PLAN_REMINDER_WEBHOOK_TOKEN')
+        return cls(url, connections=connections, headers={"Authorization": f"Bearer {token}"} if token else None)
+
+    def connect(self):
+        connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.url.hostname, self.url.port, timeout=self.timeout)
+
+    def disconnect(self, connection):
+        connection.close()
+
+    def deliver(self, connection, batch, outcome):
+        body = json.dumps({"reminders": batch}, ensure_ascii=False).encode('utf-8')
+        path = self.url.path or '/'
+        if self.url.query:
+            path += f"?{self.url.query}"
+        # Keep-Alive: http.client verbindet bei Bedarf selbst neu und hält die Verbindung sonst offen
+        connection.request('POST', path, body=body, headers=self.headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status == 429 or response.status >= 500:
+            raise TransientError(f"HTTP {response.status}")
+        error = None if 200 <= response.status < 300 else f"HTTP {response.status}"
+        for reminder in batch:
+            outcome[reminder["key"]] = error
+
+
+async def send_with_retry(transport, batch, outcome, retries=4, backoff=0.5):
+    """Verschickt einen Batch, bei vorübergehenden Fehlern erneut mit den noch offenen Erinnerungen."""
+    for attempt in range(retries + 1):
+        pending = [reminder for reminder in batch if reminder["key"] not in outcome]
+        if not pending:
+            return
+        try:
+            await transport.send(pending, outcome)
+            return
+        except TransientError as e:
+            if attempt == retries:
+                for reminder in pending:
+                    outcome.setdefault(reminder["key"], f"Abgebrochen nach {retries + 1} Versuchen: {e}")
+                return
+            # Exponentiell mit Zufallsanteil, damit nicht alle Batches gleichzeitig wiederkommen
+            await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.0))
+
+
+async def dispatch(reminders, transport, batch_size=50, retries=4, backoff=0.5, on_sent=None):
+    """Verschickt alle Erinnerungen in Batches über die Verbindungen des Transports.
+
+    on_sent(reminders) wird nach jedem Batch mit den erfolgreich verschickten Erinnerungen aufgerufen
+    (ReminderLog.record). Gibt {Schlüssel: None oder Fehlermeldung} zurück.
+    """
+    outcome = {}
+
+    async def run_batch(batch):
+        await send_with_retry(transport, batch, outcome, retries, backoff)
+        if on_sent is not None:
+            on_sent([reminder for reminder in batch if reminder["key"] in outcome and outcome[reminder["key"]] is None])
+
+    batches = [reminders[start:start + batch_size] for start in range(0, len(reminders), batch_size)]
+    await asyncio.gather(*(run_batch(batch) for batch in batches))
+    return outcome
+
+
+class LocalSMTPServer:
+    """Lokaler Stellvertreter für einen SMTP-Server (--local und Tests), sammelt die Nachrichten in messages.
+    Mit fail_first beantwortet er die ersten DATA-Befehle mit 451, um die Wiederholung zu prüfen."""
+
+    def __init__(self, host='127.0.0.1', port=0, fail_first=0):
+        self.host = host
+        self.port = port
+        self.fail_first = fail_first
+        self.messages = []
+        self.connections = 0
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.server.close()
+        await self.server.wait_closed()
+        return False
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 localhost ESMTP\r\n")
+        recipients = []
+        while line := await reader.readline():
+            command = line.decode('utf-8', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                writer.write(b"250 localhost\r\n")
+            elif command.startswith('RCPT'):
+                recipients.append(line.decode('utf-8', 'replace').split(':', 1)[1].strip())
+                writer.write(b"250 OK\r\n")
+            elif command.startswith('DATA'):
+                writer.write(b"354 Ende mit <CRLF>.<CRLF>\r\n")
+                await writer.drain()
+                data = []
+                while (data_line := await reader.readline()) not in (b".\r\n", b""):
+                    data.append(data_line)
+                if self.fail_first > 0:
+                    self.fail_first -= 1
+                    writer.write(b"451 Bitte spaeter erneut versuchen\r\n")
+                else:
+                    self.messages.append({"to": recipients, "data": b"".join(data)})
+                    writer.write(b"250 OK\r\n")
+                recipients = []
+            elif command.startswith('QUIT'):
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                # MAIL, RSET, NOOP
+                if command.startswith(('MAIL', 'RSET')):
+                    recipients = []
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    def transport(self, connections=4):
+        return SMTPTransport(self.host, self.port, sender="spuelplan@localhost", connections=connections)
+
+
+class LocalWebhookServer:
+    """Lokaler Stellvertreter für den Webhook (--local und Tests), sammelt die JSON-Bodys in requests.
+    Mit fail_first beantwortet er die ersten Anfragen mit 503."""
+
+    def __init__(self, host='127.0.0.1', port=0, fail_first=0):
+        self.host = host
+        self.port = port
+        self.fail_first = fail_first
+        self.requests = []
+        self.connections = 0
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.server.close()
+        await self.server.wait_closed()
+        return False
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        # Keep-Alive: mehrere Anfragen pro Verbindung, bis der Client sie schließt
+        while await reader.readline():
+            length = 0
+            while (header := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = header.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value.strip())
+            body = await reader.readexactly(length)
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+            else:
+                self.requests.append(json.loads(body))
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+        writer.close()
+
+    def transport(self, connections=4):
+        return WebhookTransport(f"http://{self.host}:{self.port}/reminders", connections=connections)
+
+
+async def run(sites, names, date, transport_name, connections, batch_size, dry_run=False, local=False):
+    """Sammelt die Erinnerungen aller Standorte und verschickt sie. Gibt die Zusammenfassung als dict zurück."""
+    public_url = os.environ.get('PLAN_PUBLIC_URL')
+    summary = {"sent": 0, "already_sent": 0, "without_contact": 0, "failed": {}}
+    pending, logs = [], {}
+    for name in names:
+        site = sites.get(name)
+        logs[name] = ReminderLog(site.reminder_log_file)
+        collected = collect_reminders(site, date, public_url)
+        unsent = logs[name].unsent(collected, date)
+        summary["already_sent"] += len(collected) - len(unsent)
+        pending += unsent
+
+    if dry_run:
+        for reminder in pending:
+            print(f"{reminder['site'] or '-'}: {reminder['label']} {reminder['name']} <{reminder['email'] or 'keine Adresse'}>")
+        return summary
+
+    if local:
+        server = LocalSMTPServer() if transport_name == 'smtp' else LocalWebhookServer()
+    else:
+        server = None
+        transport = (SMTPTransport if transport_name == 'smtp' else WebhookTransport).from_environment(connections)
+
+    def record(reminders):
+        # --local verschickt nichts wirklich und wird deshalb nicht protokolliert
+        if local:
+            return
+        by_site = {}
+        for reminder in reminders:
+            by_site.setdefault(reminder["site"], []).append(reminder)
+        for name, sent in by_site.items():
+            logs[name].record(sent)
+
+    async with server or nullcontext():
+        if server is not None:
+            transport = server.transport(connections)
+        deliverable = [reminder for reminder in pending if transport.accepts(reminder)]
+        summary["without_contact"] = len(pending) - len(deliverable)
+        async with transport:
+            outcome = await dispatch(deliverable, transport, batch_size=batch_size, on_sent=record)
+    summary["sent"] = sum(1 for error in outcome.values() if error is None)
+    summary["failed"] = {key: error for key, error in outcome.items() if error is not None}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tägliche Erinnerung an den Dienst per E-Mail oder Webhook verschicken")
+    parser.add_argument('--date', type=datetime.date.fromisoformat, default=datetime.date.today(), help="Tag im Format JJJJ-MM-TT, ohne Angabe heute")
+    parser.add_argument('--site', action='append', help="Nur diese Standorte, ohne Angabe alle ('-' für den Standard-Standort)")
+    parser.add_argument('--transport', choices=['smtp', 'webhook'], default=os.environ.get('PLAN_REMINDER_TRANSPORT', 'smtp'))
+    parser.add_argument('--connections', type=int, default=int(os.environ.get('PLAN_REMINDER_CONNECTIONS', 4)))
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--dry-run', action='store_true', help="Nur anzeigen, was verschickt würde")
+    parser.add_argument('--local', action='store_true', help="An einen lokalen Stellvertreter statt an den echten Server schicken")
+    args = parser.parse_args()
+
+    sites = SiteRegistry('./data/', 'static', os.environ.get('PLAN_SITES_DIR', './sites/'), max_sites=int(os.environ.get('PLAN_SITE_CACHE', 16)))
+    names = [None if name == '-' else name for name in args.site] if args.site else sites.names()
+    for name in names:
+        if not sites.exists(name):
+            parser.error(f"Standort '{name}' existiert nicht")
+
+    start = time.perf_counter()
+    # Zwei gleichzeitige Läufe (z.B. Cronjob und manueller Start) würden sonst doppelt verschicken
+    with ExitStack() as locks:
+        for name in names:
+            locks.enter_context(file_lock(ReminderLog(sites.get(name).reminder_log_file).lock_file))
+        try:
+            summary = asyncio.run(run(sites, names, args.date, args.transport, args.connections, args.batch_size, args.dry_run, args.local))
+        except ValueError as e:
+            parser.exit(1, f"Fehler: {e}\n")
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{summary['sent']} Erinnerungen verschickt in {elapsed:.1f}s, {summary['already_sent']} bereits verschickt, "
+        f"{summary['without_contact']} ohne Adresse, {len(summary['failed'])} fehlgeschlagen"
+    )
+    for key, error in summary["failed"].items():
+        print(f"Fehler bei {key}: {error}")
+
+
+if __name__ == '__main__':
+    main()
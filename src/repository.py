@@ -0,0 +1,461 @@
+"""
+Speicher für die Daten eines Standorts: wie bisher als CSV-Dateien oder optional in einer SQLite-Datenbank.
+
+Scheduler, Änderungsprotokoll und Admin-API greifen nur über das Repository auf die Daten zu. Tabellen werden
+über den Dateinamen angesprochen (z.B. 'Azubis.csv'), Zeilen sind dicts mit den Spaltennamen der CSV-Datei.
+
+    rows(filename)                     alle Zeilen in Dateireihenfolge, None wenn es die Tabelle nicht gibt
+    table(filename)                    CSVTable für die paginierte Admin-Ansicht (csv_index.py)
+    files() / signatures()             vorhandene Tabellen und ein Änderungsstand pro Tabelle
+    fingerprint(filename)              Inhaltsstand einer Tabelle für das Änderungsprotokoll, None wenn es sie nicht gibt
+    edit(filename, op, params)         eine Änderung aus changelog.py (update/delete/insert/reorder/add)
+    dump() / load(files)               alle Tabellen als CSV-Inhalt {Dateiname: bytes} für die Backups (backup_store.py)
+
+CSVRepository liest und schreibt die Dateien in data/ wie bisher komplett. SQLiteRepository legt die Daten in
+data/plan.sqlite ab (WAL-Modus, kein Server nötig): mehrere Leser und ein Schreiber gleichzeitig, jede Zeile
+hat ihre Position als Primärschlüssel, Änderungen an einzelnen Zellen kosten O(log n) statt die ganze Datei
+neu zu schreiben. Blockwochen haben einen Index auf (Jahr, Lehrjahr, Kalenderwoche), Schließzeiten,
+Diensttausche und der generierte Plan einen auf das Datum. Ein Standort verwendet SQLite, sobald es
+data/plan.sqlite gibt. Für den Excel-Workflow werden die Daten per Kommandozeile im- und exportiert:
+
+    python repository.py import data/      CSV-Dateien in data/plan.sqlite übernehmen
+    python repository.py export data/      Tabellen aus data/plan.sqlite wieder als CSV-Dateien schreiben
+
+Author: pascal.blum@nikoit.de
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import pandas as pd
+from csv_index import CSVIndex, CSVTable
+
+DATABASE_FILE = "plan.sqlite"
+
+# Dateiname -> (Tabellenname, Indizes). Unbekannte CSV-Dateien bekommen eine Tabelle nach ihrem Dateinamen.
+TABLES = {
+    "Azubis.csv": ("azubis", [("Nachname", "Vorname")]),
+    "Blockwochen_Schule.csv": ("blockwochen", [("Jahr", "Lehrjahr", "Kalenderwoche")]),
+    "Feiertage_Schließzeiten_Brückentage.csv": ("schliesszeiten", [("Datum",)]),
+    "Abwesenheiten.csv": ("abwesenheiten", [("Nachname", "Vorname"), ("Von",)]),
+    "Dienste.csv": ("dienste", []),
+    "Diensttausch.csv": ("diensttausch", [("Datum",)])
+}
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS files (
+        filename TEXT PRIMARY KEY,
+        table_name TEXT NOT NULL UNIQUE,
+        columns TEXT NOT NULL,
+        revision INTEGER NOT NULL DEFAULT 0
+    )""",
+    # Veröffentlichter Plan, eine Zeile pro Tag und Slot
+    """CREATE TABLE IF NOT EXISTS schedule (
+        date TEXT NOT NULL,
+        slot TEXT NOT NULL,
+        school_year INTEGER NOT NULL,
+        name TEXT,
+        PRIMARY KEY (date, slot)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS schedule_school_year ON schedule (school_year)"
+)
+
+
+def clean(value):
+    return '' if pd.isna(value) else value
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def database_path(data_dir):
+    return os.path.join(data_dir, DATABASE_FILE)
+
+
+def parse_csv(content):
+    """(Spalten, Zeilen) aus dem Inhalt einer CSV-Datei, leere Zeilen werden übersprungen."""
+    reader = csv.reader(io.StringIO(content.decode('utf-8-sig'), newline=''), delimiter=';')
+    return next(reader, []), [row for row in reader if row]
+
+
+def open_repository(data_dir):
+    """SQLiteRepository, wenn es im Datenverzeichnis eine plan.sqlite gibt, sonst CSVRepository."""
+    if os.path.exists(database_path(data_dir)):
+        return SQLiteRepository(database_path(data_dir))
+    return CSVRepository(data_dir)
+
+
+class CSVRepository:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.index = CSVIndex()
+
+    def __getstate__(self):
+        # Für die Szenario-Prozesse reicht das Verzeichnis, der Index wird dort neu aufgebaut
+        return {"data_dir": self.data_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state["data_dir"])
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def files(self):
+        return sorted(f for f in os.listdir(self.data_dir) if f.endswith('.csv'))
+
+    def signatures(self):
+        state = {}
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.csv') and entry.is_file():
+                    stat = entry.stat()
+                    state[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def fingerprint(self, filename):
+        """SHA-256 des Dateiinhalts, erkennt auch Änderungen außerhalb der Admin-Oberfläche (z.B. in Excel)."""
+        if not os.path.exists(self.path(filename)):
+            return None
+        with open(self.path(filename), 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+
+    def rows(self, filename):
+        if not os.path.exists(self.path(filename)):
+            return None
+        with open(self.path(filename), 'r', encoding='utf-8-sig') as file:
+            return list(csv.DictReader(file, delimiter=';'))
+
+    def table(self, filename):
+        if not os.path.exists(self.path(filename)):
+            return None
+        return self.index.get(self.path(filename))
+
+    def read(self, filename):
+        return pd.read_csv(self.path(filename), sep=';', dtype=str)
+
+    def write(self, filename, df):
+        df.to_csv(self.path(filename), sep=';', index=False)
+
+    def edit(self, filename, op, params):
+        """Führt die Änderung auf der ganzen Datei aus und gibt die Angaben für das Änderungsprotokoll zurück."""
+        df = self.read(filename)
+
+        if op == 'update':
+            index, column, value = params['index'], params['column'], params['value']
+            change = {"index": index, "column": column, "old": clean(df.iloc[index, df.columns.get_loc(column)]), "value": value}
+            df.iloc[index, df.columns.get_loc(column)] = value
+        elif op == 'delete':
+            index = params['index']
+            change = {"index": index, "row": {column: clean(value) for column, value in df.iloc[index].items()}}
+            df = df.drop(index=index).reset_index(drop=True)
+        elif op == 'insert':
+            # Ohne index wird die Zeile angehängt
+            index = len(df) if params.get('index') is None else params['index']
+            row = params['row']
+            change = {"index": index, "row": row}
+            top, bottom = df.iloc[:index], df.iloc[index:]
+            df = pd.concat([top, pd.DataFrame([row], columns=df.columns), bottom], ignore_index=True)
+        elif op == 'reorder':
+            order = list(params['order'])
+            change = {"order": order}
+            df = df.reindex(order).reset_index(drop=True)
+        elif op == 'add':
+            change = {"index": len(df)}
+            new_row = {col: "" for col in df.columns}
+            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+        else:
+            raise ValueError(f"Unbekannte Operation '{op}'")
+
+        self.write(filename, df)
+        return change
+
+    def dump(self):
+        content = {}
+        for filename in self.files():
+            with open(self.path(filename), 'rb') as f:
+                content[filename] = f.read()
+        return content
+
+    def load(self, files):
+        """Schreibt erst alle Dateien als temporäre Dateien und tauscht sie dann gemeinsam per os.replace aus,
+        sodass immer ein zusammenhängender Stand aller Dateien vorliegt."""
+        staged = []
+        try:
+            for filename, content in files.items():
+                tmp_file = f"{self.path(filename)}.restore.tmp"
+                with open(tmp_file, 'wb') as f:
+                    f.write(content)
+                staged.append((tmp_file, self.path(filename)))
+        except Exception:
+            for tmp_file, _ in staged:
+                os.remove(tmp_file)
+            raise
+
+        for tmp_file, target in staged:
+            os.replace(tmp_file, target)
+
+
+class SQLiteRepository:
+    def __init__(self, database_file):
+        self.database_file = database_file
+        self.local = threading.local()
+        self.tables = {}
+        self.tables_lock = threading.Lock()
+        with self.transaction() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def __getstate__(self):
+        return {"database_file": self.database_file}
+
+    def __setstate__(self, state):
+        self.__init__(state["database_file"])
+
+    def connection(self):
+        """Eine Verbindung pro Thread, im WAL-Modus blockieren Leser den Schreiber nicht."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.database_file, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    def file_info(self, filename, connection=None):
+        """(Tabellenname, Spalten) einer Datei oder None."""
+        row = (connection or self.connection()).execute(
+            "SELECT table_name, columns FROM files WHERE filename = ?", (filename,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def files(self):
+        return [row[0] for row in self.connection().execute("SELECT filename FROM files ORDER BY filename")]
+
+    def signatures(self):
+        return {filename: revision for filename, revision in self.connection().execute("SELECT filename, revision FROM files")}
+
+    def fingerprint(self, filename):
+        """Revision der Tabelle, sie steigt bei jeder Änderung und jedem Import."""
+        return self.signatures().get(filename)
+
+    def rows(self, filename):
+        info = self.file_info(filename)
+        if info is None:
+            return None
+        table_name, columns = info
+        cursor = self.connection().execute(
+            f"SELECT {', '.join(quote(column) for column in columns)} FROM {quote(table_name)} ORDER BY position"
+        )
+        return [dict(zip(columns, (value or '' for value in row))) for row in cursor]
+
+    def table(self, filename):
+        """CSVTable aus der Datenbank, wird nur bei geänderter Revision neu aufgebaut."""
+        revision = self.signatures().get(filename)
+        if revision is None:
+            return None
+        with self.tables_lock:
+            cached = self.tables.get(filename)
+            if cached and cached[0] == revision:
+                return cached[1]
+        rows = self.rows(filename)
+        columns = self.file_info(filename)[1]
+        table = CSVTable(columns, ([row[column] for column in columns] for row in rows))
+        with self.tables_lock:
+            self.tables[filename] = (revision, table)
+        return table
+
+    def create_table(self, connection, filename, columns, rows):
+        """Legt die Tabelle für eine Datei (neu) an und füllt sie mit rows (Listen in Spaltenreihenfolge)."""
+        default_name = os.path.splitext(filename)[0].lower()
+        table_name, indexes = TABLES.get(filename, (default_name, []))
+        connection.execute(f"DROP TABLE IF EXISTS {quote(table_name)}")
+        connection.execute(
+            f"CREATE TABLE {quote(table_name)} (position INTEGER PRIMARY KEY, "
+            + ", ".join(f"{quote(column)} TEXT" for column in columns) + ")"
+        )
+        for number, index_columns in enumerate(indexes):
+            if all(column in columns for column in index_columns):
+                connection.execute(
+                    f"CREATE INDEX {quote(f'{table_name}_{number}')} ON {quote(table_name)} "
+                    f"({', '.join(quote(column) for column in index_columns)})"
+                )
+        width = len(columns)
+        connection.executemany(
+            f"INSERT INTO {quote(table_name)} VALUES (?{', ?' * width})",
+            ((position, *(list(row) + [''] * width)[:width]) for position, row in enumerate(rows))
+        )
+        connection.execute(
+            "INSERT INTO files (filename, table_name, columns, revision) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (filename) DO UPDATE SET columns = excluded.columns, revision = files.revision + 1",
+            (filename, table_name, json.dumps(columns, ensure_ascii=False))
+        )
+
+    def shift(self, connection, table_name, start, delta):
+        """Verschiebt die Positionen ab start um delta. Der Umweg über negative Werte vermeidet Konflikte
+        mit dem Primärschlüssel während des UPDATE."""
+        table = quote(table_name)
+        connection.execute(f"UPDATE {table} SET position = -(position + ?) - 1 WHERE position >= ?", (delta, start))
+        connection.execute(f"UPDATE {table} SET position = -position - 1 WHERE position < 0")
+
+    def row_at(self, connection, table_name, columns, index):
+        row = connection.execute(
+            f"SELECT {', '.join(quote(column) for column in columns)} FROM {quote(table_name)} WHERE position = ?", (index,)
+        ).fetchone()
+        if row is None:
+            raise IndexError(f"Zeile {index} existiert nicht")
+        return {column: value or '' for column, value in zip(columns, row)}
+
+    def edit(self, filename, op, params):
+        """Führt die Änderung in einer Transaktion aus und gibt die Angaben für das Änderungsprotokoll zurück."""
+        with self.transaction() as connection:
+            info = self.file_info(filename, connection)
+            if info is None:
+                raise ValueError(f"Tabelle '{filename}' existiert nicht")
+            table_name, columns = info
+            table = quote(table_name)
+            count = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+            if op == 'update':
+                index, column, value = params['index'], params['column'], params['value']
+                if column not in columns:
+                    raise ValueError(f"Unbekannte Spalte '{column}'")
+                change = {"index": index, "column": column, "old": self.row_at(connection, table_name, columns, index)[column], "value": value}
+                connection.execute(f"UPDATE {table} SET {quote(column)} = ? WHERE position = ?", (value, index))
+            elif op == 'delete':
+                index = params['index']
+                change = {"index": index, "row": self.row_at(connection, table_name, columns, index)}
+                connection.execute(f"DELETE FROM {table} WHERE position = ?", (index,))
+                self.shift(connection, table_name, index + 1, -1)
+            elif op in ('insert', 'add'):
+                # Ohne index wird die Zeile angehängt, 'add' hängt eine leere Zeile an
+                index = count if op == 'add' or params.get('index') is None else params['index']
+                row = {column: "" for column in columns} if op == 'add' else params['row']
+                change = {"index": index} if op == 'add' else {"index": index, "row": row}
+                self.shift(connection, table_name, index, 1)
+                connection.execute(
+                    f"INSERT INTO {table} VALUES (?{', ?' * len(columns)})",
+                    (index, *(clean(row.get(column, '')) for column in columns))
+                )
+            elif op == 'reorder':
+                order = list(params['order'])
+                if sorted(order) != list(range(count)):
+                    raise ValueError("Die Reihenfolge muss jede Zeile genau einmal enthalten")
+                change = {"order": order}
+                connection.executemany(
+                    f"UPDATE {table} SET position = -? - 1 WHERE position = ?",
+                    ((new, old) for new, old in enumerate(order))
+                )
+                connection.execute(f"UPDATE {table} SET position = -position - 1 WHERE position < 0")
+            else:
+                raise ValueError(f"Unbekannte Operation '{op}'")
+
+            connection.execute("UPDATE files SET revision = revision + 1 WHERE filename = ?", (filename,))
+        return change
+
+    def save_schedule(self, school_year, schedule, slots):
+        """Ersetzt den generierten Plan eines Schuljahres."""
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM schedule WHERE school_year = ?", (school_year,))
+            connection.executemany(
+                "INSERT OR REPLACE INTO schedule (date, slot, school_year, name) VALUES (?, ?, ?, ?)",
+                (
+                    (entry['date'].isoformat(), slot.key, school_year, entry.get(slot.key))
+                    for entry in schedule for slot in slots
+                )
+            )
+
+    def schedule_between(self, start, end):
+        """Einträge {date (ISO), Slot: Name} von start bis end (inklusive) über den Index auf dem Datum."""
+        days = {}
+        cursor = self.connection().execute(
+            "SELECT date, slot, name FROM schedule WHERE date BETWEEN ? AND ? ORDER BY date",
+            (start.isoformat(), end.isoformat())
+        )
+        for date, slot, name in cursor:
+            days.setdefault(date, {"date": date})[slot] = name
+        return list(days.values())
+
+    def import_csv(self, data_dir):
+        """Übernimmt alle CSV-Dateien aus data_dir, vorhandene Tabellen werden ersetzt."""
+        files = {}
+        for filename in sorted(f for f in os.listdir(data_dir) if f.endswith('.csv')):
+            with open(os.path.join(data_dir, filename), 'rb') as f:
+                files[filename] = f.read()
+        self.load(files)
+        return list(files)
+
+    def dump(self):
+        """Alle Tabellen als CSV-Inhalt, aus einer Lesetransaktion, damit die Tabellen zusammenpassen."""
+        connection = self.connection()
+        content = {}
+        connection.execute("BEGIN")
+        try:
+            for filename in self.files():
+                columns = self.file_info(filename, connection)[1]
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, delimiter=';', lineterminator='\n')
+                writer.writerow(columns)
+                writer.writerows([row[column] for column in columns] for row in self.rows(filename))
+                content[filename] = buffer.getvalue().encode('utf-8')
+        finally:
+            connection.execute("COMMIT")
+        return content
+
+    def load(self, files):
+        """Ersetzt die Tabellen aus {Dateiname: CSV-Inhalt} gemeinsam in einer Transaktion."""
+        with self.transaction() as connection:
+            for filename, content in files.items():
+                self.create_table(connection, filename, *parse_csv(content))
+
+    def export_csv(self, data_dir):
+        """Schreibt alle Tabellen als CSV-Dateien nach data_dir (zum Bearbeiten in Excel)."""
+        exported = []
+        for filename, content in self.dump().items():
+            path = os.path.join(data_dir, filename)
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+            exported.append(filename)
+        return exported
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK, damit sich zwei Schreiber nicht erst beim Commit gegenseitig stören."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV-Daten eines Standorts in SQLite übernehmen oder wieder als CSV exportieren")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('data_dir', nargs='?', default='data')
+    args = parser.parse_args()
+
+    repository = SQLiteRepository(database_path(args.data_dir))
+    if args.command == 'import':
+        files = repository.import_csv(args.data_dir)
+        print(f"{len(files)} Dateien nach {database_path(args.data_dir)} übernommen: {', '.join(files)}")
+    else:
+        files = repository.export_csv(args.data_dir)
+        print(f"{len(files)} Tabellen als CSV nach {args.data_dir} geschrieben: {', '.join(files)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Rotationszustand des Schedulers über Schuljahresgrenzen hinweg.
+
+Hält pro Slot (Dienst, Vertretung, ...) die Reihenfolge der Rotation, wer zuletzt dran war und die kumulierten Zähler,
+damit ein neues Schuljahr dort weitermacht, wo das alte aufgehört hat. Der Zustand kann als JSON
+gespeichert und beim nächsten Lauf wieder geladen werden.
+
+Neue Azubis werden hinten in die Rotation eingereiht und starten mit dem aktuell niedrigsten Zähler der
+aktiven Azubis, damit sie nicht wochenlang jeden Tag eingeteilt werden. Ausgeschiedene Azubis fallen aus der
+Rotation, ihre Zähler bleiben aber erhalten, falls sie wieder aktiv werden.
+
+Author: pascal.blum@nikoit.de
+"""
+import json
+import os
+
+
+def azubi_name(azubi):
+    return f"{azubi['firstname']} {azubi['lastname']}"
+
+
+class RotationState:
+    def __init__(self):
+        # Pro Slot-Schlüssel (z.B. 'primary', 'secondary'): Reihenfolge, Zähler und wer zuletzt dran war
+        self.orders = {}
+        self.counts = {}
+        self.last = {}
+        self.years = []
+
+    def restore(self, azubis, keys=('primary', 'secondary')):
+        """Baut Reihenfolge und Zähler pro Slot für die aktuell aktiven Azubis auf.
+
+        Gibt ({Slot: Liste der Azubis in Rotationsreihenfolge}, {Slot: {Name: Zähler}}) zurück. Ohne
+        gespeicherten Stand läuft jeder zweite Slot in umgekehrter Reihenfolge, damit nicht dieselbe
+        Person an einem Tag vorne in allen Slots steht. Zurückgegeben werden Kopien, der Zustand selbst ändert
+        sich erst mit capture().
+        """
+        by_name = {azubi_name(azubi): azubi for azubi in azubis}
+
+        def ordered(order, default):
+            known = [by_name[name] for name in order if name in by_name]
+            known_names = set(order)
+            return known + [azubi for azubi in default if azubi_name(azubi) not in known_names]
+
+        orders, counts = {}, {}
+        for position, key in enumerate(keys):
+            default = list(azubis) if position % 2 == 0 else list(reversed(azubis))
+            orders[key] = ordered(self.orders[key], default) if self.years and key in self.orders else default
+
+            counts[key] = dict(self.counts.get(key, {}))
+            active = [counts[key][name] for name in by_name if name in counts[key]]
+            start = min(active) if active else 0
+            for name in by_name:
+                counts[key].setdefault(name, start)
+
+        return orders, counts
+
+    def capture(self, year, orders, counts, last):
+        """Übernimmt den Stand am Ende eines Schuljahres."""
+        for key, order in orders.items():
+            self.orders[key] = [azubi_name(azubi) for azubi in order]
+        for key, slot_counts in counts.items():
+            self.counts[key] = dict(slot_counts)
+        self.last.update(last)
+        if year not in self.years:
+            self.years.append(year)
+
+    def to_dict(self):
+        return {
+            "years": self.years,
+            "orders": self.orders,
+            "counts": self.counts,
+            "last": self.last
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.years = list(data.get("years", []))
+        state.orders = {key: list(order) for key, order in data.get("orders", {}).items()}
+        state.counts = {key: dict(counts) for key, counts in data.get("counts", {}).items()}
+        state.last = dict(data.get("last", {}))
+        return state
+
+    def save(self, state_file):
+        """Schreibt den Zustand atomar (erst temporäre Datei, dann umbenennen)."""
+        state_dir = os.path.dirname(state_file)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        tmp_file = f"{state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, state_file)
+
+    @classmethod
+    def load(cls, state_file):
+        """Lädt einen gespeicherten Zustand oder gibt einen leeren Zustand zurück."""
+        if not os.path.exists(state_file):
+            return cls()
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except Exception as e:
+            raise ValueError(f"Fehler beim laden des Rotationszustands: {e}")
@@ -0,0 +1,175 @@
+"""
+Was-wäre-wenn-Szenarien: Pläne mit Änderungen über den aktuellen Daten berechnen, ohne etwas in data/ zu schreiben.
+
+Ein Szenario ist ein dict mit einem Namen, optional einem seed (reproduzierbare Start-Reihenfolge der Rotation)
+und einem overlay mit Änderungen, die nur im Speicher auf den geladenen Scheduler angewendet werden:
+
+    {
+        "name": "Zwei neue Azubis",
+        "seed": 1,
+        "overlay": {
+            "add_azubis": [{"Vorname": "Max", "Nachname": "Mustermann", "Lehrjahr": 1, "Rolle": "Vertretung"}],
+            "remove_azubis": ["Erika Musterfrau"],
+            "add_blockweeks": [{"Jahr": 2025, "Lehrjahr": 1, "Kalenderwoche": 8}],
+            "remove_blockweeks": [{"Jahr": 2025, "Lehrjahr": 1, "Kalenderwoche": 9}],
+            "add_closures": ["24.12.2025-06.01.2026"],
+            "add_absences": [{"Vorname": "Max", "Nachname": "Mustermann", "Von": "01.03.2025", "Bis": "14.03.2025"}]
+        }
+    }
+
+Die Szenarien laufen parallel in eigenen Prozessen. Jedes Ergebnis enthält die Fairness-Statistik und die Tage,
+an denen sich Dienst oder Vertretung gegenüber dem unveränderten Plan ändern.
+
+Author: pascal.blum@nikoit.de
+"""
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from generate_plan import CleaningDutyScheduler, azubi_from_row
+from statistics_cache import summarize
+
+# Erlaubte Schlüssel im overlay und der Typ ihrer Listeneinträge
+OVERLAY_KEYS = {
+    "add_azubis": dict,
+    "remove_azubis": str,
+    "add_blockweeks": dict,
+    "remove_blockweeks": dict,
+    "add_closures": str,
+    "add_absences": dict
+}
+
+
+def check_scenario(scenario):
+    """Prüft den Aufbau eines Szenarios, bevor es an die Prozesse geht. Wirft ValueError mit einer Meldung."""
+    if not isinstance(scenario, dict):
+        raise ValueError("Ein Szenario muss ein Objekt sein")
+    seed = scenario.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise ValueError("seed muss eine ganze Zahl sein")
+    overlay = scenario.get('overlay')
+    if overlay is None:
+        return
+    if not isinstance(overlay, dict):
+        raise ValueError("overlay muss ein Objekt sein")
+    for key, values in overlay.items():
+        if key not in OVERLAY_KEYS:
+            raise ValueError(f"Unbekannter Schlüssel '{key}' im overlay")
+        if not isinstance(values, list) or not all(isinstance(value, OVERLAY_KEYS[key]) for value in values):
+            kind = "Objekten" if OVERLAY_KEYS[key] is dict else "Texten"
+            raise ValueError(f"'{key}' muss eine Liste von {kind} sein")
+
+
+def apply_overlay(scheduler, overlay):
+    """Wendet die Änderungen eines Szenarios im Speicher auf den Scheduler an."""
+    overlay = overlay or {}
+
+    removed = set(overlay.get('remove_azubis', []))
+    scheduler.azubis = [
+        azubi for azubi in scheduler.azubis if f"{azubi['firstname']} {azubi['lastname']}" not in removed
+    ]
+    for row in overlay.get('add_azubis', []):
+        scheduler.azubis.append(azubi_from_row(row))
+    scheduler.index_azubis()
+
+    for row in overlay.get('add_blockweeks', []):
+        weeks = scheduler.blockweeks[(int(row['Jahr']), int(row['Lehrjahr']))]
+        if int(row['Kalenderwoche']) not in weeks:
+            weeks.append(int(row['Kalenderwoche']))
+    for row in overlay.get('remove_blockweeks', []):
+        weeks = scheduler.blockweeks.get((int(row['Jahr']), int(row['Lehrjahr'])), [])
+        if int(row['Kalenderwoche']) in weeks:
+            weeks.remove(int(row['Kalenderwoche']))
+
+    for text in overlay.get('add_closures', []):
+        scheduler.holidays.parse(text)
+
+    for row in overlay.get('add_absences', []):
+        start = datetime.datetime.strptime(row['Von'], '%d.%m.%Y').date()
+        end = datetime.datetime.strptime(row['Bis'], '%d.%m.%Y').date() if row.get('Bis') else start
+        scheduler.absences.add(f"{row['Vorname']} {row['Nachname']}", start, end)
+
+    return scheduler
+
+
+def compact(schedule):
+    """Plan als {ISO-Datum: {Slot: Name}} für den Vergleich und die Übergabe zwischen Prozessen."""
+    return {
+        entry['date'].isoformat(): {key: value for key, value in entry.items() if key != 'date'}
+        for entry in schedule
+    }
+
+
+def fairness(stats):
+    """Fairness-Kennzahlen wie in der History, ohne Zeitstempel und Planversion."""
+    summary = summarize(stats, None, None)
+    del summary['timestamp'], summary['plan_version']
+    return summary
+
+
+def diff_plans(baseline, variant):
+    """Tage, an denen sich mindestens ein Slot (Dienst, Vertretung, ...) unterscheidet."""
+    changes = []
+    for date in sorted(set(baseline) | set(variant)):
+        before = baseline.get(date, {})
+        after = variant.get(date, {})
+        if before != after:
+            changes.append({"date": date, "before": before, "after": after})
+    return changes
+
+
+def run_scenario(files, year, scenario, baseline, optimize=False, repository=None):
+    """Berechnet ein Szenario. Läuft in einem eigenen Prozess, deshalb nur einfache Datentypen als Ein-/Ausgabe
+    (ein Repository wird nur mit seinem Pfad übergeben)."""
+    scheduler = apply_overlay(CleaningDutyScheduler(*files, repository=repository), scenario.get('overlay'))
+    schedule = scheduler.generate_schedule(year, optimize=optimize, seed=scenario.get('seed'))
+    stats = scheduler.generate_statistics(schedule)
+    changes = diff_plans(baseline, compact(schedule))
+    return {
+        "name": scenario.get('name'),
+        "seed": scenario.get('seed'),
+        "fairness": fairness(stats),
+        "statistics": stats,
+        "violations": len(scheduler.violations),
+        "changed_days": len(changes),
+        "diff": changes
+    }
+
+
+def run_baseline(files, year, seed, optimize=False, repository=None):
+    """Berechnet den unveränderten Plan für einen seed, läuft wie run_scenario in einem eigenen Prozess."""
+    scheduler = CleaningDutyScheduler(*files, repository=repository)
+    schedule = scheduler.generate_schedule(year, optimize=optimize, seed=seed)
+    return compact(schedule), scheduler.generate_statistics(schedule)
+
+
+def evaluate_scenarios(files, year, scenarios, optimize=False, max_workers=None, repository=None):
+    """Berechnet den unveränderten Plan und alle Szenarien parallel und gibt die Ergebnisse in Eingabereihenfolge zurück.
+
+    Jedes Szenario wird mit dem unveränderten Plan desselben seeds verglichen, damit der Diff nur die Wirkung des
+    overlays zeigt und nicht eine andere Start-Reihenfolge. Die Baselines laufen pro seed einmal mit im Pool,
+    jedes Szenario wird gestartet, sobald die Baseline seines seeds fertig ist."""
+    seeds = {None} | {scenario.get('seed') for scenario in scenarios}
+    workers = max_workers or min(len(scenarios) + len(seeds), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(run_baseline, files, year, seed, optimize, repository): seed for seed in seeds}
+        baselines, futures = {}, {}
+        for future in as_completed(pending):
+            seed = pending[future]
+            baselines[seed] = future.result()
+            for position, scenario in enumerate(scenarios):
+                if scenario.get('seed') == seed:
+                    futures[position] = pool.submit(
+                        run_scenario, files, year, scenario, baselines[seed][0], optimize, repository
+                    )
+        results = [futures[position].result() for position in range(len(scenarios))]
+
+    baseline_stats = baselines[None][1]
+    return {
+        "year": year,
+        "baseline": {
+            "fairness": fairness(baseline_stats),
+            "statistics": baseline_stats
+        },
+        "scenarios": results
+    }
@@ -0,0 +1,50 @@
+"""
+Produktiver Start der Flask-App ohne Debug-Modus.
+
+Standardmäßig wird waitress verwendet (läuft auch unter Windows), mit --threads Threads in einem Prozess.
+Unter Linux können mit gunicorn zusätzlich mehrere Worker-Prozesse gestartet werden, die Konfiguration
+liegt in gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Alle Worker teilen sich den Zustand über das Dateisystem (CSV-Dateien, Änderungsprotokoll, Backups,
+static/), Schreibzugriffe sind über Dateisperren (locks.py) abgesichert.
+
+Author: pascal.blum@nikoit.de
+"""
+import argparse
+import os
+
+from app import app, start_watcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spülmaschinenplan-Server ohne Debug-Modus starten")
+    parser.add_argument('--host', default=os.environ.get('PLAN_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PLAN_PORT', 8080)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('PLAN_THREADS', 16)))
+    parser.add_argument('--auto-regenerate', action='store_true', default=os.environ.get('PLAN_AUTO_REGENERATE') == '1',
+                        help="Plan bei Änderungen an den CSV-Dateien automatisch neu generieren")
+    args = parser.parse_args()
+
+    app.debug = False
+    if args.auto_regenerate:
+        start_watcher()
+
+    try:
+        from waitress import serve
+    except ImportError:
+        # Fallback ohne waitress: Werkzeug-Server mit Threads, aber ohne Debugger und Reloader
+        from werkzeug.serving import run_simple
+        print(f"waitress nicht installiert, starte Werkzeug auf {args.host}:{args.port}")
+        run_simple(args.host, args.port, app, threaded=True, use_debugger=False, use_reloader=False)
+        return
+
+    print(f"Starte waitress auf {args.host}:{args.port} mit {args.threads} Threads")
+    # Offene SSE-Streams der Admin-Seiten belegen je einen der Threads (höchstens EventBroker.max_age Sekunden),
+    # die Plan-Anzeigen fragen nur kurz nach. connection_limit begrenzt offene Sockets, nicht die Threads
+    serve(app, host=args.host, port=args.port, threads=args.threads, connection_limit=max(100, args.threads * 10))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Mehrere Standorte (Sites) in einem Prozess: jeder Standort hat eigene CSV-Daten, eigene Ausgaben und eigene Caches.
+
+Der Standard-Standort liegt wie bisher in data/ und static/ und ist ohne Präfix erreichbar. Weitere Standorte
+liegen unter sites/<name>/data/ bzw. sites/<name>/static/ (Verzeichnis über PLAN_SITES_DIR) und sind unter
+/<name>/... erreichbar. Ein Standort existiert, sobald sein data/-Verzeichnis angelegt ist. Liegt dort eine
+plan.sqlite, liest und schreibt der Standort seine Daten über SQLiteRepository statt über die CSV-Dateien
+(siehe repository.py).
+
+Geladene Standorte (Scheduler, zuletzt generierter Plan, Statistik- und CSV-Caches) hält SiteRegistry in einem
+LRU-Cache mit fester Größe (PLAN_SITE_CACHE). Der Speicherbedarf hängt damit von der Cache-Größe ab und nicht
+von der Anzahl der Standorte, ein verdrängter Standort wird beim nächsten Zugriff einfach neu geladen.
+
+Author: pascal.blum@nikoit.de
+"""
+import bisect
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from backup_store import SnapshotStore
+from changelog import ChangeLog
+from events import EventBroker
+from generate_plan import CleaningDutyScheduler
+from overrides import OverrideTable
+from repository import SQLiteRepository, open_repository
+from statistics_cache import StatisticsCache
+
+SITE_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+# Erste Pfadteile der App, die nicht als Standortname benutzt werden können
+RESERVED_NAMES = {'admin', 'api', 'plan', 'static'}
+
+# Reihenfolge wie im Konstruktor von CleaningDutyScheduler
+SCHEDULER_FILE_NAMES = (
+    "Azubis.csv",
+    "Blockwochen_Schule.csv",
+    "Feiertage_Schließzeiten_Brückentage.csv",
+    "Abwesenheiten.csv",
+    "Dienste.csv"
+)
+OVERRIDES_FILE = "Diensttausch.csv"
+# E-Mail-Adressen für die täglichen Erinnerungen (reminders.py)
+CONTACTS_FILE = "Kontakte.csv"
+
+
+class Site:
+    def __init__(self, name, data_dir, output_dir):
+        # name: None für den Standard-Standort
+        self.name = name
+        self.prefix = f"/{name}" if name else ""
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.backup_dir = os.path.join(data_dir, 'backups')
+        os.makedirs(self.backup_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.data_files = tuple(os.path.join(data_dir, filename) for filename in SCHEDULER_FILE_NAMES)
+        self.plan_file = os.path.join(output_dir, "Spühlmaschinenplan.html")
+        self.ics_file = os.path.join(output_dir, "Spühlmaschinenplan.ics")
+        self.stats_file = os.path.join(output_dir, "statistics.json")
+        # Der generierte Plan ohne Diensttausche, damit Tausche ohne Neugenerierung veröffentlicht werden können
+        self.base_schedule_file = os.path.join(output_dir, "schedule.json")
+        # Zuletzt veröffentlichter Plan (mit Diensttauschen) und Protokoll der Änderungen zwischen zwei Veröffentlichungen
+        self.snapshot_file = os.path.join(output_dir, "plan_snapshot.npz")
+        self.plan_changelog_file = os.path.join(output_dir, "plan_changes.jsonl")
+        self.lock_file = os.path.join(output_dir, ".plan.lock")
+        # Schlüssel (Datum, Dienst, Name) der bereits verschickten Erinnerungen, nicht unter static/, weil Namen drinstehen
+        self.reminder_log_file = os.path.join(data_dir, "reminders.jsonl")
+
+        self.repository = open_repository(data_dir)
+        self.backup_store = SnapshotStore(data_dir, self.backup_dir, repository=self.repository)
+        self.change_log = ChangeLog(data_dir, repository=self.repository)
+        self.statistics_cache = StatisticsCache(self.stats_file)
+        self.admin_events = EventBroker()
+        self.plan_events = EventBroker()
+
+        self.lock = threading.Lock()
+        self._scheduler = (None, None)
+        self._base_schedule = (None, None)
+
+    def data_signature(self):
+        signatures = self.repository.signatures()
+        return tuple(signatures.get(filename) for filename in SCHEDULER_FILE_NAMES)
+
+    def scheduler(self):
+        """Geladener Scheduler, wird nur neu gelesen, wenn sich eine der Tabellen geändert hat."""
+        signature = self.data_signature()
+        with self.lock:
+            cached_signature, scheduler = self._scheduler
+        if cached_signature != signature:
+            scheduler = CleaningDutyScheduler(*self.data_files, repository=self.repository)
+            with self.lock:
+                self._scheduler = (signature, scheduler)
+        return scheduler
+
+    def save_base_schedule(self, scheduler, schedule, stats, school_year, violations):
+        """Speichert den generierten Plan (ohne Diensttausche) samt Statistik und Verstößen atomar."""
+        keys = [slot.key for slot in scheduler.slots]
+        base = {
+            "school_year": school_year,
+            "slots": keys,
+            "schedule": [[entry['date'].isoformat()] + [entry[key] for key in keys] for entry in schedule],
+            "statistics": stats,
+            "violations": violations
+        }
+        with open(f"{self.base_schedule_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(base, f, ensure_ascii=False)
+        os.replace(f"{self.base_schedule_file}.tmp", self.base_schedule_file)
+        with self.lock:
+            self._base_schedule = (None, None)
+
+    def save_published_schedule(self, scheduler, patched, school_year):
+        """Legt den veröffentlichten Plan (mit Diensttauschen) bei SQLite zusätzlich in der Datenbank ab,
+        damit einzelne Tage über den Index auf dem Datum abgefragt werden können."""
+        if isinstance(self.repository, SQLiteRepository):
+            self.repository.save_schedule(school_year, patched, scheduler.slots)
+
+    def load_overrides(self, slots):
+        """Diensttausche als OverrideTable, leer wenn es keine Diensttausch.csv gibt."""
+        rows = self.repository.rows(OVERRIDES_FILE)
+        if rows is None:
+            return OverrideTable(slots)
+        return OverrideTable.from_rows(rows, slots)
+
+    def published_days(self, start, end):
+        """Veröffentlichte Tage von start bis end (inklusive) als [{date (ISO), Slot: Name}]. Mit SQLite über den
+        Index auf dem Datum, sonst aus dem gespeicherten Plan mit aufgelegten Diensttauschen.
+        FileNotFoundError, wenn noch nie generiert wurde."""
+        if isinstance(self.repository, SQLiteRepository):
+            return self.repository.schedule_between(start, end)
+        schedule = self.load_base_schedule()[0]
+        first = bisect.bisect_left(schedule, start, key=lambda entry: entry['date'])
+        last = bisect.bisect_right(schedule, end, key=lambda entry: entry['date'])
+        patched = self.load_overrides(self.scheduler().slots).apply(schedule[first:last])[0]
+        return [{**entry, "date": entry['date'].isoformat()} for entry in patched]
+
+    def load_base_schedule(self):
+        """(Plan, Statistik, Schuljahr, Verstöße) des zuletzt generierten Plans, aus dem Cache, solange sich
+        schedule.json nicht geändert hat. FileNotFoundError, wenn noch nie generiert wurde."""
+        stat = os.stat(self.base_schedule_file)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached_signature, cached = self._base_schedule
+        if cached_signature == signature:
+            return cached
+
+        with open(self.base_schedule_file, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        schedule = [
+            {"date": datetime.strptime(row[0], '%Y-%m-%d').date(), **dict(zip(base["slots"], row[1:]))}
+            for row in base["schedule"]
+        ]
+        cached = (schedule, base["statistics"], base["school_year"], base["violations"])
+        with self.lock:
+            self._base_schedule = (signature, cached)
+        return cached
+
+
+class SiteRegistry:
+    def __init__(self, default_data_dir, default_output_dir, sites_dir, max_sites=16):
+        self.default_data_dir = default_data_dir
+        self.default_output_dir = default_output_dir
+        self.sites_dir = sites_dir
+        self.max_sites = max(1, max_sites)
+        self.sites = OrderedDict()
+        self.lock = threading.Lock()
+
+    def paths(self, name):
+        if name is None:
+            return self.default_data_dir, self.default_output_dir
+        return os.path.join(self.sites_dir, name, 'data'), os.path.join(self.sites_dir, name, 'static')
+
+    def exists(self, name):
+        if name is None:
+            return True
+        return bool(SITE_NAME_RE.match(name)) and name not in RESERVED_NAMES and os.path.isdir(self.paths(name)[0])
+
+    def names(self):
+        """Alle Standorte mit data/-Verzeichnis, der Standard-Standort als None zuerst."""
+        names = [None]
+        if os.path.isdir(self.sites_dir):
+            names += sorted(name for name in os.listdir(self.sites_dir) if self.exists(name))
+        return names
+
+    def get(self, name=None):
+        """Standort aus dem Cache oder neu geladen. KeyError, wenn es den Standort nicht gibt."""
+        with self.lock:
+            site = self.sites.get(name)
+            if site is not None:
+                self.sites.move_to_end(name)
+                return site
+
+        if not self.exists(name):
+            raise KeyError(name)
+        site = Site(name, *self.paths(name))
+
+        with self.lock:
+            # Ein anderer Thread kann den Standort inzwischen geladen haben
+            site = self.sites.setdefault(name, site)
+            self.sites.move_to_end(name)
+            while len(self.sites) > self.max_sites:
+                self.sites.popitem(last=False)
+        return site
@@ -0,0 +1,100 @@
+"""
+Dienste (Slots), die pro Arbeitstag besetzt werden, z.B. Dienst und Vertretung oder mehrere Küchen/Schichten.
+
+Jeder Slot hat eine eigene Rotation und eigene Zähler für die Fairness. Die Slots werden pro Tag in der
+angegebenen Reihenfolge besetzt, eine Person kann an einem Tag nur einen Slot übernehmen. Ohne
+data/Dienste.csv gibt es die bisherigen zwei Slots Dienst (primary) und Vertretung (secondary).
+
+Author: pascal.blum@nikoit.de
+"""
+import csv
+import os
+
+# Werte der Spalte Rolle, wie die Spalte Rolle in Azubis.csv
+ROLES = {
+    'dienst': 'primary',
+    'vertretung': 'secondary'
+}
+
+
+class DutySlot:
+    def __init__(self, key, label, role='primary', consecutive=True, short=None):
+        # key: Schlüssel im Plan und in der Statistik, label: Spaltenüberschrift
+        # role: welche Einschränkung aus der Spalte Rolle in Azubis.csv gilt ('primary' oder 'secondary')
+        # consecutive: ob dieselbe Person den Slot an zwei aufeinanderfolgenden Arbeitstagen haben darf
+        # short: Präfix im Kalender-Export, ohne Angabe die Bezeichnung
+        if role not in ROLES.values():
+            raise ValueError(f"Unbekannte Rolle '{role}' für {label}")
+        self.key = key
+        self.label = label
+        self.role = role
+        self.consecutive = consecutive
+        self.short = short or label
+
+    def allows(self, azubi):
+        return azubi['can_' + self.role]
+
+    def to_dict(self):
+        return {"key": self.key, "label": self.label}
+
+
+DEFAULT_SLOTS = [
+    DutySlot('primary', 'Dienst', role='primary', consecutive=False),
+    DutySlot('secondary', 'Vertretung', role='secondary', consecutive=True, short='VERTR.')
+]
+
+
+def load_slots(slots_file):
+    """Liest data/Dienste.csv (Schlüssel;Bezeichnung;Rolle;Tage am Stück;Kürzel), ohne Datei die Standard-Slots."""
+    if not slots_file or not os.path.exists(slots_file):
+        return list(DEFAULT_SLOTS)
+    try:
+        with open(slots_file, 'r', encoding='utf-8-sig') as file:
+            return slots_from_rows(csv.DictReader(file, delimiter=';'))
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Fehler beim laden der Dienste: {e}")
+
+
+def slots_from_rows(rows):
+    """Slots aus Zeilen im Format von Dienste.csv (z.B. aus repository.py), ohne Zeilen die Standard-Slots."""
+    if rows is None:
+        return list(DEFAULT_SLOTS)
+    slots = []
+    try:
+        for row in rows:
+            key = (row.get('Schlüssel') or '').strip()
+            if not key:
+                continue
+            if key == 'date' or key in (slot.key for slot in slots):
+                raise ValueError(f"Schlüssel '{key}' ist ungültig oder doppelt")
+            role = (row.get('Rolle') or 'Dienst').strip().lower()
+            if role not in ROLES:
+                raise ValueError(f"Unbekannte Rolle '{row.get('Rolle')}' bei {key}")
+            slots.append(DutySlot(
+                key,
+                (row.get('Bezeichnung') or key).strip(),
+                role=ROLES[role],
+                consecutive=bool((row.get('Tage am Stück') or '').strip()),
+                short=(row.get('Kürzel') or '').strip() or None
+            ))
+    except Exception as e:
+        raise ValueError(f"Fehler beim laden der Dienste: {e}")
+    if not slots:
+        raise ValueError("Fehler beim laden der Dienste: Es muss mindestens ein Dienst angegeben sein")
+    return slots
+
+
+def duty_total(counts):
+    """Summe aller Slots aus einem Eintrag von generate_statistics (ohne 'absent' und 'year')."""
+    return sum(value for key, value in counts.items() if key not in ('absent', 'year'))
+
+
+def slot_by_label(slots, label):
+    """Slot zu einer Bezeichnung (ohne Groß-/Kleinschreibung) oder einem Schlüssel."""
+    label = (label or '').strip().lower()
+    for slot in slots:
+        if label in (slot.label.lower(), slot.key.lower()):
+            return slot
+    raise ValueError(f"Unbekannter Dienst '{label}'")
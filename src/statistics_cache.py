@@ -0,0 +1,70 @@
+"""
+Hält static/statistics.json im Speicher, statt die Datei bei jeder Abfrage neu zu lesen und zu parsen.
+
+Die Datei wird nur neu gelesen, wenn sich mtime/Größe geändert haben (z.B. durch eine Generierung in
+einem anderen Worker-Prozess) oder nach invalidate(). Ausgeliefert werden die fertigen JSON-Bytes mit
+einem ETag, sodass unveränderte Abfragen des Dashboards mit 304 beantwortet werden können.
+
+Author: pascal.blum@nikoit.de
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from slots import duty_total
+
+
+class StatisticsCache:
+    def __init__(self, stats_file):
+        self.stats_file = stats_file
+        self.lock = threading.Lock()
+        self.signature = None
+        self.body = None
+        self.data = None
+        self.etag = None
+
+    def invalidate(self):
+        with self.lock:
+            self.signature = None
+
+    def load(self):
+        """Gibt (bytes, geparstes dict, etag) zurück oder (None, None, None), wenn es noch keine Statistik gibt."""
+        try:
+            stat = os.stat(self.stats_file)
+        except FileNotFoundError:
+            return None, None, None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if signature != self.signature:
+                with open(self.stats_file, 'rb') as f:
+                    body = f.read()
+                self.data = json.loads(body)
+                self.body = body
+                self.etag = hashlib.sha1(body).hexdigest()
+                self.signature = signature
+            return self.body, self.data, self.etag
+
+
+def summarize(stats, timestamp, plan_version):
+    """Kompakter History-Eintrag: Gesamtzahl Dienste pro Person und Kennzahlen zur Fairness."""
+    totals = {name: duty_total(counts) for name, counts in stats.items()}
+    values = list(totals.values()) or [0]
+    mean = sum(values) / len(values)
+    return {
+        "timestamp": timestamp,
+        "plan_version": plan_version,
+        "min": min(values),
+        "max": max(values),
+        "spread": max(values) - min(values),
+        "stddev": round((sum((value - mean) ** 2 for value in values) / len(values)) ** 0.5, 3),
+        "totals": totals
+    }
+
+
+def append_history(history, entry, size=20):
+    """Ringpuffer der letzten size Generierungen, der älteste Eintrag fällt heraus."""
+    ring = deque(history or [], maxlen=size)
+    ring.append(entry)
+    return list(ring)
@@ -0,0 +1,154 @@
+function scrollToTodayRow() {
+    const highlightedRow = document.querySelector('.highlight');
+    if (highlightedRow) {
+        requestAnimationFrame(() => {
+            highlightedRow.scrollIntoView({ behavior: 'smooth', block: 'center' });
+        });
+    }
+}
+
+function setTheme(theme) {
+    document.getElementById('theme-style').innerHTML = THEMES[theme] || THEMES['light'];
+    localStorage.setItem('theme', theme);
+}
+
+function highlightTodayRows() {
+    const currentDate = new Intl.DateTimeFormat('de-DE', {
+            day: '2-digit',
+            month: '2-digit',
+            year: '2-digit'
+            }).format(new Date());
+
+    const tbodyRows = document.querySelector('table tbody').querySelectorAll('tr');
+
+    tbodyRows.forEach(row => {
+        const dateCell = row.querySelector('td:nth-child(2)');
+        if (dateCell) {
+            const rowDate = dateCell.textContent.trim();
+            if (rowDate === currentDate) {
+                row.classList.add('highlight');
+            }
+        }
+    });
+}
+
+function populateFilterDropdown() {
+    const dropdown = document.getElementById('row-filter');
+    const monthHeaders = document.querySelectorAll('.month-header');
+    const tbodyRows = document.querySelectorAll('table tbody tr');
+    let months = [];
+
+    // Add a custom row count option
+    const rowCountOption = document.createElement('option');
+    rowCountOption.value = '10';
+    rowCountOption.textContent = '10 Zeilen';
+    dropdown.appendChild(rowCountOption);
+
+    // Add an option to show all rows
+    const allRowsOption = document.createElement('option');
+    allRowsOption.value = 'all';
+    allRowsOption.textContent = 'Alle';
+    dropdown.appendChild(allRowsOption);
+
+
+
+    // Collect unique months from the table
+    monthHeaders.forEach(header => {
+        const monthText = header.querySelector('td').textContent.trim();
+        if (months.indexOf(monthText) === -1) {
+            months.push(monthText);
+        }
+    });
+
+    // Populate the dropdown with months and row options
+    months.forEach(month => {
+        const option = document.createElement('option');
+        option.value = month;
+        option.textContent = month;
+        dropdown.appendChild(option);
+    });
+}
+
+function filterRows() {
+    const dropdown = document.getElementById('row-filter');
+    const selectedValue = dropdown.value;
+    const tbodyRows = document.querySelectorAll('table tbody tr');
+    let todayIndex = -1; // Use this to find the target row index if needed
+    let monthRows = [];
+    let currentMonth = null; // Variable to track the current month
+
+    if (selectedValue === '10') {
+            const highlightedRow = document.querySelector('.highlight');
+            if (!highlightedRow) return;
+
+            const tbodyRows = document.querySelectorAll('table tbody tr');
+            const todayIndex = [...tbodyRows].indexOf(highlightedRow);
+
+            tbodyRows.forEach((row, index) => {
+                if (index >= todayIndex - 5 && index <= todayIndex + 5) {
+                    row.style.display = ''; // Show row within the buffer
+                } else {
+                    row.style.display = 'none'; // Hide row outside the buffer
+                }
+            });
+
+            scrollToTodayRow();
+            return; // Exit early from the rest of the filtering logic
+        }
+
+    tbodyRows.forEach((row, index) => {
+        const isMonthHeader = row.classList.contains('month-header');
+        const isDateRow = row.classList.contains('weekday-weekday') || row.classList.contains('weekday-weekend');
+        const rowDateText = row.querySelector('td') ? row.querySelector('td').textContent.trim() : '';
+
+        // Handling the month selection
+        if (selectedValue !== 'all' && selectedValue !== '10') {
+            if (isMonthHeader) {
+                // If the row is a month header, check if it matches the selected month
+                currentMonth = rowDateText; // Set the current month
+                if (currentMonth === selectedValue) {
+                    monthRows.push(index); // Include this month header
+                }
+            }
+            // If it's a date row, include it if the currentMonth matches the selected month
+            if (isDateRow && currentMonth === selectedValue) {
+                monthRows.push(index); // Include this date row
+            }
+        }
+    });
+
+    // Show or hide rows based on the selected month
+    tbodyRows.forEach((row, index) => {
+        if (selectedValue === 'all' || monthRows.includes(index)) {
+            row.style.display = ''; // Show row if it matches the filter
+        } else {
+            row.style.display = 'none'; // Hide row otherwise
+        }
+    });
+
+    // Optional: Scroll to the highlighted row if needed
+    scrollToTodayRow();
+}
+
+window.onload = function() {
+        highlightTodayRows();
+
+        const savedTheme = localStorage.getItem('theme') || 'light';
+        setTheme(savedTheme);
+
+        scrollToTodayRow();
+
+        const themeSelect = document.getElementById('theme-select');
+        if (themeSelect) {
+            themeSelect.value = savedTheme;
+        }
+
+        filterRows();
+    }
+
+document.addEventListener("DOMContentLoaded", function () {
+    populateFilterDropdown();
+    //checkbox = document.getElementById('showallCheckbox');
+    //checkbox.addEventListener('change', filterRows);
+
+});
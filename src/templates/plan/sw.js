@@ -0,0 +1,65 @@
+// Service Worker für den Plan: Seite und Manifest kommen aus dem Cache der aktuellen Plan-Version,
+// wiederholte Aufrufe brauchen also keine Anfrage an den Server. Mit jedem neuen Plan ändert sich diese
+// Datei (PLAN_VERSION), der Browser installiert den neuen Worker, der den Cache neu füllt und die alten löscht.
+const PLAN_VERSION = {{ plan_version|tojson }};
+const CACHE_PREFIX = 'spuelplan:' + self.registration.scope + ':';
+const CACHE_NAME = CACHE_PREFIX + PLAN_VERSION;
+const SHELL = {{ offline_pages|tojson }}.concat(['manifest.webmanifest']).map(page => new URL(page, self.registration.scope).href);
+
+async function precache() {
+    const cache = await caches.open(CACHE_NAME);
+    await Promise.all(SHELL.map(async url => {
+        const response = await fetch(url, { cache: 'reload' });
+        if (!response.ok) {
+            throw new Error(url + ': ' + response.status);
+        }
+        // Wird der Worker geschrieben, bevor die neue Seite live ist, schlägt die Installation fehl und
+        // der Browser versucht es beim nächsten Aufruf erneut, statt die alte Seite als neue Version abzulegen
+        if ((response.headers.get('Content-Type') || '').includes('text/html')
+                && !(await response.clone().text()).includes(JSON.stringify(PLAN_VERSION))) {
+            throw new Error(url + ': veraltete Plan-Version');
+        }
+        await cache.put(url, response);
+    }));
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(precache().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(
+                names.filter(name => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME).map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    url.search = '';
+    url.hash = '';
+    if (!SHELL.includes(url.href)) {
+        // API, Admin-Seiten und alles andere gehen wie bisher direkt an den Server
+        return;
+    }
+    event.respondWith(
+        caches.open(CACHE_NAME).then(async cache => {
+            const cached = await cache.match(url.href);
+            if (cached) {
+                return cached;
+            }
+            const response = await fetch(request);
+            if (response.ok) {
+                await cache.put(url.href, response.clone());
+            }
+            return response;
+        })
+    );
+});
@@ -0,0 +1,46 @@
+const PLAN_VERSION = {{ plan_version|tojson }};
+// Präfix des Standorts, z.B. '/muenchen', leer für den Standard-Standort
+const PLAN_BASE = {{ site_prefix|tojson }};
+
+// Mit Service Worker (sw.js) kommt die Seite aus dem Cache, bei einem neuen Plan wird erst der Worker
+// aktualisiert und nach dessen Übernahme (controllerchange) neu geladen
+const OFFLINE = {{ offline|tojson }} && 'serviceWorker' in navigator && window.location.protocol !== 'file:';
+
+function reloadOnNewPlan(plan) {
+    if (!plan.plan_version || plan.plan_version === PLAN_VERSION) {
+        return;
+    }
+    if (!OFFLINE || !navigator.serviceWorker.controller) {
+        window.location.reload();
+        return;
+    }
+    navigator.serviceWorker.getRegistration()
+        .then(registration => registration && registration.update().then(() => registration.installing || registration.waiting))
+        .then(installing => installing || window.location.reload())
+        .catch(() => window.location.reload());
+}
+
+if (OFFLINE) {
+    const controlled = Boolean(navigator.serviceWorker.controller);
+    navigator.serviceWorker.addEventListener('controllerchange', () => controlled && window.location.reload());
+    navigator.serviceWorker.register('sw.js').catch(() => null);
+}
+
+// Kurzes Polling statt offener Verbindung: jede Anfrage ist sofort beantwortet (meist 304 ohne Body),
+// dadurch belegt eine Anzeige keinen Worker-Thread auf dem Server
+const PLAN_POLL_INTERVAL = 15000;
+let planEtag = null;
+
+(function poll() {
+    fetch(PLAN_BASE + '/api/plan/version', { cache: 'no-store', headers: planEtag ? { 'If-None-Match': planEtag } : {} })
+        .then(response => {
+            if (response.status === 304 || !response.ok) {
+                return null;
+            }
+            planEtag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(plan => plan && reloadOnNewPlan(plan))
+        .catch(() => null)
+        .finally(() => setTimeout(poll, PLAN_POLL_INTERVAL));
+})();
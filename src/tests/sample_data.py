@@ -0,0 +1,53 @@
+"""
+Kleine Datenverzeichnisse im Format von data/ für die Tests.
+
+Author: pascal.blum@nikoit.de
+"""
+import os
+
+AZUBIS = [
+    ("Anna", "Albrecht", 1, ""),
+    ("Ben", "Brandt", 1, ""),
+    ("Clara", "Conrad", 2, ""),
+    ("David", "Dietz", 2, ""),
+    ("Eva", "Engel", 3, ""),
+    ("Felix", "Fuchs", 3, "")
+]
+
+SLOTS = [
+    ("primary", "Dienst", "Dienst", "", ""),
+    ("secondary", "Vertretung", "Vertretung", "Ja", "VERTR.")
+]
+
+FILES = {
+    "Azubis.csv": "Vorname;Nachname;Lehrjahr;Ignorieren;Rolle",
+    "Blockwochen_Schule.csv": "Jahr;Lehrjahr;Kalenderwoche",
+    "Feiertage_Schließzeiten_Brückentage.csv": "Datum;Grund",
+    "Abwesenheiten.csv": "Vorname;Nachname;Von;Bis;Grund",
+    "Dienste.csv": "Schlüssel;Bezeichnung;Rolle;Tage am Stück;Kürzel",
+    "Diensttausch.csv": "Datum;Dienst;Azubi;Grund"
+}
+
+SCHEDULER_FILES = (
+    "Azubis.csv",
+    "Blockwochen_Schule.csv",
+    "Feiertage_Schließzeiten_Brückentage.csv",
+    "Abwesenheiten.csv",
+    "Dienste.csv"
+)
+
+
+def write_data_dir(directory, azubis=AZUBIS, slots=SLOTS, blockweeks=(), closures=(), absences=()):
+    """Schreibt alle CSV-Dateien nach directory und gibt die Pfade für CleaningDutyScheduler zurück."""
+    rows = {
+        "Azubis.csv": [";".join(map(str, (first, last, year, "", role))) for first, last, year, role in azubis],
+        "Blockwochen_Schule.csv": [";".join(map(str, row)) for row in blockweeks],
+        "Feiertage_Schließzeiten_Brückentage.csv": [f"{text};" for text in closures],
+        "Abwesenheiten.csv": [";".join(row) + ";" for row in absences],
+        "Dienste.csv": [";".join(row) for row in slots],
+        "Diensttausch.csv": []
+    }
+    for filename, header in FILES.items():
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+            f.write("\n".join([header] + rows[filename]) + "\n")
+    return tuple(os.path.join(directory, filename) for filename in SCHEDULER_FILES)
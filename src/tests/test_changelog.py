@@ -0,0 +1,103 @@
+"""
+Tests für das Änderungsprotokoll: Rollback und Ablehnung bei an der Admin-Oberfläche vorbei geänderten Dateien.
+
+Author: pascal.blum@nikoit.de
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from changelog import ChangeLog, RollbackConflict
+from repository import CSVRepository, SQLiteRepository, database_path
+from sample_data import write_data_dir
+
+
+class CSVChangeLogTest(unittest.TestCase):
+
+    def repository(self, data_dir):
+        return CSVRepository(data_dir)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.data_dir = directory.name
+        write_data_dir(self.data_dir)
+        self.repo = self.repository(self.data_dir)
+        self.log = ChangeLog(self.data_dir, repository=self.repo)
+
+    def names(self):
+        return [row['Vorname'] for row in self.repo.rows('Azubis.csv')]
+
+    def test_rollback_restores_the_logged_state(self):
+        before = self.names()
+        self.log.apply('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anja"})
+        self.log.apply('Azubis.csv', 'delete', {"index": 1})
+        self.log.apply('Azubis.csv', 'add', {})
+
+        applied = self.log.rollback(0)
+
+        self.assertEqual(self.names(), before)
+        self.assertEqual([entry['rollback_of'] for entry in applied], [3, 2, 1])
+        self.assertEqual(self.log.version, 6)
+
+    def test_entries_record_the_fingerprint_after_the_edit(self):
+        entry = self.log.apply('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anja"})
+        self.assertEqual(entry['fingerprint'], self.repo.fingerprint('Azubis.csv'))
+
+    def test_rollback_after_outside_change_is_refused(self):
+        self.log.apply('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anja"})
+        self.change_outside()
+        changed = self.names()
+
+        with self.assertRaises(RollbackConflict):
+            self.log.rollback(0)
+        # Nichts angewendet, nichts protokolliert
+        self.assertEqual(self.names(), changed)
+        self.assertEqual(self.log.version, 1)
+
+    def test_untouched_files_do_not_block_the_rollback(self):
+        self.log.apply('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anja"})
+        self.log.apply('Blockwochen_Schule.csv', 'add', {})
+        self.change_outside()
+
+        # Ab Version 1 ist nur Blockwochen_Schule.csv betroffen
+        self.log.rollback(1)
+        with self.assertRaises(RollbackConflict):
+            self.log.rollback(0)
+
+    def test_other_processes_see_the_same_versions(self):
+        self.log.apply('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anja"})
+        other = ChangeLog(self.data_dir, repository=self.repository(self.data_dir))
+        other.apply('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anke"})
+
+        self.assertEqual(self.log.between(0)[-1]['version'], 2)
+        self.log.rollback(0)
+        self.assertEqual(self.names()[0], "Anna")
+
+    def change_outside(self):
+        """Änderung wie mit Excel direkt in der Datei."""
+        with open(os.path.join(self.data_dir, 'Azubis.csv'), 'a', encoding='utf-8') as f:
+            f.write("Gustav;Graf;1;;\n")
+
+
+class SQLiteChangeLogTest(CSVChangeLogTest):
+
+    def repository(self, data_dir):
+        # Der erste Aufruf übernimmt die CSV-Dateien, weitere öffnen nur dieselbe Datenbank
+        imported = os.path.exists(database_path(data_dir))
+        repository = SQLiteRepository(database_path(data_dir))
+        if not imported:
+            repository.import_csv(data_dir)
+        return repository
+
+    def change_outside(self):
+        """Änderung direkt in der Datenbank, z.B. durch einen erneuten Import."""
+        SQLiteRepository(database_path(self.data_dir)).edit('Azubis.csv', 'add', {})
+
+
+if __name__ == '__main__':
+    unittest.main()
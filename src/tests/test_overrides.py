@@ -0,0 +1,118 @@
+"""
+Tests für die Prüfung von Diensttauschen (validate_changes) samt Nachbartagen für die Regel 'consecutive'.
+
+Author: pascal.blum@nikoit.de
+"""
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_plan import CleaningDutyScheduler
+from overrides import OverrideTable, consecutive_windows, planned_row, swap_rows, validate_changes
+from sample_data import write_data_dir
+
+# Dienstag bis Donnerstag in KW 38/2025, Freitag/Montag über das Wochenende
+TUESDAY = datetime.date(2025, 9, 16)
+WEDNESDAY = datetime.date(2025, 9, 17)
+THURSDAY = datetime.date(2025, 9, 18)
+FRIDAY = datetime.date(2025, 9, 19)
+MONDAY = datetime.date(2025, 9, 22)
+
+
+class OverrideTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.scheduler = CleaningDutyScheduler(*write_data_dir(directory.name, blockweeks=[(2025, 1, 39)]))
+        self.schedule = self.scheduler.generate_schedule(2025)
+        self.by_date = {entry['date']: entry for entry in self.schedule}
+
+    def check(self, *overrides):
+        table = OverrideTable(self.scheduler.slots)
+        for date, role, name in overrides:
+            table.set(date, role, name)
+        patched, changes = table.apply(self.schedule)
+        return validate_changes(self.scheduler, patched, changes)
+
+    def rules(self, violations):
+        return {(violation['date'], violation['rule'], violation['role']) for violation in violations}
+
+
+class ValidateChangesTest(OverrideTestCase):
+
+    def test_same_primary_on_consecutive_days_is_rejected(self):
+        name = self.by_date[WEDNESDAY]['primary']
+        violations = self.check((TUESDAY, 'primary', name))
+        self.assertIn((WEDNESDAY, 'consecutive', 'primary'), self.rules(violations))
+
+    def test_weekend_does_not_break_the_chain(self):
+        name = self.by_date[MONDAY]['primary']
+        violations = self.check((FRIDAY, 'primary', name))
+        self.assertIn((MONDAY, 'consecutive', 'primary'), self.rules(violations))
+
+    def test_secondary_may_repeat(self):
+        # Vertretung hat in sample_data 'Tage am Stück'
+        name = self.by_date[WEDNESDAY]['secondary']
+        violations = self.check((TUESDAY, 'secondary', name))
+        self.assertNotIn('consecutive', {violation['rule'] for violation in violations})
+
+    def test_free_person_is_accepted(self):
+        busy = {self.by_date[day]['primary'] for day in (datetime.date(2025, 9, 15), TUESDAY, WEDNESDAY)}
+        busy.add(self.by_date[TUESDAY]['secondary'])
+        free = next(
+            name for name in self.scheduler.azubi_index
+            if name not in busy and self.scheduler.azubis[self.scheduler.azubi_index[name]]['year'] != 1
+        )
+        self.assertEqual(self.check((TUESDAY, 'primary', free)), [])
+
+    def test_day_rules_are_checked(self):
+        # Lehrjahr 1 hat in KW 39 Schule
+        first_year = next(azubi for azubi in self.scheduler.azubis if azubi['year'] == 1)
+        name = f"{first_year['firstname']} {first_year['lastname']}"
+        violations = self.check((datetime.date(2025, 9, 24), 'primary', name))
+        self.assertIn((datetime.date(2025, 9, 24), 'blockweek', 'primary'), self.rules(violations))
+
+    def test_swap_with_neighbouring_day_is_rejected(self):
+        rows = swap_rows(self.schedule, self.scheduler.slots, 'primary', TUESDAY, WEDNESDAY)
+        table = OverrideTable(self.scheduler.slots)
+        touched = {table.add_row(row)[0] for row in rows}
+        patched, changes = table.apply(self.schedule)
+        # Getauscht mit dem direkten Nachbartag: Montag/Donnerstag entscheiden, ob jemand doppelt dran ist
+        violations = validate_changes(self.scheduler, patched, changes, touched)
+        expected = set()
+        if patched[planned_row(patched, TUESDAY) - 1]['primary'] == patched[planned_row(patched, TUESDAY)]['primary']:
+            expected.add(TUESDAY)
+        if patched[planned_row(patched, THURSDAY)]['primary'] == patched[planned_row(patched, WEDNESDAY)]['primary']:
+            expected.add(THURSDAY)
+        self.assertEqual({violation['date'] for violation in violations if violation['rule'] == 'consecutive'}, expected)
+
+
+class HelperTest(OverrideTestCase):
+
+    def test_windows_reach_the_neighbouring_assigned_days(self):
+        patched = list(self.schedule)
+        row = planned_row(patched, WEDNESDAY)
+        # Donnerstag ohne Dienst: der Ausschnitt reicht bis Freitag
+        patched[row + 1] = {**patched[row + 1], 'primary': ' - '}
+        self.assertEqual(consecutive_windows(patched, [row], self.scheduler.slots), [[row - 1, row + 2]])
+
+    def test_overlapping_windows_are_merged(self):
+        row = planned_row(self.schedule, TUESDAY)
+        self.assertEqual(consecutive_windows(self.schedule, [row, row + 1], self.scheduler.slots), [[row - 1, row + 2]])
+
+    def test_days_outside_the_plan_are_rejected(self):
+        with self.assertRaises(ValueError):
+            planned_row(self.schedule, datetime.date(2030, 1, 1))
+        with self.assertRaises(ValueError):
+            planned_row(self.schedule, datetime.date(2025, 9, 20))
+        self.assertEqual(self.schedule[planned_row(self.schedule, TUESDAY)]['date'], TUESDAY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Tests für reminders.py gegen die lokalen Stellvertreter (LocalSMTPServer, LocalWebhookServer).
+
+    cd src && python -m pytest tests
+    cd src && python -m unittest discover tests
+
+Author: pascal.blum@nikoit.de
+"""
+import datetime
+import email
+import email.header
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reminders import LocalSMTPServer, LocalWebhookServer, ReminderLog, dispatch
+
+DATE = datetime.date(2026, 9, 16)
+
+
+def reminders(count, date=DATE):
+    return [
+        {
+            "key": f"{date.isoformat()}:primary:Azubi {number}",
+            "site": None,
+            "date": date.isoformat(),
+            "slot": "primary",
+            "label": "Dienst",
+            "name": f"Azubi {number}",
+            "firstname": "Azubi",
+            "email": f"azubi{number}@example.org",
+            "url": None
+        }
+        for number in range(count)
+    ]
+
+
+class SMTPTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_sends_one_message_per_reminder(self):
+        pending = reminders(7)
+        async with LocalSMTPServer() as server:
+            async with server.transport(connections=2) as transport:
+                outcome = await dispatch(pending, transport, batch_size=3, backoff=0)
+
+        self.assertEqual(outcome, {reminder["key"]: None for reminder in pending})
+        self.assertEqual(sorted(to for message in server.messages for to in message["to"]),
+                         sorted(f"<{reminder['email']}>" for reminder in pending))
+        # Die Verbindungen werden über alle Batches wiederverwendet
+        self.assertLessEqual(server.connections, 2)
+        message = email.message_from_bytes(server.messages[0]["data"])
+        self.assertIn("Dienst", str(email.header.make_header(email.header.decode_header(message["Subject"]))))
+        self.assertIn("16.09.2026", message.get_payload(decode=True).decode('utf-8'))
+
+    async def test_retries_transient_errors(self):
+        pending = reminders(4)
+        async with LocalSMTPServer(fail_first=2) as server:
+            async with server.transport(connections=1) as transport:
+                outcome = await dispatch(pending, transport, batch_size=4, backoff=0)
+
+        self.assertEqual(outcome, {reminder["key"]: None for reminder in pending})
+        # Nichts doppelt: nach dem 451 wird nur der Rest des Batches erneut verschickt
+        self.assertEqual(len(server.messages), 4)
+        self.assertEqual(server.fail_first, 0)
+
+    async def test_gives_up_after_retries(self):
+        pending = reminders(2)
+        async with LocalSMTPServer(fail_first=10) as server:
+            async with server.transport(connections=1) as transport:
+                outcome = await dispatch(pending, transport, batch_size=2, retries=2, backoff=0)
+
+        self.assertEqual(server.messages, [])
+        self.assertTrue(all(error and error.startswith("Abgebrochen nach 3 Versuchen") for error in outcome.values()))
+
+
+class WebhookTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_posts_batches(self):
+        pending = reminders(5)
+        async with LocalWebhookServer() as server:
+            async with server.transport(connections=2) as transport:
+                outcome = await dispatch(pending, transport, batch_size=2, backoff=0)
+
+        self.assertEqual(outcome, {reminder["key"]: None for reminder in pending})
+        self.assertEqual(sorted(len(request["reminders"]) for request in server.requests), [1, 2, 2])
+        self.assertEqual(sorted(r["key"] for request in server.requests for r in request["reminders"]),
+                         sorted(reminder["key"] for reminder in pending))
+
+    async def test_retries_server_errors(self):
+        pending = reminders(3)
+        async with LocalWebhookServer(fail_first=2) as server:
+            async with server.transport(connections=1) as transport:
+                outcome = await dispatch(pending, transport, batch_size=3, backoff=0)
+
+        self.assertEqual(outcome, {reminder["key"]: None for reminder in pending})
+        self.assertEqual(len(server.requests), 1)
+
+
+class ReminderLogTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = ReminderLog(os.path.join(directory.name, "reminders.jsonl"))
+
+    async def test_logged_reminders_are_not_sent_again(self):
+        pending = reminders(4)
+        async with LocalSMTPServer() as server:
+            async with server.transport() as transport:
+                await dispatch(pending, transport, batch_size=2, backoff=0, on_sent=self.log.record)
+
+            # Zweiter Lauf am selben Tag, z.B. nach einem Absturz
+            self.assertEqual(self.log.sent(DATE), {reminder["key"] for reminder in pending})
+            async with server.transport() as transport:
+                outcome = await dispatch(self.log.unsent(pending, DATE), transport, on_sent=self.log.record)
+
+        self.assertEqual(outcome, {})
+        self.assertEqual(len(server.messages), 4)
+
+    async def test_only_missing_reminders_are_sent(self):
+        pending = reminders(3)
+        self.log.record(pending[:1])
+        async with LocalWebhookServer() as server:
+            async with server.transport() as transport:
+                outcome = await dispatch(self.log.unsent(pending, DATE), transport, backoff=0, on_sent=self.log.record)
+
+        self.assertEqual(set(outcome), {reminder["key"] for reminder in pending[1:]})
+        self.assertEqual(self.log.unsent(pending, DATE), [])
+
+    async def test_failed_reminders_are_not_logged(self):
+        pending = reminders(2)
+        async with LocalWebhookServer(fail_first=10) as server:
+            async with server.transport(connections=1) as transport:
+                await dispatch(pending, transport, retries=1, backoff=0, on_sent=self.log.record)
+
+        self.assertEqual(self.log.sent(DATE), set())
+
+    def test_sent_only_returns_keys_of_the_date(self):
+        self.log.record(reminders(2) + reminders(1, DATE + datetime.timedelta(days=1)))
+        with open(self.log.log_file, 'a', encoding='utf-8') as f:
+            # Beim Absturz halb geschriebene Zeile
+            f.write('{"key": "2026-09-16:primary:Azu')
+
+        self.assertEqual(self.log.sent(DATE), {reminder["key"] for reminder in reminders(2)})
+
+
+if __name__ == '__main__':
+    unittest.main()
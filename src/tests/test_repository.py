@@ -0,0 +1,141 @@
+"""
+Tests für die Bearbeitung der Tabellen im SQLiteRepository und Backups im SQLite-Modus.
+
+Author: pascal.blum@nikoit.de
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backup_store import SnapshotStore
+from repository import SQLiteRepository, database_path, open_repository, parse_csv
+from sample_data import FILES, write_data_dir
+
+
+class SQLiteRepositoryTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.data_dir = directory.name
+        write_data_dir(self.data_dir, blockweeks=[(2025, 1, 38)])
+        self.repo = SQLiteRepository(database_path(self.data_dir))
+        self.repo.import_csv(self.data_dir)
+
+    def names(self):
+        return [row['Vorname'] for row in self.repo.rows('Azubis.csv')]
+
+    def test_import_keeps_order_and_columns(self):
+        self.assertEqual(sorted(self.repo.files()), sorted(FILES))
+        self.assertEqual(self.names(), ["Anna", "Ben", "Clara", "David", "Eva", "Felix"])
+        self.assertEqual(list(self.repo.rows('Azubis.csv')[0]), FILES['Azubis.csv'].split(';'))
+        self.assertIsInstance(open_repository(self.data_dir), SQLiteRepository)
+
+    def test_update(self):
+        change = self.repo.edit('Azubis.csv', 'update', {"index": 1, "column": "Vorname", "value": "Bernd"})
+        self.assertEqual(change, {"index": 1, "column": "Vorname", "old": "Ben", "value": "Bernd"})
+        self.assertEqual(self.names()[:3], ["Anna", "Bernd", "Clara"])
+
+    def test_delete_closes_the_gap(self):
+        change = self.repo.edit('Azubis.csv', 'delete', {"index": 0})
+        self.assertEqual(change["row"]["Vorname"], "Anna")
+        self.assertEqual(self.names(), ["Ben", "Clara", "David", "Eva", "Felix"])
+        # Positionen sind wieder lückenlos, index 0 ist die neue erste Zeile
+        self.repo.edit('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Bernd"})
+        self.assertEqual(self.names()[0], "Bernd")
+
+    def test_insert_and_add(self):
+        row = {"Vorname": "Gustav", "Nachname": "Graf", "Lehrjahr": "1", "Ignorieren": "", "Rolle": ""}
+        self.repo.edit('Azubis.csv', 'insert', {"index": 1, "row": row})
+        self.repo.edit('Azubis.csv', 'insert', {"row": {**row, "Vorname": "Hanna"}})
+        change = self.repo.edit('Azubis.csv', 'add', {})
+
+        self.assertEqual(change, {"index": 8})
+        self.assertEqual(self.names(), ["Anna", "Gustav", "Ben", "Clara", "David", "Eva", "Felix", "Hanna", ""])
+        self.assertEqual(self.repo.rows('Azubis.csv')[1], row)
+
+    def test_reorder(self):
+        self.repo.edit('Azubis.csv', 'reorder', {"order": [5, 4, 3, 2, 1, 0]})
+        self.assertEqual(self.names(), ["Felix", "Eva", "David", "Clara", "Ben", "Anna"])
+
+    def test_invalid_edits_change_nothing(self):
+        revision = self.repo.fingerprint('Azubis.csv')
+        invalid = [
+            ('Azubis.csv', 'update', {"index": 0, "column": "Spitzname", "value": "x"}),
+            ('Azubis.csv', 'reorder', {"order": [0, 0, 1, 2, 3, 4]}),
+            ('Azubis.csv', 'reorder', {"order": [0, 1]}),
+            ('Azubis.csv', 'umbenennen', {}),
+            ('Unbekannt.csv', 'add', {})
+        ]
+        for filename, op, params in invalid:
+            with self.subTest(op=op, params=params), self.assertRaises(ValueError):
+                self.repo.edit(filename, op, params)
+        with self.assertRaises(IndexError):
+            self.repo.edit('Azubis.csv', 'delete', {"index": 6})
+
+        self.assertEqual(self.names(), ["Anna", "Ben", "Clara", "David", "Eva", "Felix"])
+        self.assertEqual(self.repo.fingerprint('Azubis.csv'), revision)
+
+    def test_revision_counts_edits_per_file(self):
+        before = self.repo.signatures()
+        self.repo.edit('Azubis.csv', 'add', {})
+        self.repo.edit('Azubis.csv', 'delete', {"index": 6})
+        after = self.repo.signatures()
+
+        self.assertEqual(after['Azubis.csv'], before['Azubis.csv'] + 2)
+        self.assertEqual(after['Dienste.csv'], before['Dienste.csv'])
+        # Die zwischengespeicherte Tabelle wird mit der Revision erneuert
+        self.assertEqual(len(self.repo.table('Azubis.csv').rows), 6)
+
+    def test_dump_and_load_round_trip(self):
+        content = self.repo.dump()
+        for filename in FILES:
+            with open(os.path.join(self.data_dir, filename), 'rb') as f:
+                self.assertEqual(parse_csv(content[filename]), parse_csv(f.read()), filename)
+
+        self.repo.edit('Azubis.csv', 'delete', {"index": 0})
+        self.repo.load(content)
+        self.assertEqual(self.names()[0], "Anna")
+
+    def test_export_writes_the_edited_tables(self):
+        self.repo.edit('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anja"})
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        self.repo.export_csv(export_dir.name)
+
+        with open(os.path.join(export_dir.name, 'Azubis.csv'), 'rb') as f:
+            columns, rows = parse_csv(f.read())
+        self.assertEqual(rows[0][columns.index("Vorname")], "Anja")
+
+
+class SQLiteSnapshotTest(unittest.TestCase):
+
+    def test_backup_and_restore_use_the_database(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        data_dir = directory.name
+        write_data_dir(data_dir)
+        repo = SQLiteRepository(database_path(data_dir))
+        repo.import_csv(data_dir)
+        store = SnapshotStore(data_dir, os.path.join(data_dir, 'backups'), repository=repo)
+
+        snapshot = store.create()
+        repo.edit('Azubis.csv', 'update', {"index": 0, "column": "Vorname", "value": "Anja"})
+        repo.edit('Blockwochen_Schule.csv', 'add', {})
+        # Die CSV-Dateien neben der Datenbank sind nicht der gesicherte Stand
+        with open(os.path.join(data_dir, 'Azubis.csv'), 'w', encoding='utf-8') as f:
+            f.write("Vorname;Nachname;Lehrjahr;Ignorieren;Rolle\n")
+
+        store.restore(snapshot["id"])
+        self.assertEqual(repo.rows('Azubis.csv')[0]["Vorname"], "Anna")
+        self.assertEqual(len(repo.rows('Azubis.csv')), 6)
+        self.assertEqual(repo.rows('Blockwochen_Schule.csv'), [])
+        self.assertEqual(sorted(snapshot["files"]), sorted(repo.files()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+Tests für die Generierung mit beliebig vielen Slots und die vektorisierte Prüfung (validate_schedule).
+
+Author: pascal.blum@nikoit.de
+"""
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_plan import CleaningDutyScheduler
+from sample_data import SLOTS, write_data_dir
+
+THREE_SLOTS = SLOTS + [("kitchen", "Küche", "Dienst", "", "KÜ")]
+
+# Mittwoch und Donnerstag in KW 38/2025
+WEDNESDAY = datetime.date(2025, 9, 17)
+THURSDAY = datetime.date(2025, 9, 18)
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def scheduler(self, **data):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return CleaningDutyScheduler(*write_data_dir(directory.name, **data))
+
+
+class ThreeSlotTest(SchedulerTestCase):
+
+    def test_every_working_day_gets_three_different_people(self):
+        scheduler = self.scheduler(slots=THREE_SLOTS)
+        schedule = scheduler.generate_schedule(2025)
+
+        self.assertEqual([slot.key for slot in scheduler.slots], ["primary", "secondary", "kitchen"])
+        self.assertTrue(schedule)
+        for entry in schedule:
+            self.assertLess(entry['date'].weekday(), 5)
+            names = [entry[slot.key] for slot in scheduler.slots]
+            self.assertEqual(len(set(names)), 3, entry)
+        self.assertEqual(scheduler.violations, [])
+
+    def test_statistics_count_every_slot(self):
+        scheduler = self.scheduler(slots=THREE_SLOTS)
+        schedule = scheduler.generate_schedule(2025)
+        stats = scheduler.generate_statistics(schedule)
+
+        for slot in scheduler.slots:
+            self.assertEqual(sum(counts[slot.key] for counts in stats.values()), len(schedule))
+        # Rotation pro Slot: die Zähler liegen höchstens eins auseinander
+        for slot in scheduler.slots:
+            counts = [person[slot.key] for person in stats.values()]
+            self.assertLessEqual(max(counts) - min(counts), 1, slot.key)
+
+
+class ValidationTest(SchedulerTestCase):
+
+    def rules(self, scheduler, schedule):
+        return {(violation['date'], violation['rule'], violation['role']) for violation in scheduler.validate_schedule(schedule)}
+
+    def test_generated_plan_has_no_violations(self):
+        scheduler = self.scheduler(
+            blockweeks=[(2025, 1, 38), (2025, 3, 40)],
+            closures=["03.10.", "24.12.-06.01."],
+            absences=[("Clara", "Conrad", "01.10.2025", "10.10.2025")]
+        )
+        schedule = scheduler.generate_schedule(2025)
+        self.assertEqual(scheduler.validate_schedule(schedule, 2025), [])
+
+    def test_blockweek_absence_and_holiday(self):
+        scheduler = self.scheduler(
+            blockweeks=[(2025, 1, 38)],
+            closures=["18.09.2025"],
+            absences=[("Clara", "Conrad", "17.09.2025", "17.09.2025")]
+        )
+        schedule = [
+            {'date': WEDNESDAY, 'primary': "Anna Albrecht", 'secondary': "Clara Conrad"},
+            {'date': THURSDAY, 'primary': "Eva Engel", 'secondary': " - "}
+        ]
+        self.assertEqual(self.rules(scheduler, schedule), {
+            (WEDNESDAY, 'blockweek', 'primary'),
+            (WEDNESDAY, 'absence', 'secondary'),
+            (THURSDAY, 'holiday', 'primary')
+        })
+
+    def test_weekend_role_and_unknown(self):
+        scheduler = self.scheduler(azubis=[
+            ("Anna", "Albrecht", 1, "Vertretung"),
+            ("Ben", "Brandt", 1, ""),
+            ("Clara", "Conrad", 2, "")
+        ])
+        saturday = datetime.date(2025, 9, 20)
+        schedule = [
+            {'date': WEDNESDAY, 'primary': "Anna Albrecht", 'secondary': "Niemand Bekannt"},
+            {'date': saturday, 'primary': "Ben Brandt", 'secondary': "Clara Conrad"}
+        ]
+        self.assertEqual(self.rules(scheduler, schedule), {
+            (WEDNESDAY, 'role', 'primary'),
+            (WEDNESDAY, 'unknown', 'secondary'),
+            (saturday, 'weekend', 'primary'),
+            (saturday, 'weekend', 'secondary')
+        })
+
+    def test_same_person_and_consecutive_with_three_slots(self):
+        scheduler = self.scheduler(slots=THREE_SLOTS)
+        schedule = [
+            {'date': WEDNESDAY, 'primary': "Anna Albrecht", 'secondary': "Ben Brandt", 'kitchen': "Ben Brandt"},
+            {'date': THURSDAY, 'primary': "Anna Albrecht", 'secondary': "Ben Brandt", 'kitchen': "Clara Conrad"}
+        ]
+        violations = self.rules(scheduler, schedule)
+        # Vertretung darf laut Dienste.csv an Tagen am Stück, Dienst und Küche nicht
+        self.assertEqual(violations, {
+            (WEDNESDAY, 'same_person', 'kitchen'),
+            (THURSDAY, 'consecutive', 'primary')
+        })
+
+    def test_consecutive_skips_days_without_assignment(self):
+        scheduler = self.scheduler()
+        friday = datetime.date(2025, 9, 19)
+        schedule = [
+            {'date': WEDNESDAY, 'primary': "Anna Albrecht", 'secondary': "Ben Brandt"},
+            {'date': THURSDAY, 'primary': " - ", 'secondary': " - "},
+            {'date': friday, 'primary': "Anna Albrecht", 'secondary': "Clara Conrad"}
+        ]
+        self.assertIn((friday, 'consecutive', 'primary'), self.rules(scheduler, schedule))
+
+    def test_school_year_bounds(self):
+        scheduler = self.scheduler()
+        august = datetime.date(2025, 8, 20)
+        schedule = [{'date': august, 'primary': "Anna Albrecht", 'secondary': "Ben Brandt"}]
+        rules = {(violation['rule'], violation['role']) for violation in scheduler.validate_schedule(schedule, 2025)}
+        self.assertEqual(rules, {('school_year', None)})
+        self.assertEqual(scheduler.validate_schedule(schedule), [])
+
+
+if __name__ == '__main__':
+    unittest.main()